@@ -0,0 +1,144 @@
+"""
+共享聚合引擎
+各项分析先声明自己需要的“分组键 + 指标”，再由聚合计划对每个分组键只扫描一次，
+用 factorize + bincount 一次算出该键下的全部指标，结果交给各分析函数使用
+"""
+
+import numpy as np
+import pandas as pd
+
+# 支持的指标：size=行数，count=非空计数，sum=求和，nunique=不同值个数
+SUPPORTED_FUNCS = ('size', 'count', 'sum', 'nunique')
+
+
+def metric_name(func, column=None):
+    """指标在结果中的列名，例如 sum_buy_mount、nunique_cat1、size"""
+    return func if column is None else f"{func}_{column}"
+
+
+class AggregationPlan:
+    """按分组键收集各分析需要的聚合指标"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, key, func, column=None):
+        """登记一个指标，重复登记的指标只计算一次"""
+        if func not in SUPPORTED_FUNCS:
+            raise ValueError(f"不支持的聚合函数: {func}")
+        if func != 'size' and column is None:
+            raise ValueError(f"聚合函数 {func} 需要指定列")
+        self.metrics.setdefault(key, [])
+        if (func, column) not in self.metrics[key]:
+            self.metrics[key].append((func, column))
+        return self
+
+    def execute(self, data):
+        """执行聚合计划
+
+        data 可以是单个DataFrame，也可以是数据块迭代器（例如 preprocess_chunks 的输出）；
+        返回 {分组键: 聚合结果DataFrame}，结果按分组键升序排列，与 groupby 一致
+        """
+        if isinstance(data, pd.DataFrame):
+            return {key: _finalize(partial, self.metrics[key], data)
+                    for key, partial in self._aggregate_frame(data).items()}
+
+        merged = {}
+        dtypes_source = None
+        for chunk in data:
+            if chunk is None or len(chunk) == 0:
+                continue
+            dtypes_source = chunk
+            for key, partial in self._aggregate_frame(chunk).items():
+                merged[key] = partial if key not in merged else _merge_partials(merged[key], partial)
+        if dtypes_source is None:
+            return {}
+        return {key: _finalize(partial, self.metrics[key], dtypes_source)
+                for key, partial in merged.items()}
+
+    def _aggregate_frame(self, df):
+        """对一个DataFrame计算全部分组键的部分聚合结果"""
+        partials = {}
+        for key, metrics in self.metrics.items():
+            if key not in df.columns:
+                continue
+            needed = [column for _, column in metrics if column is not None]
+            if any(column not in df.columns for column in needed):
+                continue
+            partials[key] = _aggregate_key(df, key, metrics)
+        return partials
+
+
+def _aggregate_key(df, key, metrics):
+    """对单个分组键做一次 factorize，随后用 bincount 计算所有指标"""
+    codes, uniques = pd.factorize(df[key], sort=True)
+    valid = codes >= 0
+    codes = codes[valid]
+    n_groups = len(uniques)
+
+    values = {}
+    distinct_pairs = {}
+    for func, column in metrics:
+        name = metric_name(func, column)
+        if func == 'size':
+            values[name] = np.bincount(codes, minlength=n_groups)
+        elif func == 'count':
+            notnull = df[column].notna().to_numpy()[valid]
+            values[name] = np.bincount(codes[notnull], minlength=n_groups)
+        elif func == 'sum':
+            column_values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)[valid]
+            values[name] = np.bincount(codes, weights=np.nan_to_num(column_values), minlength=n_groups)
+        elif func == 'nunique':
+            # (分组, 取值) 去重后再按分组计数；保留去重后的取值对以便跨块合并
+            value_codes, value_uniques = pd.factorize(df[column])
+            value_codes = value_codes[valid]
+            notnull = value_codes >= 0
+            pairs = np.unique(codes[notnull].astype(np.int64) * len(value_uniques) + value_codes[notnull])
+            group_idx = pairs // max(len(value_uniques), 1)
+            values[name] = np.bincount(group_idx, minlength=n_groups)
+            distinct_pairs[name] = pd.DataFrame({
+                key: uniques.take(group_idx),
+                column: value_uniques.take(pairs % max(len(value_uniques), 1))
+            })
+
+    partial = pd.DataFrame(values, index=pd.Index(uniques, name=key))
+    return {'values': partial, 'pairs': distinct_pairs}
+
+
+def _merge_partials(left, right):
+    """合并两个数据块的部分聚合结果
+
+    size/count/sum 直接相加；nunique 需要保留 (分组, 取值) 对，最终汇总时再去重计数
+    """
+    values = left['values'].add(right['values'], fill_value=0)
+    pairs = {}
+    for name in left['pairs'].keys() | right['pairs'].keys():
+        frames = _as_list(left['pairs'].get(name)) + _as_list(right['pairs'].get(name))
+        if len(frames) > 16:
+            frames = [pd.concat(frames, ignore_index=True).drop_duplicates()]
+        pairs[name] = frames
+    return {'values': values, 'pairs': pairs, 'merged': True}
+
+
+def _as_list(frames):
+    """把单个DataFrame或列表统一为列表"""
+    if frames is None:
+        return []
+    return frames if isinstance(frames, list) else [frames]
+
+
+def _finalize(partial, metrics, source):
+    """整理输出：汇总nunique、恢复整数类型，分组键变为普通列"""
+    result = partial['values'].sort_index()
+    for name, frames in partial['pairs'].items():
+        if partial.get('merged'):
+            pairs = pd.concat(_as_list(frames), ignore_index=True).drop_duplicates()
+            result[name] = pairs.groupby(pairs.columns[0]).size().reindex(result.index, fill_value=0)
+
+    for func, column in metrics:
+        name = metric_name(func, column)
+        if name not in result.columns:
+            continue
+        if func != 'sum' or pd.api.types.is_integer_dtype(source[column]):
+            result[name] = result[name].astype(np.int64)
+    return result.reset_index()
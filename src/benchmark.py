@@ -0,0 +1,237 @@
+"""
+流水线基准测试
+在不同数据规模下生成合成数据，写入本地SQLite（或MySQL测试库），
+依次计时清洗与分析流程的各个阶段，输出 阶段 × 规模 的耗时表；
+除整表读入内存的基线流程外，还计时流式分块读取、分块清洗、SQL下推聚合和汇总立方体构建
+用法：
+    python benchmark.py --scales 1k,10k,100k
+    python benchmark.py --backend mysql --scales 100k,1m --output bench_results.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from synthetic_data import write_trade_history
+
+DEFAULT_SCALES = "1k,10k,100k"
+
+# 流式读取和分块清洗每块的行数
+DEFAULT_BENCH_CHUNK_SIZE = 50000
+
+_SUFFIXES = {'k': 10 ** 3, 'm': 10 ** 6}
+
+
+def parse_scale(text):
+    """把 "1k"/"50M"/"2500" 这样的规模写法转换为行数"""
+    text = text.strip().lower()
+    multiplier = _SUFFIXES.get(text[-1:], 1)
+    number = text[:-1] if text[-1:] in _SUFFIXES else text
+    rows = int(float(number) * multiplier)
+    if rows <= 0:
+        raise ValueError(f"无效的数据规模: {text}")
+    return rows
+
+
+def _row_count(value):
+    """阶段输出的行数：DataFrame取行数，(DataFrame, ...) 取第一个元素的行数，整数即为行数"""
+    if isinstance(value, tuple) and value:
+        value = value[0]
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    return None
+
+
+class StageTimer:
+    """逐阶段计时，quiet=True 时屏蔽各阶段自身的打印输出"""
+
+    def __init__(self, scale, quiet=True):
+        self.scale = scale
+        self.quiet = quiet
+        self.records = []
+
+    def run(self, stage, func, *args, rows_in=None, **kwargs):
+        output = contextlib.redirect_stdout(io.StringIO()) if self.quiet else contextlib.nullcontext()
+        with output:
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+        self.records.append({
+            'rows': self.scale,
+            'stage': stage,
+            'seconds': seconds,
+            'rows_in': rows_in,
+            'rows_out': _row_count(result),
+        })
+        print(f"  {stage:<28} {seconds:10.3f} 秒")
+        return result
+
+
+def _consume_chunks(chunks):
+    """读完数据块迭代器，返回总行数（只计时读取本身）"""
+    return sum(len(chunk) for chunk in chunks)
+
+
+def _clean_chunked(connection, table_name, target_table, chunk_size):
+    """分块清洗：两遍流式扫描，清洗结果逐块批量写入 target_table"""
+    import primary_clean
+    from bulk_writer import BulkTableWriter
+
+    writer = BulkTableWriter(connection, target_table)
+    try:
+        result = primary_clean.clean_taobao_data_chunked(
+            lambda: primary_clean.load_data_to_dataframe(connection, table_name, chunk_size=chunk_size),
+            writer.write)
+    except Exception:
+        writer.abort()
+        raise
+    writer.commit()
+    return result[0][0] if result is not None else 0
+
+
+def _pushdown(connection, table_name):
+    """SQL下推：全部聚合和数据集概况在数据库端完成"""
+    import data_analyze
+    from sql_pushdown import pushdown_aggregates, pushdown_dataset_summary
+
+    aggregates = pushdown_aggregates(connection, table_name, data_analyze.build_aggregation_plan())
+    pushdown_dataset_summary(connection, table_name)
+    return len(aggregates['user_id']) if 'user_id' in aggregates else None
+
+
+def _build_cube(connection, table_name, chunk_size):
+    """从头构建 day × cat1 汇总立方体（本地文件存储），返回单元格数"""
+    from rollup_cube import open_cube_store, refresh_cube
+
+    cube, _ = refresh_cube(connection, table_name, open_cube_store('local', connection, table_name),
+                           chunk_size=chunk_size)
+    return len(cube.cells)
+
+
+def run_pipeline(connection, table_name, rows, output_dir, dpi=100, render_workers=4, quiet=True,
+                 chunk_size=DEFAULT_BENCH_CHUNK_SIZE):
+    """对一张表按顺序执行清洗与分析流程的各个阶段，返回计时记录"""
+    import primary_clean
+    import data_analyze
+
+    timer = StageTimer(rows, quiet=quiet)
+
+    # 清洗流程
+    df = timer.run('load_data_to_dataframe', primary_clean.load_data_to_dataframe, connection, table_name)
+    missing_info = timer.run('check_data_quality', primary_clean.check_data_quality, df, rows_in=len(df))
+    df_cleaned, _ = timer.run('clean_taobao_data', primary_clean.clean_taobao_data, df, missing_info,
+                              rows_in=len(df))
+
+    # 分析流程
+    df_processed = timer.run('preprocess_data', data_analyze.preprocess_data, df, rows_in=len(df))
+    n = len(df_processed)
+    aggregates = timer.run('compute_shared_aggregates', data_analyze.compute_shared_aggregates,
+                           df_processed, rows_in=n)
+    analysis_results = {}
+    analysis_results.update(timer.run('analyze_sales_trend', data_analyze.analyze_sales_trend,
+                                      df_processed, aggregates, rows_in=n))
+    analysis_results.update(timer.run('analyze_product_categories', data_analyze.analyze_product_categories,
+                                      df_processed, aggregates, rows_in=n))
+    analysis_results.update(timer.run('analyze_user_behavior', data_analyze.analyze_user_behavior,
+                                      df_processed, aggregates=aggregates, rows_in=n))
+    analysis_results.update(timer.run('analyze_purchase_patterns', data_analyze.analyze_purchase_patterns,
+                                      df_processed, rows_in=n))
+    timer.run('create_visualizations', data_analyze.create_visualizations, df_processed, analysis_results,
+              output_dir=output_dir, dpi=dpi, workers=render_workers, use_cache=False, rows_in=n)
+
+    # 写回数据库（MySQL 为 LOAD DATA/多行INSERT + RENAME，SQLite 为 executemany + 事务内改名）
+    timer.run('save_cleaned_data', primary_clean.save_cleaned_data, df_cleaned, connection,
+              f"{table_name}_cleaned", rows_in=len(df_cleaned))
+
+    # 不把整表读入内存的路径
+    timer.run('load_data_chunked', _consume_chunks,
+              primary_clean.load_data_to_dataframe(connection, table_name, chunk_size=chunk_size), rows_in=rows)
+    timer.run('clean_taobao_data_chunked', _clean_chunked, connection, table_name,
+              f"{table_name}_cleaned_chunked", chunk_size, rows_in=rows)
+    timer.run('sql_pushdown', _pushdown, connection, table_name, rows_in=rows)
+    timer.run('rollup_cube_build', _build_cube, connection, table_name, chunk_size, rows_in=rows)
+    return timer.records
+
+
+def summarize(records):
+    """阶段 × 规模 的耗时表（秒）"""
+    frame = pd.DataFrame(records)
+    table = frame.pivot_table(index='stage', columns='rows', values='seconds', sort=False)
+    table.columns = [f"{rows:,} 行" for rows in table.columns]
+    table.loc['合计'] = table.sum()
+    return table
+
+
+def _open_backend(backend, db_path):
+    if backend == 'sqlite':
+        return sqlite3.connect(db_path)
+    from db_pool import get_connection
+    return get_connection()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="淘宝母婴数据流水线基准测试")
+    parser.add_argument('--scales', default=DEFAULT_SCALES,
+                        help=f"逗号分隔的数据规模，如 1k,10k,1m,50m（默认 {DEFAULT_SCALES}）")
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite',
+                        help="sqlite 使用本地临时数据库；mysql 使用共享连接池配置的数据库")
+    parser.add_argument('--db-path', default=None, help="SQLite数据库文件（默认使用临时文件，结束后删除）")
+    parser.add_argument('--seed', type=int, default=0, help="合成数据的随机种子")
+    parser.add_argument('--dpi', type=int, default=100, help="图表分辨率")
+    parser.add_argument('--render-workers', type=int, default=4, help="并行渲染的进程数")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_BENCH_CHUNK_SIZE,
+                        help=f"流式读取和分块清洗每块的行数（默认 {DEFAULT_BENCH_CHUNK_SIZE}）")
+    parser.add_argument('--output', default=None, help="把全部计时记录写入JSON文件")
+    parser.add_argument('--verbose', action='store_true', help="显示各阶段自身的输出")
+    args = parser.parse_args(argv)
+
+    scales = [parse_scale(text) for text in args.scales.split(',') if text.strip()]
+    work_dir = tempfile.mkdtemp(prefix='taobao_bench_')
+    db_path = args.db_path or os.path.join(work_dir, 'bench.sqlite')
+    records = []
+
+    # 各阶段的输出文件（图表、CSV等）写到临时目录
+    original_dir = os.getcwd()
+    connection = _open_backend(args.backend, os.path.abspath(db_path))
+    os.chdir(work_dir)
+    try:
+        for rows in scales:
+            table_name = f"bench_trade_history_{rows}"
+            print(f"\n规模 {rows:,} 行：生成合成数据 -> {args.backend} 表 '{table_name}'")
+            start = time.perf_counter()
+            write_trade_history(connection, table_name, rows, seed=args.seed)
+            print(f"  {'(生成并写入数据)':<28} {time.perf_counter() - start:10.3f} 秒")
+            records.extend(run_pipeline(connection, table_name, rows,
+                                        output_dir=os.path.join(work_dir, f"charts_{rows}"),
+                                        dpi=args.dpi, render_workers=args.render_workers,
+                                        quiet=not args.verbose, chunk_size=args.chunk_size))
+    finally:
+        connection.close()
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("各阶段耗时（秒）")
+    print("=" * 60)
+    print(summarize(records).to_string(float_format=lambda value: f"{value:.3f}"))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        print(f"\n计时记录已保存到: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
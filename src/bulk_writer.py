@@ -0,0 +1,284 @@
+"""
+批量写入MySQL
+数据先写入临时表（LOAD DATA LOCAL INFILE，不可用时退回多行INSERT），
+全部写完后用 RENAME TABLE 原子替换目标表，读取方不会看到空表或写了一半的表。
+SQLite 连接（本地测试、基准测试）使用 executemany 写入临时表，在一个事务中删除旧表并改名替换
+"""
+
+import csv
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from db_stream import _is_sqlite, _placeholder
+
+# executemany 每批插入的行数（mysql.connector 会改写为多行 INSERT）
+DEFAULT_BATCH_SIZE = 10000
+
+# 不允许 LOAD DATA LOCAL INFILE 时的错误码：1148 ER_NOT_ALLOWED_COMMAND（服务端 local_infile=0），
+# 3948 ER_CLIENT_LOCAL_FILES_DISABLED，2068 CR_LOAD_DATA_LOCAL_INFILE_REJECTED（客户端未开启）
+LOCAL_INFILE_ERRNOS = (1148, 2068, 3948)
+
+
+def is_local_infile_unsupported(error):
+    """该异常是否表示数据库或驱动不允许 LOAD DATA LOCAL INFILE（其他错误应直接抛出）"""
+    return getattr(error, 'errno', None) in LOCAL_INFILE_ERRNOS
+
+
+def _mysql_type(dtype):
+    """pandas类型对应的MySQL列类型"""
+    if pd.api.types.is_bool_dtype(dtype):
+        return "TINYINT(1)"
+    if pd.api.types.is_integer_dtype(dtype):
+        return {1: "TINYINT", 2: "SMALLINT", 4: "INT"}.get(np.dtype(dtype).itemsize, "BIGINT")
+    if pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "DATETIME"
+    return "TEXT"
+
+
+def _escape_text(series):
+    """按 LOAD DATA 默认的转义规则处理文本中的反斜杠、制表符和换行"""
+    text = series.astype(object).where(series.notna(), None)
+    is_str = text.map(lambda value: isinstance(value, str))
+    if not is_str.any():
+        return text
+    escaped = (text[is_str].str.replace('\\', '\\\\', regex=False)
+               .str.replace('\t', '\\t', regex=False)
+               .str.replace('\n', '\\n', regex=False)
+               .str.replace('\r', '\\r', regex=False))
+    text[is_str] = escaped
+    return text
+
+
+class BulkTableWriter:
+    """批量写表
+
+    mode='replace' 时写入临时表，commit() 时原子替换目标表；
+    mode='append' 时直接批量追加到目标表（不存在则创建）；
+    transactional=True 时追加的各块不单独提交，由调用方在 commit() 之后连同自己的其他写入
+    （如水位线）一起提交，abort() 时回滚。
+    用法：writer = BulkTableWriter(conn, table); writer.write(df) ...; writer.commit()
+    """
+
+    def __init__(self, connection, table_name, mode='replace', method='auto', batch_size=DEFAULT_BATCH_SIZE,
+                 transactional=False):
+        if mode not in ('replace', 'append'):
+            raise ValueError(f"不支持的写入模式: {mode}")
+        self.connection = connection
+        self.table_name = table_name
+        self.mode = mode
+        self.sqlite = _is_sqlite(connection)
+        # auto: 先尝试 LOAD DATA，失败后改用 executemany；SQLite 没有 LOAD DATA
+        self.method = 'executemany' if self.sqlite else method
+        self.batch_size = batch_size
+        self.transactional = transactional and mode == 'append'
+        self.load_table = f"{table_name}__staging" if mode == 'replace' else table_name
+        self.columns = None
+        self.rows = 0
+        self.seconds = 0.0
+
+    def _execute(self, sql, params=None):
+        cursor = self.connection.cursor()
+        try:
+            if params is None:
+                cursor.execute(sql)
+            else:
+                cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+        finally:
+            cursor.close()
+
+    def _table_exists(self, table_name):
+        if self.sqlite:
+            rows = self._execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                 (table_name,))
+            return rows[0][0] > 0
+        rows = self._execute(
+            "SELECT COUNT(*) FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s", (table_name,))
+        return rows[0][0] > 0
+
+    def _create_table(self, df):
+        """按第一个数据块的类型建表"""
+        columns_sql = ", ".join(f"`{col}` {_mysql_type(df[col].dtype)}" for col in df.columns)
+        if self.mode == 'replace':
+            self._execute(f"DROP TABLE IF EXISTS `{self.load_table}`")
+            self._execute(f"CREATE TABLE `{self.load_table}` ({columns_sql})")
+        else:
+            self._execute(f"CREATE TABLE IF NOT EXISTS `{self.load_table}` ({columns_sql})")
+
+    def _prepare(self, df, escape_text):
+        """转换为写入用的DataFrame：布尔转0/1，文本列按需按LOAD DATA规则转义
+
+        逐行插入时日期时间列转换为 datetime 对象（mysql.connector 的纯Python转换器不接受 pd.Timestamp），
+        SQLite 则转换为与 LOAD DATA 相同格式的文本
+        """
+        prepared = df.copy()
+        for col in prepared.columns:
+            dtype = prepared[col].dtype
+            if pd.api.types.is_bool_dtype(dtype):
+                prepared[col] = prepared[col].astype('Int8')
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
+                if escape_text:
+                    continue
+                if self.sqlite:
+                    prepared[col] = prepared[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+                else:
+                    prepared[col] = pd.Series(prepared[col].dt.to_pydatetime(), index=prepared.index, dtype=object)
+            elif pd.api.types.is_numeric_dtype(dtype):
+                continue
+            elif escape_text:
+                prepared[col] = _escape_text(prepared[col])
+            else:
+                prepared[col] = prepared[col].astype(object).where(prepared[col].notna(), None)
+        return prepared
+
+    def _load_data_infile(self, df):
+        """写临时TSV文件后用 LOAD DATA LOCAL INFILE 载入"""
+        fd, path = tempfile.mkstemp(suffix='.tsv')
+        os.close(fd)
+        try:
+            prepared = self._prepare(df, escape_text=True)
+            prepared.to_csv(path, sep='\t', header=False, index=False, na_rep='\\N',
+                            date_format='%Y-%m-%d %H:%M:%S', lineterminator='\n',
+                            quoting=csv.QUOTE_NONE, encoding='utf-8')
+            column_list = ", ".join(f"`{col}`" for col in df.columns)
+            # SQL字符串中的反斜杠是转义符：Windows 路径改用正斜杠，单引号按SQL规则加倍
+            sql_path = path.replace('\\', '/').replace("'", "''")
+            self._execute(
+                f"LOAD DATA LOCAL INFILE '{sql_path}' INTO TABLE `{self.load_table}` "
+                f"CHARACTER SET utf8mb4 ({column_list})")
+        finally:
+            os.remove(path)
+
+    def _executemany(self, df):
+        """多行INSERT分批写入"""
+        prepared = self._prepare(df, escape_text=False)
+        prepared = prepared.astype(object).where(prepared.notna(), None)
+        column_list = ", ".join(f"`{col}`" for col in df.columns)
+        placeholders = ", ".join([_placeholder(self.connection)] * len(df.columns))
+        sql = f"INSERT INTO `{self.load_table}` ({column_list}) VALUES ({placeholders})"
+        rows = list(prepared.itertuples(index=False, name=None))
+        cursor = self.connection.cursor()
+        try:
+            for start in range(0, len(rows), self.batch_size):
+                cursor.executemany(sql, rows[start:start + self.batch_size])
+        finally:
+            cursor.close()
+
+    def write(self, df):
+        """写入一个数据块"""
+        if df is None or len(df) == 0:
+            return
+        start = time.perf_counter()
+        if self.columns is None:
+            self.columns = list(df.columns)
+            self._create_table(df)
+
+        if self.method in ('auto', 'load_data'):
+            try:
+                self._load_data_infile(df)
+                self.method = 'load_data'
+            except Exception as e:
+                if self.method == 'load_data' or not is_local_infile_unsupported(e):
+                    raise
+                print(f"LOAD DATA 不可用（{e}），改用批量INSERT")
+                self.method = 'executemany'
+                self._executemany(df)
+        else:
+            self._executemany(df)
+
+        if not self.transactional:
+            self.connection.commit()
+        self.rows += len(df)
+        self.seconds += time.perf_counter() - start
+
+    def _rename_clauses(self):
+        """replace模式下替换目标表所需的 RENAME 子句，返回 (子句列表, 替换后要删除的旧表或None)"""
+        if self.mode != 'replace' or self.columns is None:
+            return [], None
+        old_table = f"{self.table_name}__old"
+        self._execute(f"DROP TABLE IF EXISTS `{old_table}`")
+        if self._table_exists(self.table_name):
+            return [f"`{self.table_name}` TO `{old_table}`", f"`{self.load_table}` TO `{self.table_name}`"], old_table
+        return [f"`{self.load_table}` TO `{self.table_name}`"], None
+
+    def _report(self):
+        rate = self.rows / self.seconds if self.seconds > 0 else float('inf')
+        print(f"批量写入 '{self.table_name}': {self.rows} 行, 用时 {self.seconds:.2f} 秒, "
+              f"{rate:,.0f} 行/秒 (方式: {self.method})")
+
+    def commit(self):
+        """完成写入：replace模式下用 RENAME TABLE 原子替换目标表，并报告吞吐量"""
+        commit_tables([self])
+        return self.rows
+
+    def abort(self):
+        """放弃写入，删除临时表（或回滚未提交的追加），目标表保持不变"""
+        if self.transactional:
+            self.connection.rollback()
+        if self.mode == 'replace':
+            self._execute(f"DROP TABLE IF EXISTS `{self.load_table}`")
+
+
+def _commit_sqlite_tables(writers):
+    """SQLite 的表结构修改也是事务性的：在一个事务中删除旧表并把临时表改名"""
+    connection = writers[0].connection
+    connection.commit()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("BEGIN")
+        for writer in writers:
+            if writer.mode == 'replace' and writer.columns is not None:
+                cursor.execute(f"DROP TABLE IF EXISTS `{writer.table_name}`")
+                cursor.execute(f"ALTER TABLE `{writer.load_table}` RENAME TO `{writer.table_name}`")
+        cursor.execute("COMMIT")
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def commit_tables(writers):
+    """用一条 RENAME TABLE 语句同时替换多个写入的目标表
+
+    MySQL 的多表 RENAME 整条语句原子执行，读取方要么看到全部旧表，要么看到全部新表
+    （SQLite 在一个事务中完成替换）；用于必须一起生效的数据（如汇总表和记录其水位线的元数据表）
+    """
+    start = time.perf_counter()
+    if writers and writers[0].sqlite:
+        _commit_sqlite_tables(writers)
+    else:
+        clauses, old_tables = [], []
+        for writer in writers:
+            writer_clauses, old_table = writer._rename_clauses()
+            clauses.extend(writer_clauses)
+            if old_table is not None:
+                old_tables.append(old_table)
+        if clauses:
+            writers[0]._execute("RENAME TABLE " + ", ".join(clauses))
+            for old_table in old_tables:
+                writers[0]._execute(f"DROP TABLE `{old_table}`")
+    elapsed = time.perf_counter() - start
+    for writer in writers:
+        writer.seconds += elapsed
+        writer._report()
+
+
+def bulk_write_table(connection, data, table_name, mode='replace', method='auto', batch_size=DEFAULT_BATCH_SIZE):
+    """把DataFrame或数据块迭代器批量写入表，返回写入行数"""
+    writer = BulkTableWriter(connection, table_name, mode=mode, method=method, batch_size=batch_size)
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+    except Exception:
+        writer.abort()
+        raise
+    return writer.commit()
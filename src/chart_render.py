@@ -0,0 +1,271 @@
+"""
+图表渲染
+每张图只依赖一份预先聚合好的小数据（payload），在独立进程中并行绘制；
+payload 与上次渲染相同且输出文件存在时直接跳过
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+          '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+
+# 绘图代码有改动时修改版本号，使旧的缓存失效
+RENDER_VERSION = 1
+
+CACHE_FILE = ".render_cache.json"
+
+
+def _pyplot():
+    """导入pyplot并设置中文字体与主题"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Unicode MS']
+    plt.rcParams['axes.unicode_minus'] = False
+    sns.set_style("whitegrid")
+    sns.set_palette("husl")
+    return plt
+
+
+def _init_worker():
+    """渲染进程初始化：使用无界面的Agg后端"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+# ==================== 各图表的绘制函数 ====================
+def render_monthly_sales_trend(payload, path, dpi):
+    """月度销售趋势图"""
+    plt = _pyplot()
+    fig, ax = plt.subplots(figsize=(12, 6))
+    months, quantities = payload['year_month'], payload['buy_mount']
+
+    ax.bar(range(len(months)), quantities, color=COLORS[0])
+    ax.set_xlabel('月份')
+    ax.set_ylabel('购买总量')
+    ax.set_title('月度购买趋势')
+    ax.set_xticks(range(len(months)))
+    ax.set_xticklabels(months, rotation=45, ha='right')
+    ax.grid(axis='y', alpha=0.3)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+def render_top_categories(payload, path, dpi):
+    """Top 10 商品类别图"""
+    plt = _pyplot()
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+    categories = payload['cat1']
+
+    # 左图：购买量
+    ax1.barh(range(len(categories)), payload['total_quantity'], color=COLORS[1])
+    ax1.set_yticks(range(len(categories)))
+    ax1.set_yticklabels(categories)
+    ax1.set_xlabel('购买总量')
+    ax1.set_title('Top 10 商品类别 (按购买量)')
+    ax1.invert_yaxis()
+
+    # 右图：交易次数
+    ax2.barh(range(len(categories)), payload['transaction_count'], color=COLORS[2])
+    ax2.set_yticks(range(len(categories)))
+    ax2.set_yticklabels(categories)
+    ax2.set_xlabel('交易次数')
+    ax2.set_title('Top 10 商品类别 (按交易次数)')
+    ax2.invert_yaxis()
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+def render_user_behavior(payload, path, dpi):
+    """用户价值分层与购买数量区间图"""
+    plt = _pyplot()
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+
+    # 左图：用户类型分布
+    ax1.pie(payload['user_type_counts'], labels=payload['user_type_labels'],
+            autopct='%1.1f%%', colors=COLORS[:3], startangle=90)
+    ax1.set_title('用户价值分层分布')
+
+    # 右图：购买数量分布
+    if payload.get('buy_group_labels') is not None:
+        labels = payload['buy_group_labels']
+        ax2.bar(range(len(labels)), payload['buy_group_counts'], color=COLORS[3])
+        ax2.set_xlabel('购买数量区间')
+        ax2.set_ylabel('交易次数')
+        ax2.set_title('购买数量分布')
+        ax2.set_xticks(range(len(labels)))
+        ax2.set_xticklabels(labels, rotation=45, ha='right')
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+def render_analysis_dashboard(payload, path, dpi):
+    """综合仪表板（多子图）"""
+    plt = _pyplot()
+    fig = plt.figure(figsize=(15, 10))
+
+    # 子图1：月度趋势
+    ax1 = plt.subplot(2, 2, 1)
+    monthly = payload.get('monthly')
+    if monthly is not None:
+        months = monthly['year_month']
+        ax1.plot(range(len(months)), monthly['buy_mount'],
+                 marker='o', linewidth=2, color=COLORS[0])
+        ax1.set_title('月度销售趋势', fontsize=12, fontweight='bold')
+        ax1.set_xlabel('月份')
+        ax1.set_ylabel('购买总量')
+        ax1.grid(True, alpha=0.3)
+        ax1.set_xticks(range(len(months)))
+        ax1.set_xticklabels(months, rotation=45, ha='right')
+
+    # 子图2：商品类别
+    ax2 = plt.subplot(2, 2, 2)
+    categories = payload.get('categories')
+    if categories is not None:
+        ax2.barh(range(len(categories['cat1'])), categories['total_quantity'], color=COLORS[1:9])
+        ax2.set_yticks(range(len(categories['cat1'])))
+        ax2.set_yticklabels(categories['cat1'])
+        ax2.set_title('Top 8 商品类别', fontsize=12, fontweight='bold')
+        ax2.set_xlabel('购买总量')
+        ax2.invert_yaxis()
+
+    # 子图3：购买数量分布（直方图已预先分箱）
+    ax3 = plt.subplot(2, 2, 3)
+    histogram = payload.get('histogram')
+    if histogram is not None:
+        edges = histogram['edges']
+        ax3.hist(edges[:-1], bins=edges, weights=histogram['counts'],
+                 color=COLORS[4], edgecolor='black', alpha=0.7)
+        ax3.set_title('购买数量分布', fontsize=12, fontweight='bold')
+        ax3.set_xlabel('购买数量')
+        ax3.set_ylabel('频次')
+        ax3.grid(True, alpha=0.3)
+
+    # 子图4：用户活跃度
+    ax4 = plt.subplot(2, 2, 4)
+    top_users = payload.get('top_users')
+    if top_users is not None:
+        ax4.bar(range(len(top_users)), top_users, color=COLORS[5])
+        ax4.set_title('Top 10 活跃用户', fontsize=12, fontweight='bold')
+        ax4.set_xlabel('用户排名')
+        ax4.set_ylabel('购买次数')
+        ax4.set_xticks(range(len(top_users)))
+        ax4.set_xticklabels([f"用户{i+1}" for i in range(len(top_users))], rotation=45, ha='right')
+
+    plt.suptitle('淘宝母婴数据分析仪表板', fontsize=16, fontweight='bold', y=1.02)
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+def render_cohort_retention(payload, path, dpi):
+    """同期群留存热力图"""
+    plt = _pyplot()
+    cohorts, offsets = payload['cohorts'], payload['offsets']
+    retention = np.array([[np.nan if value is None else value for value in row]
+                          for row in payload['retention']], dtype=float)
+    fig, ax = plt.subplots(figsize=(max(8, len(offsets) * 0.8), max(5, len(cohorts) * 0.4)))
+
+    image = ax.imshow(np.ma.masked_invalid(retention[:, 1:]), cmap='YlGnBu', aspect='auto', vmin=0)
+    fig.colorbar(image, ax=ax, label='留存率')
+    for i, j in zip(*np.nonzero(~np.isnan(retention[:, 1:]))):
+        ax.text(j, i, f"{retention[i, j + 1]:.0%}", ha='center', va='center', fontsize=7)
+    ax.set_xticks(range(len(offsets) - 1))
+    ax.set_xticklabels(offsets[1:])
+    ax.set_yticks(range(len(cohorts)))
+    ax.set_yticklabels(cohorts)
+    ax.set_xlabel('首购后的月数')
+    ax.set_ylabel('首购月份')
+    ax.set_title('同期群月度留存率')
+    ax.grid(False)
+
+    plt.tight_layout()
+    plt.savefig(path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+RENDERERS = {
+    'monthly_sales_trend': render_monthly_sales_trend,
+    'top_categories': render_top_categories,
+    'user_behavior': render_user_behavior,
+    'analysis_dashboard': render_analysis_dashboard,
+    'cohort_retention': render_cohort_retention,
+}
+
+
+# ==================== 渲染调度 ====================
+def histogram_payload(values=None, counts=None, bins=30):
+    """预先计算直方图分箱：values 为明细值，或 counts 为 取值->频次 的Series"""
+    if counts is not None:
+        hist, edges = np.histogram(counts.index.to_numpy(dtype=float), bins=bins,
+                                   weights=counts.to_numpy())
+    else:
+        values = np.asarray(values, dtype=float)
+        hist, edges = np.histogram(values[~np.isnan(values)], bins=bins)
+    return {'counts': hist.tolist(), 'edges': edges.tolist()}
+
+
+def payload_hash(name, payload, fmt, dpi):
+    """图表输入的哈希，用于判断是否需要重新渲染"""
+    text = json.dumps({'name': name, 'payload': payload, 'format': fmt, 'dpi': dpi,
+                       'version': RENDER_VERSION}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _render_job(name, payload, path, dpi):
+    RENDERERS[name](payload, path, dpi)
+    return path
+
+
+def render_charts(payloads, output_dir="visualization_results", fmt='png', dpi=300, workers=4, use_cache=True):
+    """渲染全部图表，返回 {图表名: 输出路径}
+
+    fmt 可为 png/svg/pdf 等matplotlib支持的格式；workers<=1 时在当前进程中依次绘制
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cache_path = os.path.join(output_dir, CACHE_FILE)
+    cache = {}
+    if use_cache and os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+
+    outputs = {}
+    jobs = []
+    for name, payload in payloads.items():
+        path = os.path.join(output_dir, f"{name}.{fmt}")
+        outputs[name] = path
+        digest = payload_hash(name, payload, fmt, dpi)
+        if use_cache and cache.get(path) == digest and os.path.exists(path):
+            print(f"未变化，跳过: {path}")
+            continue
+        jobs.append((name, payload, path, digest))
+
+    if workers <= 1 or len(jobs) <= 1:
+        for name, payload, path, _ in jobs:
+            _render_job(name, payload, path, dpi)
+            print(f"已保存: {path}")
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_init_worker) as executor:
+            futures = [executor.submit(_render_job, name, payload, path, dpi)
+                       for name, payload, path, _ in jobs]
+            for future in futures:
+                print(f"已保存: {future.result()}")
+
+    for _, _, path, digest in jobs:
+        cache[path] = digest
+    if use_cache:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+
+    return outputs
@@ -0,0 +1,188 @@
+"""
+淘宝母婴数据命令行入口
+用法：
+    python cli.py clean   [--table T] [--limit N] [--chunk-size N] [--incremental] [--dedup-fallback spill|bloom]
+    python cli.py analyze [--table T] [--limit N] [--chunk-size N] [--workers N] [--pushdown] [--approx-distinct]
+                  [--cube local|mysql] [--stages A,B] [--stage-workers N]
+    python cli.py plot    [...分析参数] [--format png|svg] [--dpi N] [--render-workers N]
+    python cli.py report  [...分析参数] [--output FILE]
+
+本模块只导入标准库，--help 和参数检查不加载 pandas；子命令执行时才导入对应的流程模块
+（primary_clean / data_analyze），这时 pandas、numpy 和流程用到的各模块都会加载，启动耗时与直接运行脚本相同。
+按需导入的只有数据库驱动（建立连接时）和绘图库：clean/analyze/report 不会导入 matplotlib。
+--trace/--chrome-trace 记录各阶段的耗时、内存和行数，结束时打印最慢的阶段
+"""
+
+import argparse
+import os
+import sys
+
+
+def _positive_int(value):
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"必须为正整数: {value}")
+    return number
+
+
+def _limit(value):
+    """行数限制，0 表示读取整表"""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"不能为负数: {value}")
+    return number or None
+
+
+def _name_list(value):
+    """逗号分隔的名称列表"""
+    names = [name.strip() for name in value.split(',') if name.strip()]
+    if not names:
+        raise argparse.ArgumentTypeError(f"至少需要一个名称: {value}")
+    return names
+
+
+def cmd_clean(args):
+    import primary_clean
+    dedup_options = {'max_memory_mb': args.dedup_memory_mb, 'fallback': args.dedup_fallback,
+                     'error_rate': args.dedup_error_rate, 'spill_dir': args.dedup_dir,
+                     'expected_rows': args.dedup_expected_rows}
+    primary_clean.main(incremental=args.incremental, table_name=args.table, limit=args.limit,
+                       chunk_size=args.chunk_size, target_table=args.target_table,
+                       dedup_options=dedup_options, quantile_k=args.quantile_k)
+
+
+def cmd_analyze(args):
+    import data_analyze
+    data_analyze.main(pushdown=args.pushdown, table_name=args.table, limit=args.limit,
+                      chunk_size=args.chunk_size, workers=args.workers,
+                      approx_distinct=args.approx_distinct, cube=args.cube,
+                      stages=args.stages, stage_workers=args.stage_workers,
+                      stage_executor=args.stage_executor, plots=False, report=False)
+
+
+def cmd_plot(args):
+    import data_analyze
+    data_analyze.main(pushdown=args.pushdown, table_name=args.table, limit=args.limit,
+                      chunk_size=args.chunk_size, workers=args.workers,
+                      approx_distinct=args.approx_distinct, cube=args.cube,
+                      stages=args.stages, stage_workers=args.stage_workers,
+                      stage_executor=args.stage_executor, plots=True, report=False,
+                      output_dir=args.output_dir, fmt=args.format, dpi=args.dpi,
+                      render_workers=args.render_workers)
+
+
+def cmd_report(args):
+    import data_analyze
+    data_analyze.main(pushdown=args.pushdown, table_name=args.table, limit=args.limit,
+                      chunk_size=args.chunk_size, workers=args.workers,
+                      approx_distinct=args.approx_distinct, cube=args.cube,
+                      stages=args.stages, stage_workers=args.stage_workers,
+                      stage_executor=args.stage_executor, plots=False, report=True,
+                      report_file=args.output)
+
+
+def _add_read_options(parser, default_limit=None):
+    """各子命令共用的读取参数"""
+    parser.add_argument('--limit', type=_limit, default=default_limit,
+                        help=f"读取的行数，0 为整表（默认 {default_limit or '整表'}）")
+    parser.add_argument('--chunk-size', type=_positive_int, default=None,
+                        help="按块流式读取，每块的行数")
+
+
+def _add_analysis_options(parser):
+    """analyze/plot/report 共用的参数"""
+    # 默认表名与 data_analyze.SOURCE_TABLE 一致，这里不导入 data_analyze 以保持启动速度
+    parser.add_argument('--table', default="(sample)sam_tianchi_mum_baby_trade_history",
+                        help="分析的表名")
+    _add_read_options(parser)
+    parser.add_argument('--workers', type=_positive_int, default=None,
+                        help="并行分区读取的线程数（读取整表时生效）")
+    parser.add_argument('--pushdown', action='store_true',
+                        help="聚合在MySQL端执行，不加载明细数据")
+    parser.add_argument('--approx-distinct', action='store_true',
+                        help="用户数/类别数使用 HyperLogLog 近似（内存固定，结果附带误差界；--pushdown 时为数据库端精确计数）")
+    parser.add_argument('--cube', choices=['local', 'mysql'], default=None,
+                        help="基于增量刷新的 日期×类别 汇总立方体分析销售趋势和商品类别，"
+                             "立方体保存在本地文件（local）或MySQL汇总表（mysql）")
+    parser.add_argument('--stages', type=_name_list, default=None, metavar='NAME[,NAME...]',
+                        help="只执行指定的分析阶段或结果键（连同其上游阶段），如 sales_trend,user_retention")
+    parser.add_argument('--stage-workers', type=_positive_int, default=1,
+                        help="并发执行相互独立的分析阶段的线程数（默认1，依次执行）")
+    parser.add_argument('--stage-executor', choices=['thread', 'process'], default='thread',
+                        help="分析阶段的并发方式：thread 共享内存中的数据，process 需要复制数据到子进程")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="淘宝母婴数据清洗与分析")
+    parser.add_argument('--db-config', default=None,
+                        help="数据库配置文件（JSON），等同于设置 TAOBAO_DB_CONFIG 环境变量")
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help="记录各阶段的耗时与内存，按JSON-lines追加写入该文件")
+    parser.add_argument('--chrome-trace', default=None, metavar='FILE',
+                        help="导出 Chrome trace-event 文件（chrome://tracing 打开）")
+    parser.add_argument('--trace-memory', choices=['rss', 'tracemalloc', 'none'], default='rss',
+                        help="内存跟踪方式：rss 开销小，tracemalloc 更精确但较慢")
+    parser.add_argument('--trace-top', type=_positive_int, default=5, help="结束时列出的最慢阶段数")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    clean = subparsers.add_parser('clean', help="清洗原始数据并写入清洗后的表")
+    clean.add_argument('--table', default=None, help="原始表名（默认为数据库中的第一张表）")
+    clean.add_argument('--target-table', default="cleaned_taobao_data", help="清洗结果写入的表")
+    _add_read_options(clean, default_limit=1000)
+    clean.add_argument('--incremental', action='store_true',
+                       help="只清洗水位线之后的新数据并追加到目标表")
+    clean.add_argument('--quantile-k', type=_positive_int, default=None, metavar='K',
+                       help="分块/增量清洗的中位数填充值使用逐块更新的KLL草图近似，"
+                            "K 越大越精确（如 200 时秩误差约1.3%%）")
+    clean.add_argument('--dedup-memory-mb', type=_positive_int, default=256,
+                       help="跨块去重保存行哈希的内存上限（MB），超出后按 --dedup-fallback 处理")
+    clean.add_argument('--dedup-fallback', choices=['spill', 'bloom'], default='spill',
+                       help="超出内存上限后：spill 溢写到磁盘（精确），bloom 使用Bloom过滤器（近似）")
+    clean.add_argument('--dedup-error-rate', type=float, default=1e-4, help="Bloom过滤器的目标误判率")
+    clean.add_argument('--dedup-expected-rows', type=_positive_int, default=None,
+                       help="Bloom过滤器按此行数和误判率确定大小（默认为本次清洗的总行数）")
+    clean.add_argument('--dedup-dir', default=None,
+                       help="保存去重状态的目录，多次增量清洗使用同一目录即可跨批次去重")
+    clean.set_defaults(func=cmd_clean)
+
+    analyze = subparsers.add_parser('analyze', help="执行各项分析并打印结果")
+    _add_analysis_options(analyze)
+    analyze.set_defaults(func=cmd_analyze)
+
+    plot = subparsers.add_parser('plot', help="执行分析并生成可视化图表")
+    _add_analysis_options(plot)
+    plot.add_argument('--output-dir', default="visualization_results", help="图表输出目录")
+    plot.add_argument('--format', default='png', help="图表格式，如 png（预览）或 svg（报告）")
+    plot.add_argument('--dpi', type=_positive_int, default=300, help="图表分辨率")
+    plot.add_argument('--render-workers', type=_positive_int, default=4, help="并行渲染的进程数")
+    plot.set_defaults(func=cmd_plot)
+
+    report = subparsers.add_parser('report', help="执行分析并生成文本分析报告")
+    _add_analysis_options(report)
+    report.add_argument('--output', default="analysis_report.txt", help="报告文件路径")
+    report.set_defaults(func=cmd_report)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db_config:
+        os.environ['TAOBAO_DB_CONFIG'] = args.db_config
+
+    tracing = bool(args.trace or args.chrome_trace)
+    if tracing:
+        from pipeline_trace import enable_tracing
+        enable_tracing(trace_file=args.trace, chrome_trace_file=args.chrome_trace,
+                       memory=None if args.trace_memory == 'none' else args.trace_memory)
+    try:
+        args.func(args)
+    finally:
+        if tracing:
+            from pipeline_trace import finish_tracing
+            finish_tracing(top=args.trace_top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
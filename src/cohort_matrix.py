@@ -0,0 +1,153 @@
+"""
+用户 × 月份活跃矩阵与同期群（cohort）留存分析
+矩阵按 CSR 格式保存（indptr/indices/data 三个numpy数组）：每个用户一行，行内为该用户有购买的月份编号（升序），
+data 为该月的购买次数。首购月份即每行的第一个编号，同期群留存表、留存曲线和复购率
+都由对这三个数组的 bincount/reduceat 得到，百万级用户也不需要逐组 groupby。
+安装了 scipy 时可用 to_scipy() 转换为 scipy.sparse.csr_matrix 做进一步计算
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _period_ordinals(values):
+    """月份列转换为月序号（自1970-01起的月数），缺失为 -1；支持 period[M]、日期和 'YYYY-MM' 字符串"""
+    if isinstance(values.dtype, pd.PeriodDtype):
+        periods = values.dt.asfreq('M')
+    else:
+        periods = pd.to_datetime(values, errors='coerce').dt.to_period('M')
+    ordinals = periods.array.asi8.copy()
+    ordinals[periods.isna().to_numpy()] = -1
+    return ordinals
+
+
+class ActivityMatrix:
+    """CSR 格式的用户 × 月份活跃矩阵
+
+    users 为每一行对应的用户ID，第 j 列对应月份 start + j；data 为该用户该月的购买次数
+    """
+
+    def __init__(self, indptr, indices, data, users, start, periods):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.users = users
+        self.start = start
+        self.periods = periods
+
+    @classmethod
+    def from_pairs(cls, users, ordinals):
+        """由每笔交易的 (用户, 月序号) 建立矩阵，月序号为 -1 或用户缺失的交易忽略"""
+        users = pd.Series(users).reset_index(drop=True)
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        keep = (ordinals >= 0) & users.notna().to_numpy()
+        codes, labels = pd.factorize(users[keep])
+        ordinals = ordinals[keep]
+        if len(ordinals) == 0:
+            return cls(np.zeros(1, np.int64), np.empty(0, np.int64), np.empty(0, np.int64),
+                       pd.Index([]), pd.NaT, 0)
+
+        start = ordinals.min()
+        periods = int(ordinals.max() - start + 1)
+        # (用户, 月份) 组合为一个整数键，排序去重后即按行、行内按列有序的CSR
+        keys, counts = np.unique(codes.astype(np.int64) * periods + (ordinals - start), return_counts=True)
+        rows = keys // periods
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(labels)))])
+        return cls(indptr, keys % periods, counts.astype(np.int64), pd.Index(labels),
+                   pd.Period(ordinal=int(start), freq='M'), periods)
+
+    @classmethod
+    def from_frame(cls, df, user_column='user_id', period_column='year_month'):
+        """由明细数据建立，period_column 可为 period[M] 列或日期列"""
+        return cls.from_pairs(df[user_column], _period_ordinals(df[period_column]))
+
+    # ==================== 行/列上的向量化统计 ====================
+    @property
+    def n_users(self):
+        return len(self.indptr) - 1
+
+    def period_labels(self, positions=None):
+        positions = np.arange(self.periods) if positions is None else positions
+        return [str(self.start + int(position)) for position in positions]
+
+    def first_periods(self):
+        """每个用户的首购月份编号（每行的第一个列编号）"""
+        return self.indices[self.indptr[:-1]]
+
+    def active_periods(self):
+        """每个用户有购买的月份数（每行的非零元个数）"""
+        return np.diff(self.indptr)
+
+    def purchases(self):
+        """每个用户的购买次数（每行 data 之和）"""
+        return np.add.reduceat(self.data, self.indptr[:-1]) if len(self.data) else np.empty(0, np.int64)
+
+    def _entry_rows(self):
+        return np.repeat(np.arange(self.n_users), self.active_periods())
+
+    def cohort_counts(self):
+        """同期群 × 距首购的月数 的活跃用户数矩阵（periods × periods）"""
+        cohorts = self.first_periods()[self._entry_rows()]
+        offsets = self.indices - cohorts
+        counts = np.bincount(cohorts * self.periods + offsets, minlength=self.periods * self.periods)
+        return counts.reshape(self.periods, self.periods)
+
+    def to_bitmap(self):
+        """按行打包的位图（n_users × ceil(periods/8) 字节），第 j 位表示该用户在第 j 个月有购买"""
+        dense = np.zeros((self.n_users, self.periods), dtype=bool)
+        dense[self._entry_rows(), self.indices] = True
+        return np.packbits(dense, axis=1)
+
+    def to_scipy(self):
+        """转换为 scipy.sparse.csr_matrix（需要安装 scipy）"""
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.data, self.indices, self.indptr), shape=(self.n_users, self.periods))
+
+    # ==================== 留存与复购 ====================
+    def retention_table(self, max_offset=None):
+        """同期群留存率表：行为首购月份，列为距首购的月数（0 列恒为1），尚未观察到的位置为 NaN"""
+        counts = self.cohort_counts().astype(np.float64)
+        sizes = counts[:, 0]
+        cohorts = np.flatnonzero(sizes > 0)
+        offsets = np.arange(self.periods if max_offset is None else min(max_offset + 1, self.periods))
+        table = counts[np.ix_(cohorts, offsets)] / sizes[cohorts, None]
+        # 首购月份 + 月数 超过最后一个月时无法观察
+        table[cohorts[:, None] + offsets[None, :] >= self.periods] = np.nan
+        return pd.DataFrame(table, index=pd.Index(self.period_labels(cohorts), name='cohort'),
+                            columns=pd.Index(offsets, name='months_since_first'))
+
+    def cohort_sizes(self):
+        """各同期群的用户数"""
+        sizes = np.bincount(self.first_periods(), minlength=self.periods)
+        cohorts = np.flatnonzero(sizes > 0)
+        return pd.Series(sizes[cohorts], index=pd.Index(self.period_labels(cohorts), name='cohort'),
+                         name='users')
+
+    def retention_curve(self):
+        """整体留存曲线：各月数上可观察的同期群按用户数加权的留存率"""
+        counts = self.cohort_counts()
+        sizes = counts[:, 0]
+        cohorts = np.arange(self.periods)
+        observable = cohorts[:, None] + cohorts[None, :] < self.periods
+        retained = np.where(observable, counts, 0).sum(axis=0)
+        base = np.where(observable, sizes[:, None], 0).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            curve = retained / base
+        return pd.Series(curve, index=pd.Index(cohorts, name='months_since_first'), name='retention')
+
+    def repeat_purchase(self):
+        """各同期群的复购情况：之后月份再次购买的用户（回购）和购买2次及以上的用户（多次购买）"""
+        first = self.first_periods()
+        users = np.bincount(first, minlength=self.periods)
+        returning = np.bincount(first, weights=self.active_periods() >= 2, minlength=self.periods)
+        multiple = np.bincount(first, weights=self.purchases() >= 2, minlength=self.periods)
+        cohorts = np.flatnonzero(users > 0)
+        frame = pd.DataFrame({
+            'cohort': self.period_labels(cohorts),
+            'users': users[cohorts],
+            'returning_users': returning[cohorts].astype(np.int64),
+            'multi_purchase_users': multiple[cohorts].astype(np.int64),
+        })
+        frame['returning_rate'] = frame['returning_users'] / frame['users']
+        frame['multi_purchase_rate'] = frame['multi_purchase_users'] / frame['users']
+        return frame
@@ -10,39 +10,69 @@
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime
-import mysql.connector 
-from mysql.connector import Error
+from functools import partial
 import warnings
 warnings.filterwarnings('ignore')
 
-plt.rcParams['font.sans-serif']=['SimHei', 'Microsoft YaHei', 'Arial Unicode MS']
-plt.rcParams['axes.unicode_minus'] = False
-sns.set_style("whitegrid")
-sns.set_palette("husl")
+from db_pool import DBConfigError, get_connection
+from db_stream import iter_table_chunks, read_table_parallel, DEFAULT_CHUNK_SIZE
+from snapshot_cache import load_table_cached
+from aggregation import AggregationPlan
+from sql_pushdown import pushdown_aggregates, pushdown_dataset_summary
+from schema import compact_frame
+from day_decode import decode_day_features
+from data_profile import describe_from_counts
+from distinct_sketch import approx_nunique
+from chart_render import render_charts, histogram_payload
+from pipeline_trace import trace_stage
+from rollup_cube import open_cube_store, refresh_cube
+from time_series import SalesTimeSeries
+from cohort_matrix import ActivityMatrix
+from stage_graph import StageGraph, GraphStage
 
-COLORS = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', 
-          '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
+# matplotlib/seaborn 只在 chart_render 的绘图函数中导入，mysql.connector 在用到时导入，
+# 不画图的命令（如生成报告）启动时不需要加载它们
+
+# 默认分析的表（或使用清洗后的表名）
+SOURCE_TABLE = "(sample)sam_tianchi_mum_baby_trade_history"
 
 def connect_to_database():
-    """连接到数据库"""
+    """连接到数据库（从共享连接池借出，close() 时归还连接池）"""
+    from mysql.connector import Error
     try:
-        connection = mysql.connector.connect(
-            host = "localhost",
-            user = "lanlala",
-            password = "197312zjf.",
-            database = "test"
-            )
+        connection = get_connection()
         print("数据库连接成功")
         return connection
+    except DBConfigError as e:
+        print(f"数据库配置错误：{e}")
+        return None
     except Error as e:
         print(f"连接失败：{e}")
         return None
 
-def load_data_from_table(connection,table_name,limit=None):
-    """从指定表中加载数据"""
+def load_data_from_table(connection,table_name,limit=None,chunk_size=None,key_columns=None,compact=False,
+                         workers=None,partitions=None,partition_column='day'):
+    """从指定表中加载数据
+
+    指定 chunk_size 时返回逐块产出DataFrame的迭代器，可交给 preprocess_chunks 继续处理；
+    指定 workers 时按 partition_column 的取值范围切分为 partitions 个分区，用连接池并行读取；
+    compact=True 时按 schema 中的紧凑类型方案转换
+    """
+    from mysql.connector import Error
+    if workers and not limit:
+        partitions = partitions or workers * 2
+        print(f"并行读取模式: {partitions} 个分区, {workers} 个线程")
+        df = read_table_parallel(table_name, partition_column=partition_column, partitions=partitions,
+                                 workers=workers, chunk_size=chunk_size or DEFAULT_CHUNK_SIZE)
+        print(f"成功读取到{len(df)}行数据")
+        return compact_frame(df) if compact else df
+    
+    if chunk_size:
+        print(f"流式读取模式: 每块 {chunk_size} 行")
+        return iter_table_chunks(connection, table_name, chunk_size=chunk_size,
+                                 key_columns=key_columns, limit=limit)
+    
     if limit:
         query = f"SELECT * FROM `{table_name}` LIMIT {limit}"
     else:
@@ -51,13 +81,22 @@ def load_data_from_table(connection,table_name,limit=None):
     try:
         df = pd.read_sql(query,connection)
         print(f"成功读取到{len(df)}行数据")
+        if compact:
+            df = compact_frame(df)
         return df
     except Error as e:
         print(f"读取失败：{e}")
         return None
 
-def preprocess_data(df):
-    """数据预处理"""
+def _distinct_count(values, approx=False):
+    """不同取值个数；approx=True 时用 HyperLogLog 估计，结果打印时附带误差界"""
+    return approx_nunique(values) if approx else values.nunique()
+
+def preprocess_data(df, approx_distinct=False):
+    """数据预处理
+
+    approx_distinct=True 时用户数、类别数为 HyperLogLog 近似值
+    """
     if df is None or len(df) == 0 :
         print("数据为空，无法处理！")
         return None
@@ -66,36 +105,77 @@ def preprocess_data(df):
     
     print("进行数据预处理……")
     
+    _transform_frame(df_processed)
+        
+    print(f"\n数据基本信息:")
+    print(f"数据形状: {df_processed.shape}")
+    print(f"时间范围: {df_processed['day'].min()} 到 {df_processed['day'].max()}")
+    print(f"用户数量: {_distinct_count(df_processed['user_id'], approx_distinct)}")
+    print(f"商品类别数: {_distinct_count(df_processed['cat1'], approx_distinct)}")
+    
+    return df_processed
+
+def _transform_frame(df_processed, verbose=True):
+    """类型转换与时间衍生特征（原地修改）"""
     if 'user_id' in df_processed.columns:
-        df_processed['user_id'] = df_processed['user_id'].astype(str)
+        if isinstance(df_processed['user_id'].dtype, pd.CategoricalDtype):
+            # 字典编码的ID只转换类别本身，保持紧凑存储
+            df_processed['user_id'] = df_processed['user_id'].cat.rename_categories(str)
+        else:
+            df_processed['user_id'] = df_processed['user_id'].astype(str)
     
     if 'day' in df_processed.columns:
         try:
-            df_processed['day'] = pd.to_datetime(
-                df_processed['day'].astype(str), 
-                format='%Y%m%d', 
-                errors='coerce'
-            )
-            print(f"已将day列转换为日期格式")
+            # 每个不同的YYYYMMDD取值只解析一次，衍生特征一并算出
+            calendar = decode_day_features(df_processed['day'])
+            for column in calendar.columns:
+                df_processed[column] = calendar[column]
+            if verbose:
+                print(f"已将day列转换为日期格式")
+                print(f"已创建时间衍生特征")
         except Exception as e:
             print(f"day列转换失败: {e}")
     
-    if pd.api.types.is_datetime64_any_dtype(df_processed.get('day')):
-        df_processed['year'] = df_processed['day'].dt.year
-        df_processed['month'] = df_processed['day'].dt.month
-        df_processed['year_month'] = df_processed['day'].dt.to_period('M')
-        df_processed['weekday'] = df_processed['day'].dt.weekday
-        print(f"已创建时间衍生特征")
-        
-    print(f"\n数据基本信息:")
-    print(f"数据形状: {df_processed.shape}")
-    print(f"时间范围: {df_processed['day'].min()} 到 {df_processed['day'].max()}")
-    print(f"用户数量: {df_processed['user_id'].nunique()}")
-    print(f"商品类别数: {df_processed['cat1'].nunique()}")
-    
     return df_processed
 
-def analyze_sales_trend(df):
+def preprocess_chunks(chunks):
+    """对流式读取的数据块逐块预处理，返回新的块迭代器"""
+    for chunk in chunks:
+        if chunk is None or len(chunk) == 0:
+            continue
+        yield _transform_frame(chunk, verbose=False)
+
+def build_aggregation_plan():
+    """登记各分析函数需要的分组指标，每个分组键只扫描一次
+
+    每个用户的类别数/活跃天数始终精确计算：每个用户的不同取值很少，保存 (用户, 取值) 对
+    比为每个用户保存一份 HyperLogLog 寄存器占用的内存更少
+    """
+    plan = AggregationPlan()
+    # analyze_sales_trend
+    plan.add('year_month', 'sum', 'buy_mount')
+    plan.add('day', 'sum', 'buy_mount')
+    # analyze_product_categories
+    plan.add('cat1', 'sum', 'buy_mount')
+    plan.add('cat1', 'count', 'auction_id')
+    # analyze_user_behavior
+    plan.add('user_id', 'size')
+    plan.add('user_id', 'sum', 'buy_mount')
+    plan.add('user_id', 'nunique', 'cat1')
+    plan.add('user_id', 'nunique', 'day')
+    return plan
+
+def compute_shared_aggregates(data):
+    """执行共享聚合计划，data 可为DataFrame或预处理后的数据块迭代器"""
+    return build_aggregation_plan().execute(data)
+
+def _from_aggregates(aggregates, key, columns):
+    """从共享聚合结果中取出指定分组键的指标并重命名，没有时返回None"""
+    if not aggregates or key not in aggregates:
+        return None
+    return aggregates[key][[key] + list(columns)].rename(columns=columns)
+
+def analyze_sales_trend(df, aggregates=None):
     """分析销售趋势"""
     print("\n"+"="*60)
     print("销售趋势分析")
@@ -103,8 +183,10 @@ def analyze_sales_trend(df):
     
     results = {}
     
-    if 'year_month' in df.columns and 'buy_mount' in df.columns:
+    monthly_sales = _from_aggregates(aggregates, 'year_month', {'sum_buy_mount': 'buy_mount'})
+    if monthly_sales is None and df is not None and 'year_month' in df.columns and 'buy_mount' in df.columns:
         monthly_sales = df.groupby('year_month')['buy_mount'].sum().reset_index()
+    if monthly_sales is not None:
         monthly_sales['year_month'] = monthly_sales['year_month'].astype(str)
         results['monthly_sales'] = monthly_sales
     
@@ -112,13 +194,51 @@ def analyze_sales_trend(df):
     for idx, row in monthly_sales.tail(5).iterrows():
         print(f"{row['year_month']}: {row['buy_mount']} 件")
     
-    if 'day' in df.columns:
+    daily_sales = _from_aggregates(aggregates, 'day', {'sum_buy_mount': 'buy_mount'})
+    if daily_sales is None and df is not None and 'day' in df.columns:
         daily_sales = df.groupby('day')['buy_mount'].sum().reset_index()
+    if daily_sales is not None:
         results['daily_sales'] = daily_sales
+        results.update(analyze_sales_dynamics(daily_sales))
     
     return results
 
-def analyze_product_categories(df):
+def analyze_sales_dynamics(daily_sales):
+    """在稠密日历数组上计算滚动窗口、周/月环比与同比、季节指数和峰值（含双十一）"""
+    series = SalesTimeSeries.from_frame(daily_sales)
+    if len(series.values) == 0:
+        return {}
+    
+    results = {
+        'rolling_sales': series.rolling_frame(),
+        'weekly_sales': series.weekly(),
+        'monthly_growth': series.monthly(),
+        'seasonality': series.seasonality(),
+        'sales_peaks': {grain: series.peaks(grain) for grain in ('day', 'week', 'month')},
+        'double_eleven': series.double_eleven(),
+    }
+    
+    rolling = results['rolling_sales'].iloc[-1]
+    print(f"\n截至 {rolling['day'].date()}: 近7天日均 {rolling['rolling_7']:.1f} 件, 近30天日均 {rolling['rolling_30']:.1f} 件")
+    weekly = results['weekly_sales'].dropna(subset=['wow_growth'])
+    if len(weekly):
+        last = weekly.iloc[-1]
+        print(f"最近完整周 {last['week'].date()}: 环比 {last['wow_growth']:+.1%}"
+              + (f", 同比 {last['yoy_growth']:+.1%}" if pd.notna(last['yoy_growth']) else ""))
+    monthly = results['monthly_growth'].dropna(subset=['yoy_growth'])
+    if len(monthly):
+        last = monthly.iloc[-1]
+        print(f"最近完整月 {last['year_month']}: 同比 {last['yoy_growth']:+.1%}")
+    month_index = results['seasonality']['month'].dropna()
+    if len(month_index):
+        print(f"季节指数最高的月份: {month_index.idxmax()}月 ({month_index.max():.2f})")
+    for _, row in results['double_eleven'].iterrows():
+        print(f"双十一 {row['day'].year}: {row['buy_mount']:.0f} 件, 为前30天日均的 {row['lift']:.1f} 倍"
+              + (" (日峰值)" if row['is_peak'] else ""))
+    
+    return results
+
+def analyze_product_categories(df, aggregates=None):
     """分析商品类别"""
     print("\n"+"="*60)
     print("商品类别分析")
@@ -126,12 +246,18 @@ def analyze_product_categories(df):
     
     results = {}
     
-    if 'cat1' in df.columns:
+    category_sales = _from_aggregates(aggregates, 'cat1', {
+        'sum_buy_mount': 'total_quantity',
+        'count_auction_id': 'transaction_count'
+        })
+    if category_sales is None and df is not None and 'cat1' in df.columns:
         category_sales = df.groupby('cat1').agg({
             'buy_mount':'sum',
             'auction_id':'count'
             }).reset_index()
         category_sales.columns = ['cat1', 'total_quantity', 'transaction_count']
+    
+    if category_sales is not None:
         category_sales = category_sales.sort_values('total_quantity', ascending=False)
         results['category_sales'] = category_sales
         
@@ -141,7 +267,50 @@ def analyze_product_categories(df):
     
     return results
 
-def analyze_user_behavior(df):
+# 用户价值分层：(分位数阈值, 标签)，购买总量高于该分位数即归入对应层级
+USER_VALUE_TIERS = [(0.8, '高价值用户'), (0.5, '中价值用户')]
+DEFAULT_USER_TIER = '低价值用户'
+
+def segment_users(values, tiers=USER_VALUE_TIERS, default=DEFAULT_USER_TIER):
+    """按分位数阈值批量划分用户层级
+
+    阈值只计算一次，再用 np.select 一次性分配层级，按从高到低的顺序匹配
+    """
+    values = np.asarray(values, dtype=float)
+    tiers = sorted(tiers, key=lambda tier: tier[0], reverse=True)
+    if len(values) == 0:
+        return np.array([], dtype=object)
+    thresholds = np.nanquantile(values, [q for q, _ in tiers])
+    conditions = [values > threshold for threshold in thresholds]
+    return np.select(conditions, [label for _, label in tiers], default=default).astype(object)
+
+def compute_rfm_scores(df, bins=5, reference_day=None):
+    """RFM评分：最近购买间隔(R)、购买频次(F)、购买总量(M)
+
+    每个指标按排名分为 1~bins 分，R 越近分越高；reference_day 默认为数据中的最后一天
+    """
+    rfm = df.groupby('user_id').agg(
+        last_day=('day', 'max'),
+        frequency=('day', 'size'),
+        monetary=('buy_mount', 'sum')
+    ).reset_index()
+    
+    if reference_day is None:
+        reference_day = rfm['last_day'].max()
+    rfm['recency'] = (reference_day - rfm['last_day']).dt.days
+    
+    def score(series, ascending=True):
+        pct = series.rank(method='first', ascending=ascending, pct=True)
+        return np.ceil(pct * bins).fillna(1).astype(int)
+    
+    rfm['r_score'] = score(rfm['recency'], ascending=False)
+    rfm['f_score'] = score(rfm['frequency'])
+    rfm['m_score'] = score(rfm['monetary'])
+    rfm['rfm_score'] = rfm['r_score'] + rfm['f_score'] + rfm['m_score']
+    
+    return rfm
+
+def analyze_user_behavior(df, tiers=USER_VALUE_TIERS, rfm=False, aggregates=None):
     """分析用户购买行为"""
     print("\n" + "="*60)
     print("用户行为分析")
@@ -149,27 +318,28 @@ def analyze_user_behavior(df):
     
     results = {}
     
-    if 'user_id' in df.columns:
-        user_purchase_count = df.groupby('user_id').size().reset_index(name='purchase_count')
-        user_purchase_count = user_purchase_count.sort_values('purchase_count', ascending=False)
-        results['user_purchase_count'] = user_purchase_count
+    user_purchase_count = _from_aggregates(aggregates, 'user_id', {'size': 'purchase_count'})
+    user_stats = _from_aggregates(aggregates, 'user_id', {
+        'sum_buy_mount': 'total_quantity',
+        'nunique_cat1': 'unique_categories',
+        'nunique_day': 'active_days'
+        })
     
+    if user_stats is None and df is not None and 'user_id' in df.columns:
+        user_purchase_count = df.groupby('user_id').size().reset_index(name='purchase_count')
+        
         user_stats = df.groupby('user_id').agg({
                    'buy_mount': 'sum',
                    'cat1': 'nunique',
                    'day': 'nunique'
                     }).reset_index()
         user_stats.columns = ['user_id', 'total_quantity', 'unique_categories', 'active_days']
+    
+    if user_stats is not None:
+        user_purchase_count = user_purchase_count.sort_values('purchase_count', ascending=False)
+        results['user_purchase_count'] = user_purchase_count
         
-        def classify_user(row):
-            if row['total_quantity'] > user_stats['total_quantity'].quantile(0.8):
-                return '高价值用户'
-            elif row['total_quantity'] > user_stats['total_quantity'].quantile(0.5):
-                return '中价值用户'
-            else:
-                return '低价值用户'
-            
-        user_stats['user_type'] = user_stats.apply(classify_user, axis=1)
+        user_stats['user_type'] = segment_users(user_stats['total_quantity'], tiers)
         results['user_stats'] = user_stats
         
         print(f"最活跃的用户 (购买次数):")
@@ -178,170 +348,189 @@ def analyze_user_behavior(df):
         
         print(f"\n用户分层统计:")
         print(user_stats['user_type'].value_counts().to_string())
+        
+        if rfm and df is not None and 'day' in df.columns:
+            results['user_rfm'] = compute_rfm_scores(df)
+            print(f"\nRFM总分分布:")
+            print(results['user_rfm']['rfm_score'].value_counts().sort_index().to_string())
     
     return results
 
-def analyze_purchase_patterns(df):
-    """分析购买模式"""
+def analyze_user_retention(df, milestones=(1, 3, 6, 12)):
+    """按首购月份的同期群留存与复购分析（基于稀疏的 用户 × 月份 活跃矩阵）"""
     print("\n" + "="*60)
-    print("购买模式分析")
+    print("同期群留存分析")
     print("="*60)
     
     results = {}
+    if df is None or 'year_month' not in df.columns:
+        print("没有明细数据，跳过同期群留存分析")
+        return results
+    
+    activity = ActivityMatrix.from_frame(df)
+    if activity.n_users == 0:
+        return results
+    results['cohort_retention'] = activity.retention_table()
+    results['cohort_sizes'] = activity.cohort_sizes()
+    results['retention_curve'] = activity.retention_curve()
+    results['repeat_purchase'] = activity.repeat_purchase()
+    
+    print(f"活跃矩阵: {activity.n_users} 个用户 × {activity.periods} 个月, {len(activity.indices)} 个非零元")
+    curve = results['retention_curve']
+    for months in milestones:
+        if months in curve.index and pd.notna(curve[months]):
+            print(f"首购后第 {months} 个月留存率: {curve[months]:.1%}")
+    repeat = results['repeat_purchase']
+    print(f"之后月份再次购买的用户占比: {repeat['returning_users'].sum() / repeat['users'].sum():.1%}")
     
-    if 'buy_mount' in df.columns:
-       purchase_distribution = df['buy_mount'].describe()
-       results['purchase_distribution'] = purchase_distribution
-       
-       print(f"购买数量统计:")
-       print(f"平均值: {purchase_distribution['mean']:.2f}")
-       print(f"中位数: {purchase_distribution['50%']:.2f}")
-       print(f"最大值: {purchase_distribution['max']}")
-       print(f"最小值: {purchase_distribution['min']}")
-       
-       bins = [0, 1, 5, 10, 20, 50, 100, 1000]
-       labels = ['1件', '2-5件', '6-10件', '11-20件', '21-50件', '51-100件', '100+件']
-       df['buy_mount_group'] = pd.cut(df['buy_mount'], bins=bins, labels=labels, right=False)
-       results['buy_mount_groups'] = df['buy_mount_group'].value_counts()
-   
     return results
 
-def create_visualizations(df, analysis_results):
-    """创建可视化图表"""
+def analyze_purchase_patterns(df, buy_mount_counts=None):
+    """分析购买模式
+
+    提供 buy_mount_counts（购买数量取值频次，如SQL下推结果）时无需明细数据
+    """
     print("\n" + "="*60)
-    print("生成可视化图表")
+    print("购买模式分析")
     print("="*60)
     
-    import os
-    output_dir = "visualization_results"
-    os.makedirs(output_dir, exist_ok=True)
+    results = {}
     
-    # 1. 月度销售趋势图
+    bins = [0, 1, 5, 10, 20, 50, 100, 1000]
+    labels = ['1件', '2-5件', '6-10件', '11-20件', '21-50件', '51-100件', '100+件']
+    
+    if buy_mount_counts is not None:
+        purchase_distribution = describe_from_counts(buy_mount_counts)
+        groups = pd.cut(buy_mount_counts.index, bins=bins, labels=labels, right=False)
+        buy_mount_groups = buy_mount_counts.groupby(groups, observed=False).sum()
+        results['buy_mount_groups'] = buy_mount_groups.sort_values(ascending=False).rename_axis('buy_mount_group')
+        results['buy_mount_counts'] = buy_mount_counts
+    elif df is not None and 'buy_mount' in df.columns:
+        purchase_distribution = df['buy_mount'].describe()
+        # 不向 df 添加列：各分析阶段可能并发读取同一个 df
+        buy_mount_group = pd.cut(df['buy_mount'], bins=bins, labels=labels, right=False).rename('buy_mount_group')
+        results['buy_mount_groups'] = buy_mount_group.value_counts()
+    else:
+        return results
+    
+    results['purchase_distribution'] = purchase_distribution
+    
+    print(f"购买数量统计:")
+    print(f"平均值: {purchase_distribution['mean']:.2f}")
+    print(f"中位数: {purchase_distribution['50%']:.2f}")
+    print(f"最大值: {purchase_distribution['max']}")
+    print(f"最小值: {purchase_distribution['min']}")
+   
+    return results
+
+def _list_of(values):
+    """转换为可JSON序列化的Python列表（numpy标量转为原生类型）"""
+    return pd.Series(values).tolist()
+
+def build_chart_payloads(df, analysis_results, top_categories=10, dashboard_categories=8, top_users=10,
+                         max_cohorts=24, max_offsets=13):
+    """为每张图表准备只包含绘图所需数据的小型payload"""
+    payloads = {}
+    
+    monthly = None
     if 'monthly_sales' in analysis_results:
-        fig, ax = plt.subplots(figsize=(12, 6))
         monthly_data = analysis_results['monthly_sales']
-        
-        ax.bar(range(len(monthly_data)), monthly_data['buy_mount'], color=COLORS[0])
-        ax.set_xlabel('月份')
-        ax.set_ylabel('购买总量')
-        ax.set_title('月度购买趋势')
-        ax.set_xticks(range(len(monthly_data)))
-        ax.set_xticklabels(monthly_data['year_month'], rotation=45, ha='right')
-        ax.grid(axis='y', alpha=0.3)
-        
-        plt.tight_layout()
-        plt.savefig(f'{output_dir}/monthly_sales_trend.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        print(f"已保存: {output_dir}/monthly_sales_trend.png")
+        monthly = {
+            'year_month': _list_of(monthly_data['year_month'].astype(str)),
+            'buy_mount': _list_of(monthly_data['buy_mount']),
+        }
+        payloads['monthly_sales_trend'] = monthly
     
-    # 2. 商品类别销售图
+    categories = None
     if 'category_sales' in analysis_results:
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-        category_data = analysis_results['category_sales'].head(10)
-        
-        # 左图：购买量
-        ax1.barh(range(len(category_data)), category_data['total_quantity'], color=COLORS[1])
-        ax1.set_yticks(range(len(category_data)))
-        ax1.set_yticklabels(category_data['cat1'])
-        ax1.set_xlabel('购买总量')
-        ax1.set_title('Top 10 商品类别 (按购买量)')
-        ax1.invert_yaxis()
-        
-        # 右图：交易次数
-        ax2.barh(range(len(category_data)), category_data['transaction_count'], color=COLORS[2])
-        ax2.set_yticks(range(len(category_data)))
-        ax2.set_yticklabels(category_data['cat1'])
-        ax2.set_xlabel('交易次数')
-        ax2.set_title('Top 10 商品类别 (按交易次数)')
-        ax2.invert_yaxis()
-        
-        plt.tight_layout()
-        plt.savefig(f'{output_dir}/top_categories.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        print(f"已保存: {output_dir}/top_categories.png")
+        category_data = analysis_results['category_sales']
+        top = category_data.head(top_categories)
+        payloads['top_categories'] = {
+            'cat1': _list_of(top['cat1'].astype(str)),
+            'total_quantity': _list_of(top['total_quantity']),
+            'transaction_count': _list_of(top['transaction_count']),
+        }
+        top = category_data.head(dashboard_categories)
+        categories = {
+            'cat1': _list_of(top['cat1'].astype(str)),
+            'total_quantity': _list_of(top['total_quantity']),
+        }
     
-    # 3. 用户购买行为图
     if 'user_stats' in analysis_results:
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
-        user_stats = analysis_results['user_stats']
-        
-        # 左图：用户类型分布
-        user_type_counts = user_stats['user_type'].value_counts()
-        ax1.pie(user_type_counts.values, labels=user_type_counts.index, 
-                autopct='%1.1f%%', colors=COLORS[:3], startangle=90)
-        ax1.set_title('用户价值分层分布')
-        
-        # 右图：购买数量分布
+        user_type_counts = analysis_results['user_stats']['user_type'].value_counts()
+        payload = {
+            'user_type_labels': _list_of(user_type_counts.index.astype(str)),
+            'user_type_counts': _list_of(user_type_counts.values),
+        }
         if 'buy_mount_groups' in analysis_results:
             buy_groups = analysis_results['buy_mount_groups']
-            ax2.bar(range(len(buy_groups)), buy_groups.values, color=COLORS[3])
-            ax2.set_xlabel('购买数量区间')
-            ax2.set_ylabel('交易次数')
-            ax2.set_title('购买数量分布')
-            ax2.set_xticks(range(len(buy_groups)))
-            ax2.set_xticklabels(buy_groups.index, rotation=45, ha='right')
-        
-        plt.tight_layout()
-        plt.savefig(f'{output_dir}/user_behavior.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        print(f"已保存: {output_dir}/user_behavior.png")
-    
-    # 4. 综合仪表板（多子图）
-    fig = plt.figure(figsize=(15, 10))
-    
-    # 子图1：月度趋势
-    ax1 = plt.subplot(2, 2, 1)
-    if 'monthly_sales' in analysis_results:
-        monthly_data = analysis_results['monthly_sales']
-        ax1.plot(range(len(monthly_data)), monthly_data['buy_mount'], 
-                marker='o', linewidth=2, color=COLORS[0])
-        ax1.set_title('月度销售趋势', fontsize=12, fontweight='bold')
-        ax1.set_xlabel('月份')
-        ax1.set_ylabel('购买总量')
-        ax1.grid(True, alpha=0.3)
-        ax1.set_xticks(range(len(monthly_data)))
-        ax1.set_xticklabels(monthly_data['year_month'], rotation=45, ha='right')
-    
-    # 子图2：商品类别
-    ax2 = plt.subplot(2, 2, 2)
-    if 'category_sales' in analysis_results:
-        category_data = analysis_results['category_sales'].head(8)
-        ax2.barh(range(len(category_data)), category_data['total_quantity'], color=COLORS[1:9])
-        ax2.set_yticks(range(len(category_data)))
-        ax2.set_yticklabels(category_data['cat1'])
-        ax2.set_title('Top 8 商品类别', fontsize=12, fontweight='bold')
-        ax2.set_xlabel('购买总量')
-        ax2.invert_yaxis()
-    
-    # 子图3：购买数量分布
-    ax3 = plt.subplot(2, 2, 3)
-    if 'buy_mount' in df.columns:
-        ax3.hist(df['buy_mount'], bins=30, color=COLORS[4], edgecolor='black', alpha=0.7)
-        ax3.set_title('购买数量分布', fontsize=12, fontweight='bold')
-        ax3.set_xlabel('购买数量')
-        ax3.set_ylabel('频次')
-        ax3.grid(True, alpha=0.3)
-    
-    # 子图4：用户活跃度
-    ax4 = plt.subplot(2, 2, 4)
+            payload['buy_group_labels'] = _list_of(buy_groups.index.astype(str))
+            payload['buy_group_counts'] = _list_of(buy_groups.values)
+        payloads['user_behavior'] = payload
+    
+    if 'cohort_retention' in analysis_results:
+        # 只画最近的同期群和首购后一年内的留存，未观察到的位置为None
+        retention = analysis_results['cohort_retention'].tail(max_cohorts).iloc[:, :max_offsets]
+        payloads['cohort_retention'] = {
+            'cohorts': _list_of(retention.index.astype(str)),
+            'offsets': _list_of(retention.columns),
+            'retention': [[None if pd.isna(value) else float(value) for value in row]
+                          for row in retention.to_numpy()],
+        }
+    
+    # 直方图在主进程中分箱，渲染进程只接收30个箱的频次
+    histogram = None
+    if df is None and 'buy_mount_counts' in analysis_results:
+        histogram = histogram_payload(counts=analysis_results['buy_mount_counts'])
+    elif df is not None and 'buy_mount' in df.columns:
+        histogram = histogram_payload(values=df['buy_mount'])
+    
+    users = None
     if 'user_purchase_count' in analysis_results:
-        user_data = analysis_results['user_purchase_count'].head(10)
-        ax4.bar(range(len(user_data)), user_data['purchase_count'], color=COLORS[5])
-        ax4.set_title('Top 10 活跃用户', fontsize=12, fontweight='bold')
-        ax4.set_xlabel('用户排名')
-        ax4.set_ylabel('购买次数')
-        ax4.set_xticks(range(len(user_data)))
-        ax4.set_xticklabels([f"用户{i+1}" for i in range(len(user_data))], rotation=45, ha='right')
-    
-    plt.suptitle('淘宝母婴数据分析仪表板', fontsize=16, fontweight='bold', y=1.02)
-    plt.tight_layout()
-    plt.savefig(f'{output_dir}/analysis_dashboard.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print(f"已保存: {output_dir}/analysis_dashboard.png")
-    print(f"所有图表已保存到 '{output_dir}' 目录")
+        users = _list_of(analysis_results['user_purchase_count'].head(top_users)['purchase_count'])
+    
+    payloads['analysis_dashboard'] = {
+        'monthly': monthly,
+        'categories': categories,
+        'histogram': histogram,
+        'top_users': users,
+    }
+    return payloads
+
+def create_visualizations(df, analysis_results, output_dir="visualization_results", fmt='png', dpi=300,
+                          workers=4, use_cache=True):
+    """创建可视化图表
+
+    各图表在独立进程中并行渲染，输入未变化的图表跳过重绘；
+    fmt/dpi 可调，如 fmt='png', dpi=100 生成预览图，fmt='svg' 用于报告
+    """
+    print("\n" + "="*60)
+    print("生成可视化图表")
+    print("="*60)
     
-def generate_analysis_report(df, analysis_results, report_file="analysis_report.txt"):
-    """生成分析报告"""
+    payloads = build_chart_payloads(df, analysis_results)
+    outputs = render_charts(payloads, output_dir=output_dir, fmt=fmt, dpi=dpi,
+                            workers=workers, use_cache=use_cache)
+    print(f"所有图表已保存到 '{output_dir}' 目录")
+    return outputs
+    
+def _dataset_overview(df, analysis_results, approx_distinct=False):
+    """数据集概况：有明细数据时直接统计，否则使用SQL下推的 dataset_summary"""
+    if df is None:
+        return analysis_results['dataset_summary']
+    return {
+        'rows': len(df),
+        'users': _distinct_count(df['user_id'], approx_distinct),
+        'categories': _distinct_count(df['cat1'], approx_distinct),
+        'day_min': df['day'].min(),
+        'day_max': df['day'].max(),
+    }
+
+def generate_analysis_report(df, analysis_results, report_file="analysis_report.txt", approx_distinct=False):
+    """生成分析报告
+
+    approx_distinct=True 时用户数、类别数为 HyperLogLog 近似值，数值后附带95%误差界
+    """
     with open(report_file, 'w', encoding='utf-8') as f:
         f.write("="*70 + "\n")
         f.write("淘宝母婴数据分析报告\n")
@@ -351,10 +540,11 @@ def generate_analysis_report(df, analysis_results, report_file="analysis_report.
         
         f.write("1.数据集概况\n")
         f.write("-"*40 + "\n")
-        f.write(f"总交易记录数: {len(df)} 条\n")
-        f.write(f"用户数量: {df['user_id'].nunique()} 人\n")
-        f.write(f"商品类别数: {df['cat1'].nunique()} 类\n")
-        f.write(f"时间范围: {df['day'].min()} 到 {df['day'].max()}\n\n")
+        overview = _dataset_overview(df, analysis_results, approx_distinct)
+        f.write(f"总交易记录数: {overview['rows']} 条\n")
+        f.write(f"用户数量: {overview['users']} 人\n")
+        f.write(f"商品类别数: {overview['categories']} 类\n")
+        f.write(f"时间范围: {overview['day_min']} 到 {overview['day_max']}\n\n")
         
         f.write("2.关键发现\n")
         f.write("-"*40 + "\n")
@@ -365,12 +555,25 @@ def generate_analysis_report(df, analysis_results, report_file="analysis_report.
             best_month = monthly_data.loc[monthly_data['buy_mount'].idxmax()]
             f.write(f"销售最高的月份: {best_month['year_month']}, 销量: {best_month['buy_mount']} 件\n")
         
+        if 'seasonality' in analysis_results:
+            month_index = analysis_results['seasonality']['month'].dropna()
+            if len(month_index):
+                f.write(f"季节指数最高的月份: {month_index.idxmax()}月, 季节指数: {month_index.max():.2f}\n")
+        
+        if 'double_eleven' in analysis_results and len(analysis_results['double_eleven']):
+            double_eleven = analysis_results['double_eleven']
+            f.write(f"双十一当天销量为前30天日均的 {double_eleven['lift'].min():.1f}~{double_eleven['lift'].max():.1f} 倍"
+                    f"（{len(double_eleven)} 年）\n")
+        
         # 商品分析
         if 'category_sales' in analysis_results:
             category_data = analysis_results['category_sales']
             top_category = category_data.iloc[0]
             f.write(f"最畅销的商品类别: {top_category['cat1']}, 总销量: {top_category['total_quantity']} 件\n")
         
+        if 'retention_curve' in analysis_results and 1 in analysis_results['retention_curve'].index:
+            f.write(f"首购次月留存率: {analysis_results['retention_curve'][1]:.1%}\n")
+        
         # 用户分析
         if 'user_stats' in analysis_results:
             user_stats = analysis_results['user_stats']
@@ -386,8 +589,236 @@ def generate_analysis_report(df, analysis_results, report_file="analysis_report.
     
     print(f"分析报告已保存到: {report_file}")
 
-def main():
-    """主函数"""
+def load_analysis_frame(conn, table_name, limit=None, chunk_size=None, workers=None, approx_distinct=False):
+    """读取并预处理明细数据，返回紧凑类型的DataFrame（失败时返回None）
+
+    读取整表时使用本地快照缓存；指定 limit 时直接读取数据库；
+    并行读取时 chunk_size 为每个分区内的批大小（不并行的流式读取见 load_streaming_context）
+    """
+    if limit:
+        df_raw = load_data_from_table(conn, table_name, limit=limit, workers=workers)
+        if df_raw is not None:
+            df_raw = compact_frame(df_raw)
+    else:
+        df_raw = load_table_cached(conn, table_name,
+                                   lambda: load_data_from_table(conn, table_name, compact=True, workers=workers,
+                                                                chunk_size=chunk_size))
+    
+    if df_raw is None or len(df_raw) == 0:
+        print("无法读取数据")
+        return None
+    
+    # 数据预处理（衍生的时间特征同样压缩为窄整数）
+    df = preprocess_data(df_raw, approx_distinct=approx_distinct)
+    if df is None:
+        return None
+    return compact_frame(df)
+
+# ==================== 分析任务图 ====================
+# 各分析阶段产出的结果键
+SALES_TREND_KEYS = ('monthly_sales', 'daily_sales', 'rolling_sales', 'weekly_sales', 'monthly_growth',
+                    'seasonality', 'sales_peaks', 'double_eleven')
+CATEGORY_KEYS = ('category_sales',)
+USER_BEHAVIOR_KEYS = ('user_purchase_count', 'user_stats', 'user_rfm')
+USER_RETENTION_KEYS = ('cohort_retention', 'cohort_sizes', 'retention_curve', 'repeat_purchase')
+PURCHASE_PATTERN_KEYS = ('buy_mount_groups', 'purchase_distribution')
+
+# 图表和报告读取的结果键（作为可选输入，只运行部分分析时使用已有的结果）
+CHART_KEYS = ('monthly_sales', 'category_sales', 'user_stats', 'buy_mount_groups', 'user_purchase_count',
+              'cohort_retention')
+REPORT_KEYS = ('monthly_sales', 'seasonality', 'double_eleven', 'category_sales', 'retention_curve', 'user_stats')
+
+# 汇总立方体模式下可以执行的分析
+CUBE_STAGES = ('sales_trend', 'product_categories')
+
+# 只能基于明细数据执行的分析（下推模式下默认跳过）
+DETAIL_ONLY_STAGES = ('user_retention',)
+
+def _aggregate_stage(df):
+    return {'aggregates': compute_shared_aggregates(df)}
+
+def _purchase_patterns_stage(df, buy_mount_counts):
+    # buy_mount_counts 是读取阶段给出的输入，不作为本阶段的结果重复产出
+    results = analyze_purchase_patterns(df, buy_mount_counts)
+    results.pop('buy_mount_counts', None)
+    return results
+
+def _collect_results(context, keys):
+    return {key: context[key] for key in keys if context.get(key) is not None}
+
+def _visualize_stage(df, buy_mount_counts=None, options=None, **results):
+    analysis_results = _collect_results(results, CHART_KEYS)
+    if buy_mount_counts is not None:
+        analysis_results['buy_mount_counts'] = buy_mount_counts
+    return {'chart_files': create_visualizations(df, analysis_results, **(options or {}))}
+
+def _report_stage(df, dataset_summary=None, report_file="analysis_report.txt", approx_distinct=False, **results):
+    analysis_results = _collect_results(results, REPORT_KEYS)
+    if dataset_summary is not None:
+        analysis_results['dataset_summary'] = dataset_summary
+    generate_analysis_report(df, analysis_results, report_file=report_file, approx_distinct=approx_distinct)
+    return {'report_file': report_file}
+
+def build_analysis_graph(approx_distinct=False, plots=None, report=None):
+    """分析阶段的任务图：每个阶段声明读取的键和产出的结果键
+
+    plots 为 create_visualizations 的参数字典，report 为报告参数字典（report_file），为None时不加入对应阶段
+    """
+    graph = StageGraph(trace_prefix='analyze')
+    graph.add(GraphStage('aggregate', _aggregate_stage, inputs=('df',), outputs=('aggregates',)))
+    graph.add(GraphStage('sales_trend', analyze_sales_trend,
+                         inputs=('df', 'aggregates'), outputs=SALES_TREND_KEYS))
+    graph.add(GraphStage('product_categories', analyze_product_categories,
+                         inputs=('df', 'aggregates'), outputs=CATEGORY_KEYS))
+    graph.add(GraphStage('user_behavior', analyze_user_behavior,
+                         inputs=('df', 'aggregates'), outputs=USER_BEHAVIOR_KEYS))
+    graph.add(GraphStage('user_retention', analyze_user_retention,
+                         inputs=('df',), outputs=USER_RETENTION_KEYS))
+    graph.add(GraphStage('purchase_patterns', _purchase_patterns_stage,
+                         inputs=('df', 'buy_mount_counts'), outputs=PURCHASE_PATTERN_KEYS))
+    if plots is not None:
+        graph.add(GraphStage('visualize', partial(_visualize_stage, options=plots),
+                             inputs=('df', 'buy_mount_counts'), outputs=('chart_files',), optional=CHART_KEYS))
+    if report is not None:
+        graph.add(GraphStage('report', partial(_report_stage, approx_distinct=approx_distinct, **report),
+                             inputs=('df', 'dataset_summary'), outputs=('report_file',), optional=REPORT_KEYS))
+    return graph
+
+def load_cube_context(conn, table_name=SOURCE_TABLE, cube='local', chunk_size=None):
+    """增量刷新 day × cat1 汇总立方体，返回任务图的输入：立方体上的聚合结果和数据集概况
+
+    不读取明细表（刷新时只读取水位线之后的新数据）；
+    用户行为和购买模式分析需要逐用户/逐行的数据，此模式下只能执行 CUBE_STAGES 中的分析
+    """
+    with trace_stage('analyze.cube_refresh') as stage:
+        store = open_cube_store(cube, conn, table_name)
+        rollup, new_rows = refresh_cube(conn, table_name, store, chunk_size=chunk_size or DEFAULT_CHUNK_SIZE)
+        stage.set_rows(rows_in=new_rows, rows_out=len(rollup.cells))
+    return {
+        'df': None,
+        'aggregates': rollup.aggregates(),
+        'buy_mount_counts': None,
+        'dataset_summary': rollup.dataset_summary(),
+        'monthly_users': rollup.user_counts('year_month'),
+    }
+
+def _count_chunks(chunks, totals):
+    """透传数据块，同时累计行数和 buy_mount 取值频次"""
+    for chunk in chunks:
+        totals['rows'] += len(chunk)
+        if 'buy_mount' in chunk.columns:
+            counts = pd.to_numeric(chunk['buy_mount'], errors='coerce').value_counts()
+            totals['buy_mount'] = counts if totals['buy_mount'] is None else \
+                totals['buy_mount'].add(counts, fill_value=0)
+        yield chunk
+
+def load_streaming_context(conn, table_name=SOURCE_TABLE, limit=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """流式读取明细表，逐块预处理后直接送入共享聚合计划，返回任务图的输入（读取失败时返回None）
+
+    内存中只保留当前数据块和聚合的中间结果，不拼接整表，df 为 None；
+    与下推模式一样，用户留存分析需要完整明细，此模式下跳过；用户数/类别数取自聚合结果，为精确值
+    """
+    totals = {'rows': 0, 'buy_mount': None}
+    chunks = load_data_from_table(conn, table_name, limit=limit, chunk_size=chunk_size)
+    aggregates = build_aggregation_plan().execute(preprocess_chunks(_count_chunks(chunks, totals)))
+    if totals['rows'] == 0:
+        print("无法读取数据")
+        return None
+    print(f"成功流式聚合 {totals['rows']} 行数据")
+
+    days = aggregates['day']['day'] if 'day' in aggregates else pd.Series(dtype='datetime64[ns]')
+    dataset_summary = {
+        'rows': totals['rows'],
+        'users': len(aggregates['user_id']) if 'user_id' in aggregates else 0,
+        'categories': len(aggregates['cat1']) if 'cat1' in aggregates else 0,
+        'day_min': days.min(),
+        'day_max': days.max(),
+    }
+    buy_mount_counts = totals['buy_mount']
+    if buy_mount_counts is not None:
+        buy_mount_counts = buy_mount_counts.sort_index().astype('int64').rename('buy_mount')
+        buy_mount_counts.index.name = None
+    return {'df': None, 'aggregates': aggregates, 'buy_mount_counts': buy_mount_counts,
+            'dataset_summary': dataset_summary}
+
+def _default_targets(graph, context, cube):
+    """未指定要执行的分析时：立方体模式只执行 CUBE_STAGES，没有明细数据时跳过 DETAIL_ONLY_STAGES"""
+    if cube:
+        names = list(CUBE_STAGES)
+    elif context['df'] is None:
+        names = [name for name in graph.stages if name not in DETAIL_ONLY_STAGES]
+    else:
+        return None
+    return names + [name for name in ('visualize', 'report') if name in graph.stages]
+
+def run_analyses(conn, table_name=SOURCE_TABLE, pushdown=False, limit=None, chunk_size=None, workers=None,
+                 approx_distinct=False, cube=None, stages=None, stage_workers=1,
+                 stage_executor='thread', plots=None, report=None):
+    """读取数据并按任务图执行分析，返回 (df, analysis_results)，读取失败时返回 None
+
+    pushdown=True 时各项聚合在MySQL端执行，只传回聚合结果，df 为 None；
+    approx_distinct=True 时明细数据的用户数/类别数使用 HyperLogLog 草图（下推时数据库端为精确计数，
+    每个用户的类别数/活跃天数始终精确）；
+    cube='local'/'mysql' 时改为基于增量维护的汇总立方体分析（见 load_cube_context）；
+    指定 chunk_size（且不并行读取）时流式聚合，不在内存中拼接整表（见 load_streaming_context）；
+    stages 为只执行的阶段名或结果键（连同其上游阶段），stage_workers>1 时相互独立的阶段在
+    线程池（stage_executor='process' 时为进程池）中并发执行；plots/report 见 build_analysis_graph
+    """
+    if cube:
+        context = load_cube_context(conn, table_name, cube=cube, chunk_size=chunk_size)
+    elif pushdown:
+        # SQL下推：聚合与数据集概况都在数据库端完成
+        print(f"\n正在对表 '{table_name}' 执行SQL下推聚合...")
+        with trace_stage('analyze.pushdown'):
+            aggregates = pushdown_aggregates(conn, table_name, build_aggregation_plan())
+            dataset_summary, buy_mount_counts = pushdown_dataset_summary(conn, table_name)
+        context = {'df': None, 'aggregates': aggregates, 'buy_mount_counts': buy_mount_counts,
+                   'dataset_summary': dataset_summary}
+    elif chunk_size and not workers:
+        print(f"\n正在从表 '{table_name}' 流式读取并聚合数据...")
+        with trace_stage('analyze.stream') as stage:
+            context = load_streaming_context(conn, table_name, limit=limit, chunk_size=chunk_size)
+            stage.set_rows(rows_in=0 if context is None else context['dataset_summary']['rows'])
+        if context is None:
+            return None
+    else:
+        print(f"\n正在从表 '{table_name}' 读取数据...")
+        with trace_stage('analyze.load') as stage:
+            df = load_analysis_frame(conn, table_name, limit=limit, chunk_size=chunk_size, workers=workers,
+                                     approx_distinct=approx_distinct)
+            stage.set_rows(rows_out=0 if df is None else len(df))
+        if df is None:
+            return None
+        # aggregates 由任务图中的 aggregate 阶段计算（按分组键共享一次聚合扫描）
+        context = {'df': df, 'buy_mount_counts': None, 'dataset_summary': None}
+    
+    graph = build_analysis_graph(approx_distinct, plots=plots, report=report)
+    if stages is not None:
+        targets = list(stages) + [name for name in ('visualize', 'report') if name in graph.stages]
+    else:
+        targets = _default_targets(graph, context, cube)
+    run = graph.run(context, targets=targets, workers=stage_workers, executor=stage_executor)
+    if cube:
+        print("\n用户行为与购买模式分析需要明细数据，汇总立方体模式下跳过")
+    run.print_timing()
+    
+    result_keys = [key for stage in graph.stages.values() for key in stage.outputs
+                   if key not in ('aggregates', 'chart_files', 'report_file')]
+    analysis_results = _collect_results(run.context, ['dataset_summary', 'monthly_users', 'buy_mount_counts']
+                                        + result_keys)
+    return context['df'], analysis_results
+
+def main(pushdown=False, table_name=SOURCE_TABLE, limit=None, chunk_size=None, workers=None,
+         plots=True, report=True, output_dir="visualization_results", fmt='png', dpi=300,
+         render_workers=4, report_file="analysis_report.txt", approx_distinct=False,
+         cube=None, stages=None, stage_workers=1, stage_executor='thread'):
+    """主函数
+
+    pushdown=True 时各项聚合在MySQL端执行，只传回聚合结果，不加载明细数据；
+    plots/report 控制是否生成图表和分析报告；approx_distinct=True 时用户数/类别数使用 HyperLogLog 近似；
+    cube='local'/'mysql' 时基于增量刷新的 day × cat1 汇总立方体分析，不读取明细表；
+    stages 只执行指定的分析，stage_workers>1 时相互独立的分析阶段并发执行
+    """
     print("开始淘宝母婴数据分析")
     print("="*60)
     
@@ -397,52 +828,26 @@ def main():
         return
     
     try:
-        # 2. 读取数据（可以使用原始表或清洗后的表）
-        table_name = "(sample)sam_tianchi_mum_baby_trade_history"  # 或使用清洗后的表名
-        print(f"\n正在从表 '{table_name}' 读取数据...")
-        df_raw = load_data_from_table(conn, table_name)
-        
-        if df_raw is None or len(df_raw) == 0:
-            print("无法读取数据")
-            return
-        
-        # 3. 数据预处理
-        df = preprocess_data(df_raw)
-        
-        if df is None:
+        # 2-4. 读取数据、预处理并执行各项分析
+        # 5-6. 可视化图表和分析报告作为任务图中的阶段，在所需的分析完成后执行
+        plot_options = {'output_dir': output_dir, 'fmt': fmt, 'dpi': dpi, 'workers': render_workers} if plots else None
+        report_options = {'report_file': report_file} if report else None
+        analyzed = run_analyses(conn, table_name, pushdown=pushdown, limit=limit,
+                                chunk_size=chunk_size, workers=workers, approx_distinct=approx_distinct,
+                                cube=cube, stages=stages, stage_workers=stage_workers,
+                                stage_executor=stage_executor, plots=plot_options, report=report_options)
+        if analyzed is None:
             return
         
-        # 4. 执行各项分析
-        analysis_results = {}
-        
-        # 销售趋势分析
-        sales_results = analyze_sales_trend(df)
-        analysis_results.update(sales_results)
-        
-        # 商品类别分析
-        category_results = analyze_product_categories(df)
-        analysis_results.update(category_results)
-        
-        # 用户行为分析
-        user_results = analyze_user_behavior(df)
-        analysis_results.update(user_results)
-        
-        # 购买模式分析
-        purchase_results = analyze_purchase_patterns(df)
-        analysis_results.update(purchase_results)
-        
-        # 5. 创建可视化图表
-        create_visualizations(df, analysis_results)
-        
-        # 6. 生成分析报告
-        generate_analysis_report(df, analysis_results)
-        
         print("\n" + "="*60)
         print("数据分析完成!")
         print("="*60)
-        print("输出文件:")
-        print("visualization_results/ - 所有可视化图表")
-        print("analysis_report.txt - 详细分析报告")
+        if plots or report:
+            print("输出文件:")
+        if plots:
+            print(f"{output_dir}/ - 所有可视化图表")
+        if report:
+            print(f"{report_file} - 详细分析报告")
         print("\n下一步建议:")
         print(" 1.查看生成的图表和分析报告")
         print(" 2.可以考虑用Power BI制作交互式仪表板")
@@ -455,4 +860,4 @@ def main():
             print("\n数据库连接已关闭")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,257 @@
+"""
+数据概况（profile）
+每个DataFrame只扫描一次：逐列 factorize 得到缺失数、不同取值及其频次，各列编码合成行键得到重复行，
+数值列的描述统计、唯一值数量、中位数/众数都由取值频次推出；
+清洗过程中可按操作增量更新，质量检查和清洗报告都从概况读取，并比较清洗前后的差异
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+
+def describe_from_counts(counts):
+    """由取值频次计算与 Series.describe() 相同的统计量"""
+    counts = counts[counts > 0].sort_index()
+    if counts.empty:
+        return pd.Series({'count': 0.0, 'mean': np.nan, 'std': np.nan, 'min': np.nan,
+                          '25%': np.nan, '50%': np.nan, '75%': np.nan, 'max': np.nan}, name=counts.name)
+    values = counts.index.to_numpy(dtype=float)
+    weights = counts.to_numpy()
+    n = weights.sum()
+    cumulative = weights.cumsum()
+    mean = (values * weights).sum() / n
+    std = np.sqrt(((values - mean) ** 2 * weights).sum() / (n - 1)) if n > 1 else np.nan
+
+    def quantile(q):
+        # 与pandas相同的线性插值：位置 q*(n-1)
+        position = q * (n - 1)
+        lower = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+        upper = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+        return lower + (upper - lower) * (position - np.floor(position))
+
+    return pd.Series({
+        'count': float(n), 'mean': mean, 'std': std, 'min': values[0],
+        '25%': quantile(0.25), '50%': quantile(0.5), '75%': quantile(0.75), 'max': values[-1]
+    }, name=counts.name)
+
+
+def _column_counts(series):
+    """一次 factorize 得到 (编码, 缺失数, 按首次出现顺序排列的取值频次, 缺失值信息)
+
+    缺失值信息为 (它之前出现过几个不同取值, 第一个缺失值本身)，用于还原 unique() 的结果
+    """
+    codes, uniques = pd.factorize(series)
+    if len(uniques) < np.iinfo(np.int32).max:
+        codes = codes.astype(np.int32)
+    is_missing = codes < 0
+    missing = int(is_missing.sum())
+    na_info = None
+    if missing:
+        first = int(is_missing.argmax())
+        na_info = (int(codes[:first].max()) + 1 if first > 0 else 0, series.iloc[first])
+    frequencies = np.bincount(codes[~is_missing], minlength=len(uniques))
+    return codes, missing, pd.Series(frequencies, index=pd.Index(uniques), name=series.name), na_info
+
+
+def _duplicated_from_codes(codes_list, rows):
+    """由各列的 factorize 编码标记完全重复的行（与 DataFrame.duplicated() 一致，保留第一次出现的行）
+
+    与 DataFrame.duplicated 相同的做法：把各列编码按混合进制合成一个整数行键，
+    将要溢出时先把已合成的键重新编码压缩
+    """
+    if not codes_list or rows == 0:
+        return np.zeros(rows, dtype=bool)
+    combined = np.zeros(rows, dtype=np.int64)
+    cardinality = 1
+    for codes in codes_list:
+        size = int(codes.max()) + 2
+        if cardinality * size >= 2 ** 62:
+            combined, uniques = pd.factorize(combined)
+            combined = combined.astype(np.int64)
+            cardinality = len(uniques)
+        combined = combined * size + (codes.astype(np.int64) + 1)
+        cardinality *= size
+    return pd.Series(combined).duplicated().to_numpy()
+
+
+class DataProfile:
+    """一个DataFrame的概况：行数、列类型、每列缺失数与取值频次、重复行数
+
+    numeric_columns / object_columns 与 select_dtypes(include=[np.number]) /
+    select_dtypes(include=['object']) 选出的列相同；
+    codes 保存每列的 factorize 编码（每行每列4字节），重复行由编码得出并随清洗操作更新
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = []
+        self.dtypes = {}
+        self.missing = {}
+        self.value_counts = {}
+        self.na_values = {}
+        self.codes = {}
+        self._duplicated = None
+        self.numeric_columns = []
+        self.object_columns = []
+
+    @classmethod
+    def from_frame(cls, df):
+        """扫描一次DataFrame生成概况"""
+        profile = cls()
+        profile.rows = len(df)
+        profile.columns = list(df.columns)
+        for column in df.columns:
+            profile._profile_column(df[column])
+        profile._refresh_column_groups(df)
+        return profile
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    def _profile_column(self, series):
+        name = series.name
+        self.dtypes[name] = series.dtype
+        self.codes[name], self.missing[name], self.value_counts[name], self.na_values[name] = _column_counts(series)
+        self._duplicated = None
+
+    def _refresh_column_groups(self, df):
+        # 只读取列类型，不扫描数据
+        self.numeric_columns = list(df.select_dtypes(include=[np.number]).columns)
+        self.object_columns = list(df.select_dtypes(include=['object']).columns)
+
+    # ==================== 读取 ====================
+    def missing_frame(self):
+        """缺失值统计表，与 check_data_quality 原先的 missing_df 相同"""
+        missing_values = pd.Series([self.missing[c] for c in self.columns], index=self.columns, dtype='int64')
+        missing_percent = (missing_values / self.rows) * 100 if self.rows else missing_values * np.nan
+        return pd.DataFrame({
+            '缺失数量': missing_values,
+            '缺失百分比': missing_percent
+        })
+
+    def duplicated(self):
+        """完全重复的行（与 df.duplicated().to_numpy() 相同），由各列编码得出，不扫描数据"""
+        if self._duplicated is None:
+            self._duplicated = _duplicated_from_codes([self.codes[c] for c in self.columns], self.rows)
+        return self._duplicated
+
+    @property
+    def duplicates(self):
+        """完全重复的行数"""
+        return int(self.duplicated().sum())
+
+    def total_missing(self):
+        return int(sum(self.missing[c] for c in self.columns))
+
+    def nunique(self, column):
+        counts = self.value_counts[column]
+        return int((counts > 0).sum())
+
+    def unique_values(self, column, limit=10):
+        """按首次出现顺序的前 limit 个不同取值，与 df[column].unique()[:limit] 相同"""
+        counts = self.value_counts[column]
+        values = counts.index[counts.to_numpy() > 0][:limit].to_numpy()
+        na_info = self.na_values.get(column)
+        if na_info is not None and self.missing[column] > 0 and na_info[0] < limit:
+            values = np.insert(values.astype(object), na_info[0], [na_info[1]])
+        return values[:limit]
+
+    def describe(self):
+        """数值列的描述统计，与 df[numeric_cols].describe() 相同"""
+        summary = {}
+        for column in self.numeric_columns:
+            stats = describe_from_counts(self.value_counts[column])
+            # 可空整数/浮点列的 describe() 结果为 Float64
+            if isinstance(self.dtypes[column], pd.api.extensions.ExtensionDtype):
+                stats = stats.astype('Float64')
+            summary[column] = stats
+        return pd.DataFrame(summary)
+
+    # ==================== 增量更新 ====================
+    def drop_column(self, column):
+        """记录删除一列"""
+        self.columns.remove(column)
+        for store in (self.dtypes, self.missing, self.value_counts, self.na_values, self.codes):
+            store.pop(column, None)
+        self._duplicated = None
+        for group in (self.numeric_columns, self.object_columns):
+            if column in group:
+                group.remove(column)
+
+    def fill_missing(self, column, fill_value, series):
+        """记录用 fill_value 填充了某列的全部缺失值，series 为填充后的列（读取类型和填充值所在的行）"""
+        filled = self.missing[column]
+        counts = self.value_counts[column]
+        if filled and not pd.isna(fill_value):
+            # 缺失位置改用填充值的编码（填充值原本没有出现过时分配新编码）
+            codes = self.codes[column].copy()
+            existing = codes[(codes >= 0) & series.eq(fill_value).to_numpy(dtype=bool, na_value=False)]
+            codes[codes < 0] = existing[0] if len(existing) else codes.max() + 1
+            self.codes[column] = codes
+            self._duplicated = None
+            # 填充值的首次出现位置可能提前到第一个缺失值处
+            position = self.na_values[column][0]
+            if fill_value in counts.index:
+                filled += counts[fill_value]
+                current = counts.index.get_loc(fill_value)
+                if current > position:
+                    counts = counts.drop(fill_value)
+                else:
+                    position = None
+            if position is not None:
+                counts = pd.concat([counts.iloc[:position],
+                                    pd.Series([filled], index=[fill_value], name=column),
+                                    counts.iloc[position:]])
+            else:
+                counts = counts.copy()
+                counts[fill_value] = filled
+            self.missing[column] = 0
+            self.na_values[column] = None
+        self.value_counts[column] = counts
+        self.dtypes[column] = series.dtype
+
+    def remove_rows(self, df, mask):
+        """记录删除了 df 中 mask 为True的行（只扫描这些行）"""
+        if not mask.any():
+            return
+        removed = df[mask]
+        self.rows -= len(removed)
+        if self._duplicated is not None:
+            self._duplicated = self._duplicated[~mask]
+        for column in self.columns:
+            self.codes[column] = self.codes[column][~mask]
+            _, missing, counts, _ = _column_counts(removed[column])
+            self.missing[column] -= missing
+            current = self.value_counts[column]
+            self.value_counts[column] = current.sub(counts.reindex(current.index, fill_value=0), fill_value=0)
+
+    def update_columns(self, df, columns):
+        """重新统计发生变化或新增的列（只扫描这些列），重复行随之由编码重新得出"""
+        for column in columns:
+            if column not in df.columns:
+                continue
+            if column not in self.columns:
+                self.columns.append(column)
+            self._profile_column(df[column])
+        self.columns = [c for c in df.columns if c in self.columns]
+        self._refresh_column_groups(df)
+
+    # ==================== 比较 ====================
+    def diff(self, after):
+        """与清洗后的概况逐列比较，返回每列 缺失数/唯一值数/类型 的前后对比"""
+        rows = []
+        for column in self.columns + [c for c in after.columns if c not in self.columns]:
+            before_has, after_has = column in self.columns, column in after.columns
+            rows.append({
+                'column': column,
+                'status': '保留' if before_has and after_has else ('已删除' if before_has else '新增'),
+                'missing_before': self.missing[column] if before_has else None,
+                'missing_after': after.missing[column] if after_has else None,
+                'unique_before': self.nunique(column) if before_has else None,
+                'unique_after': after.nunique(column) if after_has else None,
+                'dtype_before': str(self.dtypes[column]) if before_has else None,
+                'dtype_after': str(after.dtypes[column]) if after_has else None,
+            })
+        return pd.DataFrame(rows, dtype=object)
@@ -0,0 +1,44 @@
+"""
+YYYYMMDD 日期列的快速解码
+day 列只有几百个不同取值，先 factorize，每个不同取值只解析一次，再按编码映射回每一行；
+年、月、年月、星期等衍生特征同样只在不同取值上计算。
+解析规则与原来的 pd.to_datetime(day.astype(str), format='%Y%m%d', errors='coerce') 完全相同：
+不存在的日期、缺失值以及 20140110.0 这样的浮点写法都得到 NaT
+"""
+
+import pandas as pd
+
+def _decode_uniques(series):
+    """返回 (每行在不同取值中的编码, 不同取值解析后的日期Series)"""
+    if series.dtype == object:
+        # 对象列中 20140110 与 20140110.0 相等却会得到不同的字符串，按字符串形式区分取值
+        series = series.astype(str)
+    # 缺失值也作为一个取值参与解析（'nan' -> NaT），与逐行解析的结果一致
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    dates = pd.to_datetime(pd.Series(uniques).astype(str), format='%Y%m%d', errors='coerce')
+    return codes, dates
+
+
+def _take(values, codes, index):
+    """按编码把不同取值上的结果映射回每一行，保留扩展类型（如 period[M]）"""
+    return pd.Series(values.array.take(codes), index=index, name=values.name)
+
+
+def decode_day(series):
+    """把 YYYYMMDD 列解码为日期（无效日期为 NaT）"""
+    codes, dates = _decode_uniques(series)
+    return _take(dates.rename(series.name), codes, series.index)
+
+
+def decode_day_features(series):
+    """一次解码得到 day 及其衍生特征，返回包含 day/year/month/year_month/weekday 列的DataFrame"""
+    codes, dates = _decode_uniques(series)
+    unique_features = {
+        'day': dates,
+        'year': dates.dt.year,
+        'month': dates.dt.month,
+        'year_month': dates.dt.to_period('M'),
+        'weekday': dates.dt.weekday,
+    }
+    return pd.DataFrame({name: _take(values.rename(name), codes, series.index)
+                         for name, values in unique_features.items()})
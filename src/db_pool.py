@@ -0,0 +1,132 @@
+"""
+共享数据库连接池
+清洗和分析两个流程统一从这里获取MySQL连接：配置来自配置文件或环境变量（用户名和密码没有默认值，必须提供），
+底层为 MySQLConnectionPool，借出连接时做健康检查，断开的连接自动重连
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 默认配置，可被配置文件和环境变量覆盖（环境变量优先）
+DEFAULT_DB_CONFIG = {
+    'host': 'localhost',
+    'port': 3306,
+    'database': 'test',
+    'pool_size': 8,
+}
+
+# 必须由配置文件或环境变量给出的配置项
+REQUIRED_KEYS = ('user', 'password')
+
+# 配置文件路径，可通过 TAOBAO_DB_CONFIG 环境变量指定
+DEFAULT_CONFIG_FILE = 'db_config.json'
+
+# 环境变量与配置项的对应关系
+ENV_VARIABLES = {
+    'TAOBAO_DB_HOST': 'host',
+    'TAOBAO_DB_PORT': 'port',
+    'TAOBAO_DB_USER': 'user',
+    'TAOBAO_DB_PASSWORD': 'password',
+    'TAOBAO_DB_NAME': 'database',
+    'TAOBAO_DB_POOL_SIZE': 'pool_size',
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class DBConfigError(ValueError):
+    """数据库配置缺失或不完整"""
+
+
+def load_db_config(config_file=None):
+    """读取数据库配置：默认值 < 配置文件 < 环境变量
+
+    显式指定的配置文件（参数或 TAOBAO_DB_CONFIG）不存在，或缺少用户名/密码时抛出 DBConfigError
+    """
+    config = dict(DEFAULT_DB_CONFIG)
+
+    explicit = config_file or os.environ.get('TAOBAO_DB_CONFIG')
+    config_file = explicit or DEFAULT_CONFIG_FILE
+    if os.path.exists(config_file):
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    elif explicit:
+        raise DBConfigError(f"数据库配置文件不存在: {config_file}")
+
+    for env_name, key in ENV_VARIABLES.items():
+        if env_name in os.environ:
+            config[key] = os.environ[env_name]
+
+    missing = [key for key in REQUIRED_KEYS if not config.get(key)]
+    if missing:
+        env_names = [name for name, key in ENV_VARIABLES.items() if key in missing]
+        raise DBConfigError(
+            f"缺少数据库配置项 {', '.join(missing)}：请在 {config_file} 中填写"
+            f"（参考 {{\"user\": ..., \"password\": ...}}），或设置环境变量 {', '.join(env_names)}")
+
+    config['port'] = int(config['port'])
+    config['pool_size'] = int(config['pool_size'])
+    return config
+
+
+def get_pool(config_file=None):
+    """返回进程内共享的连接池，首次调用时创建"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from mysql.connector import pooling
+
+                config = load_db_config(config_file)
+                pool_size = config.pop('pool_size')
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name='taobao_pool',
+                    pool_size=pool_size,
+                    pool_reset_session=True,
+                    # 批量写入需要 LOAD DATA LOCAL INFILE
+                    allow_local_infile=True,
+                    **config
+                )
+                print(f"数据库连接池已创建: {config['host']}:{config['port']}/{config['database']} (大小 {pool_size})")
+    return _pool
+
+
+def get_connection(timeout=30, retry_interval=0.1):
+    """从连接池借出一个经过健康检查的连接，用完调用 close() 归还
+
+    连接池暂时借空时等待其他线程归还，超过 timeout 秒后抛出异常
+    """
+    from mysql.connector import errors
+
+    pool = get_pool()
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connection = pool.get_connection()
+            break
+        except errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(retry_interval)
+
+    # 健康检查：连接已断开（如服务器超时关闭）时自动重连
+    try:
+        connection.ping(reconnect=True, attempts=3, delay=1)
+    except errors.Error:
+        connection.close()
+        raise
+    return connection
+
+
+@contextmanager
+def borrow_connection(timeout=30):
+    """with 语句中借用连接，退出时自动归还连接池"""
+    connection = get_connection(timeout=timeout)
+    try:
+        yield connection
+    finally:
+        connection.close()
@@ -0,0 +1,266 @@
+"""
+数据库流式读取工具
+通过非缓冲游标 + 键集分页按块读取大表，避免一次性把整张表载入内存；
+也支持把表按取值范围切分后在线程池中并行读取
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# 默认每块读取的行数
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def _placeholder(connection):
+    """根据数据库驱动的参数风格返回占位符（MySQL 为 %s，SQLite 为 ?）"""
+    module = sys.modules.get(type(connection).__module__.split('.')[0])
+    if getattr(module, 'paramstyle', 'pyformat') == 'qmark':
+        return '?'
+    return '%s'
+
+
+def _is_sqlite(connection):
+    """是否为 sqlite3 连接（本地测试和基准测试使用），其余按MySQL处理"""
+    return type(connection).__module__.split('.')[0] == 'sqlite3'
+
+
+def _stream_cursor(connection):
+    """创建非缓冲游标，结果在服务端按需读取"""
+    try:
+        return connection.cursor(buffered=False)
+    except TypeError:
+        # 非 mysql.connector 驱动不支持 buffered 参数
+        return connection.cursor()
+
+
+def _execute(cursor, query, params):
+    """执行查询；没有参数时不做占位符替换，避免SQL中的 % 被误解析"""
+    if params:
+        cursor.execute(query, params)
+    else:
+        cursor.execute(query)
+
+
+def _rows_to_frame(rows, columns, dtypes=None):
+    """把一批元组转换为带类型的DataFrame"""
+    chunk = pd.DataFrame.from_records(rows, columns=columns).infer_objects()
+    if dtypes:
+        chunk = chunk.astype({col: dtype for col, dtype in dtypes.items() if col in chunk.columns})
+    return chunk
+
+
+def _unique_indexes(connection, table_name):
+    """表的主键和唯一索引中所有列都不允许为NULL的那些，返回列名列表的列表（主键在前）
+
+    键集分页的 (key) > (...) 比较会跳过键为NULL的行，可为NULL的唯一索引不能用来分页
+    """
+    cursor = connection.cursor()
+    try:
+        if _is_sqlite(connection):
+            cursor.execute(f'PRAGMA table_info("{table_name}")')
+            table_info = cursor.fetchall()
+            not_null = {row[1] for row in table_info if row[3] or row[5]}
+            indexes = [[row[1] for row in sorted((r for r in table_info if r[5]), key=lambda r: r[5])]]
+            cursor.execute(f'PRAGMA index_list("{table_name}")')
+            for index in cursor.fetchall():
+                if index[2]:
+                    cursor.execute(f'PRAGMA index_info("{index[1]}")')
+                    indexes.append([row[2] for row in sorted(cursor.fetchall())])
+        else:
+            cursor.execute(
+                "SELECT s.`INDEX_NAME`, s.`COLUMN_NAME`, c.`IS_NULLABLE` "
+                "FROM information_schema.STATISTICS s JOIN information_schema.COLUMNS c "
+                "ON c.`TABLE_SCHEMA` = s.`TABLE_SCHEMA` AND c.`TABLE_NAME` = s.`TABLE_NAME` "
+                "AND c.`COLUMN_NAME` = s.`COLUMN_NAME` "
+                "WHERE s.`TABLE_SCHEMA` = DATABASE() AND s.`TABLE_NAME` = %s AND s.`NON_UNIQUE` = 0 "
+                "ORDER BY s.`INDEX_NAME` <> 'PRIMARY', s.`INDEX_NAME`, s.`SEQ_IN_INDEX`", (table_name,))
+            grouped = {}
+            not_null = set()
+            for index_name, column, nullable in cursor.fetchall():
+                grouped.setdefault(index_name, []).append(column)
+                if nullable == 'NO':
+                    not_null.add(column)
+            indexes = list(grouped.values())
+    finally:
+        cursor.close()
+    return [columns for columns in indexes if columns and all(c in not_null for c in columns)]
+
+
+def _unique_key_columns(connection, table_name, key_columns):
+    """key_columns 不能唯一确定一行时（键值相同的行在分页边界处会被跳过），
+    在末尾追加主键（没有主键时为唯一索引）的列作为决胜列；表中没有可用的唯一键时报错
+    """
+    indexes = _unique_indexes(connection, table_name)
+    if any(set(columns) <= set(key_columns) for columns in indexes):
+        return key_columns
+    if not indexes:
+        raise ValueError(f"表 '{table_name}' 没有非空的主键或唯一索引，键集分页列 {key_columns} "
+                         f"不能保证唯一，键值相同的行会被跳过；请不指定 key_columns（单条查询流式读取）")
+    tie_breaker = [column for column in indexes[0] if column not in key_columns]
+    print(f"键集分页列 {key_columns} 不能唯一确定一行，追加 {tie_breaker} 作为决胜列")
+    return key_columns + tie_breaker
+
+
+def iter_table_chunks(connection, table_name, chunk_size=DEFAULT_CHUNK_SIZE, key_columns=None,
+                      limit=None, columns=None, where=None, dtypes=None, where_params=None):
+    """按块流式读取表数据，逐块返回DataFrame
+
+    key_columns 为键集分页使用的列，不包含主键或非空唯一索引的全部列时自动追加主键列作为决胜列
+    （没有可用的唯一键时报错），每一页都是 WHERE (key) > (上一页末尾的key) ORDER BY key LIMIT n 的独立查询；
+    为 None 时只执行一条查询，通过非缓冲游标的 fetchmany 分批取数。
+    where 为附加的过滤条件，其中的占位符由 where_params 提供参数。
+    """
+    if chunk_size is None or chunk_size <= 0:
+        raise ValueError("chunk_size 必须为正整数")
+
+    if isinstance(key_columns, str):
+        key_columns = [key_columns]
+    if key_columns:
+        key_columns = _unique_key_columns(connection, table_name, list(key_columns))
+    if columns is not None and key_columns:
+        columns = list(columns) + [k for k in key_columns if k not in columns]
+    select_cols = ", ".join(f"`{c}`" for c in columns) if columns else "*"
+
+    if not key_columns:
+        yield from _iter_single_query(connection, table_name, chunk_size, limit,
+                                      select_cols, where, dtypes, where_params)
+        return
+
+    ph = _placeholder(connection)
+    key_sql = ", ".join(f"`{k}`" for k in key_columns)
+    key_params = ", ".join([ph] * len(key_columns))
+    last_key = None
+    remaining = limit
+
+    while remaining is None or remaining > 0:
+        page_size = chunk_size if remaining is None else min(chunk_size, remaining)
+        clauses = [f"({where})"] if where else []
+        params = list(where_params or [])
+        if last_key is not None:
+            clauses.append(f"({key_sql}) > ({key_params})")
+            params += list(last_key)
+
+        query = f"SELECT {select_cols} FROM `{table_name}`"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += f" ORDER BY {key_sql} LIMIT {page_size}"
+
+        cursor = _stream_cursor(connection)
+        try:
+            _execute(cursor, query, params)
+            names = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        if not rows:
+            break
+
+        # 用原始元组中的值记录分页位置，避免把numpy类型传给驱动
+        key_idx = [names.index(k) for k in key_columns]
+        last_key = tuple(rows[-1][i] for i in key_idx)
+        if remaining is not None:
+            remaining -= len(rows)
+
+        yield _rows_to_frame(rows, names, dtypes)
+
+        if len(rows) < page_size:
+            break
+
+
+def _iter_single_query(connection, table_name, chunk_size, limit, select_cols, where, dtypes,
+                       where_params=None):
+    """单条查询 + fetchmany 的流式读取"""
+    query = f"SELECT {select_cols} FROM `{table_name}`"
+    if where:
+        query += f" WHERE {where}"
+    if limit:
+        query += f" LIMIT {limit}"
+
+    cursor = _stream_cursor(connection)
+    try:
+        _execute(cursor, query, list(where_params or []))
+        names = [desc[0] for desc in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield _rows_to_frame(rows, names, dtypes)
+    finally:
+        cursor.close()
+
+
+# ==================== 并行分区读取 ====================
+def plan_partitions(connection, table_name, partition_column='day', partitions=8):
+    """按列的取值范围把表切分为互不重叠的区间
+
+    返回 [(where, params), ...]：前面是等宽的 [lo, hi) 区间，最后一个分区读取该列为NULL的行
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT MIN(`{partition_column}`), MAX(`{partition_column}`) FROM `{table_name}`")
+        low, high = cursor.fetchone()
+    finally:
+        cursor.close()
+
+    ph = _placeholder(connection)
+    ranges = []
+    if low is not None:
+        bounds = np.unique(np.linspace(int(low), int(high) + 1, partitions + 1).astype(np.int64))
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            ranges.append((f"`{partition_column}` >= {ph} AND `{partition_column}` < {ph}", [int(lo), int(hi)]))
+    ranges.append((f"`{partition_column}` IS NULL", None))
+    return ranges
+
+
+def _read_partition(connection_factory, table_name, where, params, chunk_size, dtypes):
+    """在独立连接上读取一个分区"""
+    connection = connection_factory()
+    try:
+        chunks = list(iter_table_chunks(connection, table_name, chunk_size=chunk_size,
+                                        where=where, where_params=params, dtypes=dtypes))
+    finally:
+        connection.close()
+    if not chunks:
+        return None
+    return pd.concat(chunks, ignore_index=True)
+
+
+def iter_table_parallel(table_name, partition_column='day', partitions=8, workers=4,
+                        chunk_size=DEFAULT_CHUNK_SIZE, dtypes=None, connection_factory=None):
+    """并行读取各分区，按分区顺序逐个产出DataFrame
+
+    每个工作线程从 connection_factory（默认为共享连接池）借用自己的连接，
+    产出顺序与分区顺序一致，结果是确定的
+    """
+    if connection_factory is None:
+        from db_pool import get_connection
+        connection_factory = get_connection
+
+    connection = connection_factory()
+    try:
+        ranges = plan_partitions(connection, table_name, partition_column, partitions)
+    finally:
+        connection.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_read_partition, connection_factory, table_name,
+                                   where, params, chunk_size, dtypes)
+                   for where, params in ranges]
+        for future in futures:
+            frame = future.result()
+            if frame is not None and len(frame) > 0:
+                yield frame
+
+
+def read_table_parallel(table_name, partition_column='day', partitions=8, workers=4,
+                        chunk_size=DEFAULT_CHUNK_SIZE, dtypes=None, connection_factory=None):
+    """并行读取整张表并按分区顺序拼接为一个DataFrame"""
+    frames = list(iter_table_parallel(table_name, partition_column, partitions, workers,
+                                      chunk_size, dtypes, connection_factory))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,193 @@
+"""
+HyperLogLog 近似去重计数
+不保存取值本身，只保存 2^precision 个寄存器（每个1字节），内存固定；
+每个数据块/分区各自建立草图，合并时逐个寄存器取最大值，与对全部数据一次建立的草图完全相同。
+相对标准误差约为 1.04 / sqrt(2^precision)，precision=14 时约 0.8%（16KB）。
+GroupedHyperLogLog 为每个分组保存一行寄存器（每组 2^precision 字节），用于分组数不多的去重计数，
+例如汇总立方体每个 日期×类别 单元格的用户数；按用户这类分组数很大、每组取值很少的情况，
+保存 (分组, 取值) 对精确计数占用的内存更少
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PRECISION = 14
+
+# 分组草图默认精度：每组64字节
+GROUP_PRECISION = 6
+
+# 逐块计算哈希，限制临时数组的大小
+_HASH_BATCH = 1 << 20
+
+
+def _alpha(registers):
+    if registers == 16:
+        return 0.673
+    if registers == 32:
+        return 0.697
+    if registers == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / registers)
+
+
+def _check_precision(precision):
+    if not 4 <= precision <= 18:
+        raise ValueError(f"HyperLogLog 精度必须在4到18之间: {precision}")
+
+
+def value_hashes(values):
+    """非缺失取值的64位哈希，以及这些取值的位置
+
+    数值统一按 float64 哈希，同一个数在不同数据块中是整数列还是浮点列都得到相同的哈希
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    notna = series.notna().to_numpy()
+    series = series[notna]
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        series = series.astype('float64')
+    return pd.util.hash_pandas_object(series, index=False).to_numpy(), notna
+
+
+def _bucket_ranks(hashes, precision):
+    """高 precision 位为寄存器编号，其余位中第一个1的位置（从1开始）为秩"""
+    width = 64 - precision
+    buckets = (hashes >> np.uint64(width)).astype(np.int64)
+    rest = hashes & np.uint64((1 << width) - 1)
+    # 精确的二进制位数：超过2^53的值先右移，保证转换为浮点数时没有舍入
+    large = rest >= np.uint64(1 << 53)
+    shifted = np.where(large, rest >> np.uint64(11), rest).astype(np.float64)
+    bit_length = np.frexp(shifted)[1] + np.where(large, 11, 0)
+    ranks = (width - bit_length + 1).astype(np.uint8)
+    return buckets, ranks
+
+
+def _estimate(registers, precision):
+    """由寄存器估计不同取值个数，registers 可以是一维（单个草图）或二维（每行一个分组）"""
+    registers = np.atleast_2d(registers)
+    m = 1 << precision
+    harmonic = np.power(2.0, -registers.astype(np.float64)).sum(axis=1)
+    estimate = _alpha(m) * m * m / harmonic
+    zeros = (registers == 0).sum(axis=1)
+    # 小基数时改用线性计数
+    small = (estimate <= 2.5 * m) & (zeros > 0)
+    estimate[small] = m * np.log(m / zeros[small])
+    return estimate
+
+
+class DistinctEstimate:
+    """近似计数结果：估计值及其相对标准误差，打印时附带95%误差界"""
+
+    def __init__(self, value, relative_error):
+        self.value = value
+        self.relative_error = relative_error
+
+    @property
+    def bounds(self):
+        """约95%置信的区间（±2倍标准误差）"""
+        margin = 2 * self.relative_error * self.value
+        return max(0.0, self.value - margin), self.value + margin
+
+    def __int__(self):
+        return int(round(self.value))
+
+    def __str__(self):
+        return f"约 {int(self)} (±{2 * self.relative_error:.1%})"
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+    def __repr__(self):
+        return f"DistinctEstimate(value={self.value:.1f}, relative_error={self.relative_error:.4f})"
+
+
+class HyperLogLog:
+    """可合并的 HyperLogLog 草图"""
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        _check_precision(precision)
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def from_values(cls, values, precision=DEFAULT_PRECISION):
+        sketch = cls(precision)
+        sketch.add(values)
+        return sketch
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add(self, values):
+        """加入一批取值（缺失值忽略）"""
+        series = values if isinstance(values, pd.Series) else pd.Series(values)
+        for start in range(0, len(series), _HASH_BATCH):
+            hashes, _ = value_hashes(series.iloc[start:start + _HASH_BATCH])
+            buckets, ranks = _bucket_ranks(hashes, self.precision)
+            np.maximum.at(self.registers, buckets, ranks)
+        return self
+
+    def merge(self, other):
+        """合并另一个同精度的草图（原地），返回自身"""
+        if other.precision != self.precision:
+            raise ValueError(f"草图精度不同: {self.precision} 与 {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def __or__(self, other):
+        merged = HyperLogLog(self.precision)
+        merged.registers = self.registers.copy()
+        return merged.merge(other)
+
+    def count(self):
+        return float(_estimate(self.registers, self.precision)[0])
+
+    def estimate(self):
+        return DistinctEstimate(self.count(), self.relative_error)
+
+
+def approx_nunique(values, precision=DEFAULT_PRECISION):
+    """近似的 nunique()，返回 DistinctEstimate"""
+    return HyperLogLog.from_values(values, precision).estimate()
+
+
+class GroupedHyperLogLog:
+    """每个分组一行寄存器的 HyperLogLog，groups 为分组标签（pd.Index）"""
+
+    def __init__(self, groups, precision=GROUP_PRECISION, registers=None):
+        _check_precision(precision)
+        self.groups = pd.Index(groups)
+        self.precision = precision
+        self.registers = registers if registers is not None else \
+            np.zeros((len(self.groups), 1 << precision), dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(1 << self.precision)
+
+    def add(self, group_codes, values):
+        """group_codes[i] 为 values[i] 所属分组在 groups 中的位置"""
+        hashes, notna = value_hashes(values)
+        buckets, ranks = _bucket_ranks(hashes, self.precision)
+        flat = np.asarray(group_codes)[notna].astype(np.int64) * (1 << self.precision) + buckets
+        np.maximum.at(self.registers.reshape(-1), flat, ranks)
+        return self
+
+    def merge(self, other):
+        """按分组标签对齐后逐个寄存器取最大值，返回新的草图"""
+        if other.precision != self.precision:
+            raise ValueError(f"草图精度不同: {self.precision} 与 {other.precision}")
+        groups = self.groups.union(other.groups)
+        registers = np.zeros((len(groups), 1 << self.precision), dtype=np.uint8)
+        for sketch in (self, other):
+            positions = groups.get_indexer(sketch.groups)
+            registers[positions] = np.maximum(registers[positions], sketch.registers)
+        return GroupedHyperLogLog(groups, self.precision, registers)
+
+    def count(self):
+        """每个分组的估计值（pd.Series，索引为分组标签）"""
+        if len(self.groups) == 0:
+            return pd.Series([], index=self.groups, dtype=float)
+        return pd.Series(_estimate(self.registers, self.precision), index=self.groups)
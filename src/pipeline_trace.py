@@ -0,0 +1,286 @@
+"""
+流水线阶段计时与内存跟踪
+用 with trace_stage("阶段名", rows_in=n) as stage: ... stage.set_rows(rows_out=m) 包裹各阶段，
+记录墙钟时间、CPU时间、内存（峰值RSS的增长或 tracemalloc 的峰值/净增量）和输入输出行数；
+与其他线程上的阶段同时执行的阶段标记为并发（concurrent）：CPU时间改为本线程的CPU时间，
+进程级的内存读数无法区分各阶段，不记录；每个阶段结束时写一行JSON到跟踪文件，结束时可导出 Chrome trace-event 文件
+（chrome://tracing 或 https://ui.perfetto.dev 打开）并打印最慢的阶段。
+未启用时 trace_stage 直接返回一个共享的空操作对象，几乎没有开销
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+_MB = 1024 * 1024
+
+_tracer = None
+
+
+# ==================== 内存读数 ====================
+def _peak_rss_mb():
+    """进程的峰值常驻内存（MB），平台不支持时返回None"""
+    try:
+        import resource
+    except ImportError:
+        # Windows 没有 resource 模块，安装了 psutil 时使用其峰值工作集
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / _MB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为KB，macOS 为字节
+    return peak / _MB if sys.platform == 'darwin' else peak / 1024
+
+
+class _NullStage:
+    """未启用跟踪时使用的空操作阶段"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set_rows(self, rows_in=None, rows_out=None):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """一个正在执行的阶段，退出 with 块时把记录交给 Tracer"""
+
+    def __init__(self, tracer, name, rows_in=None):
+        self.tracer = tracer
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.parent = None
+        self.depth = 0
+        # tracemalloc 模式下子阶段会重置峰值，子阶段的峰值回传给父阶段
+        self.child_peak = 0
+        # 执行期间其他线程上也有阶段在执行
+        self.concurrent = False
+
+    def set_rows(self, rows_in=None, rows_out=None):
+        if rows_in is not None:
+            self.rows_in = rows_in
+        if rows_out is not None:
+            self.rows_out = rows_out
+
+    def __enter__(self):
+        self.tracer._enter(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer._exit(self, failed=exc_type is not None)
+        return False
+
+
+class Tracer:
+    """收集阶段记录
+
+    memory='rss' 记录峰值RSS的增长（开销很小，但只能反映进程级的新峰值）；
+    memory='tracemalloc' 记录Python分配的峰值和净增量（更精确，但会明显拖慢运行）；
+    memory=None 不记录内存；
+    两种内存读数和 process_time 都是进程级的，与其他线程上的阶段重叠执行的阶段只记录本线程的CPU时间
+    （time.thread_time，不含阶段内部另开线程的耗时），不记录内存
+    """
+
+    def __init__(self, trace_file=None, chrome_trace_file=None, memory='rss'):
+        if memory not in ('rss', 'tracemalloc', None):
+            raise ValueError(f"不支持的内存跟踪方式: {memory}")
+        self.trace_file = trace_file
+        self.chrome_trace_file = chrome_trace_file
+        self.memory = memory
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # 线程 -> 该线程正在执行的阶段栈，用于判断阶段是否与其他线程并发
+        self._active = {}
+        self._origin = time.perf_counter()
+        self._stream = open(trace_file, 'a', encoding='utf-8') if trace_file else None
+        if memory == 'tracemalloc':
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, stage):
+        stack = self._stack()
+        if stack:
+            stage.parent = stack[-1].name
+            stage.depth = len(stack)
+        stack.append(stage)
+
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = stack
+            if any(active for other, active in self._active.items() if other != ident):
+                # 所有正在执行的阶段（包括其他线程上的）都与本阶段重叠
+                for active in self._active.values():
+                    for running in active:
+                        running.concurrent = True
+
+            if self.memory == 'tracemalloc':
+                import tracemalloc
+                current, peak = tracemalloc.get_traced_memory()
+                if stack[:-1]:
+                    stack[-2].child_peak = max(stack[-2].child_peak, peak)
+                # 峰值是进程级的，其他线程有阶段在执行时重置会破坏它们的读数
+                if not stage.concurrent:
+                    tracemalloc.reset_peak()
+                stage.memory_start = current
+            elif self.memory == 'rss':
+                stage.memory_start = _peak_rss_mb()
+
+        stage.start = time.perf_counter()
+        stage.cpu_start = time.process_time()
+        stage.thread_cpu_start = time.thread_time()
+
+    def _exit(self, stage, failed=False):
+        wall = time.perf_counter() - stage.start
+        if stage.concurrent:
+            cpu = time.thread_time() - stage.thread_cpu_start
+        else:
+            cpu = time.process_time() - stage.cpu_start
+        record = {
+            'stage': stage.name,
+            'parent': stage.parent,
+            'depth': stage.depth,
+            'start_s': round(stage.start - self._origin, 6),
+            'wall_s': round(wall, 6),
+            'cpu_s': round(cpu, 6),
+            'rows_in': stage.rows_in,
+            'rows_out': stage.rows_out,
+            'thread': threading.get_ident(),
+            'concurrent': stage.concurrent,
+            'failed': failed,
+        }
+
+        peak = 0
+        if self.memory == 'tracemalloc':
+            import tracemalloc
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, stage.child_peak)
+            if not stage.concurrent:
+                record['alloc_peak_mb'] = round((peak - stage.memory_start) / _MB, 3)
+                record['alloc_delta_mb'] = round((current - stage.memory_start) / _MB, 3)
+        elif self.memory == 'rss':
+            peak_rss = _peak_rss_mb()
+            if peak_rss is not None and not stage.concurrent:
+                record['peak_rss_mb'] = round(peak_rss, 3)
+                record['peak_rss_growth_mb'] = round(peak_rss - stage.memory_start, 3)
+
+        stack = self._stack()
+        stack.pop()
+        if self.memory == 'tracemalloc' and stack:
+            stack[-1].child_peak = max(stack[-1].child_peak, peak)
+
+        with self._lock:
+            if not stack:
+                self._active.pop(threading.get_ident(), None)
+            self.records.append(record)
+            if self._stream is not None:
+                self._stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                self._stream.flush()
+
+    def stage(self, name, rows_in=None):
+        return Stage(self, name, rows_in)
+
+    def slowest(self, top=5):
+        """按墙钟时间排序的最慢阶段（嵌套阶段的耗时同时计入父阶段）"""
+        return sorted(self.records, key=lambda record: record['wall_s'], reverse=True)[:top]
+
+    def write_chrome_trace(self, path):
+        """导出 Chrome trace-event 格式（完整事件 "X"，时间单位为微秒）"""
+        pid = os.getpid()
+        events = []
+        for record in self.records:
+            args = {key: record[key] for key in record
+                    if key not in ('stage', 'start_s', 'wall_s', 'thread', 'parent', 'depth')}
+            events.append({
+                'name': record['stage'],
+                'cat': 'pipeline',
+                'ph': 'X',
+                'ts': record['start_s'] * 1e6,
+                'dur': record['wall_s'] * 1e6,
+                'pid': pid,
+                'tid': record['thread'],
+                'args': args,
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False, default=str)
+
+    def report(self, top=5):
+        """打印最慢的阶段"""
+        if not self.records:
+            return
+        print("\n" + "=" * 60)
+        print(f"最慢的 {min(top, len(self.records))} 个阶段")
+        print("=" * 60)
+        for record in self.slowest(top):
+            rows = ""
+            if record['rows_in'] is not None or record['rows_out'] is not None:
+                rows = f"  行数 {record['rows_in']} -> {record['rows_out']}"
+            memory = ""
+            if 'peak_rss_growth_mb' in record:
+                memory = f"  峰值RSS +{record['peak_rss_growth_mb']:.1f} MB"
+            elif 'alloc_peak_mb' in record:
+                memory = f"  分配峰值 {record['alloc_peak_mb']:.1f} MB"
+            elif record['concurrent'] and self.memory is not None:
+                memory = "  内存: 与其他阶段并发，未记录"
+            print(f"  {record['stage']:<32} 墙钟 {record['wall_s']:8.3f} 秒  CPU {record['cpu_s']:8.3f} 秒"
+                  f"{memory}{rows}")
+
+    def close(self, top=5):
+        """结束跟踪：导出 Chrome trace 文件、关闭JSON-lines文件并打印最慢阶段"""
+        if self.chrome_trace_file:
+            self.write_chrome_trace(self.chrome_trace_file)
+            print(f"Chrome trace 已保存到: {self.chrome_trace_file}")
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+            print(f"阶段跟踪记录已保存到: {self.trace_file}")
+        self.report(top)
+
+
+# ==================== 全局跟踪器 ====================
+def enable_tracing(trace_file=None, chrome_trace_file=None, memory='rss'):
+    """启用全局跟踪，返回 Tracer"""
+    global _tracer
+    _tracer = Tracer(trace_file=trace_file, chrome_trace_file=chrome_trace_file, memory=memory)
+    return _tracer
+
+
+def get_tracer():
+    """当前的全局 Tracer，未启用时为None"""
+    return _tracer
+
+
+def finish_tracing(top=5):
+    """结束全局跟踪并输出结果，返回全部阶段记录"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return []
+    tracer.close(top)
+    return tracer.records
+
+
+def trace_stage(name, rows_in=None):
+    """阶段跟踪的上下文管理器；未启用跟踪时返回空操作对象"""
+    if _tracer is None:
+        return _NULL_STAGE
+    return _tracer.stage(name, rows_in)
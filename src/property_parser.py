@@ -0,0 +1,70 @@
+"""
+property列向量化解析
+property 形如 "key1:value1;key2:value2;..."，整列使用pandas字符串方法/正则一次处理，
+提供首属性键提取以及全部 key:value 对的长表展开（属性键字典编码）
+"""
+
+import numpy as np
+import pandas as pd
+
+# 跳过不含 ':' 的片段（包括空片段），捕获第一个含 ':' 片段中冒号之前的内容
+FIRST_KEY_PATTERN = r'^(?:[^:;]*;)*?([^:;]*):'
+
+
+def _as_object_strings(series):
+    """非字符串值（NaN、数字等）统一视为缺失，返回object类型的字符串列"""
+    if isinstance(series.dtype, pd.StringDtype):
+        return series.astype(object).where(series.notna(), None)
+    is_str = series.map(lambda value: isinstance(value, str), na_action='ignore').fillna(False).astype(bool)
+    return series.where(is_str, None).astype(object)
+
+
+def extract_first_property_keys(series):
+    """提取每行的第一个属性键，规则与逐行版本一致：
+
+    空值、空串和非字符串返回None；只有同时包含 ':' 和 ';' 的字符串才会提取
+    """
+    values = _as_object_strings(series)
+    present = values.notna().to_numpy()
+    keys = np.full(len(series), None, dtype=object)
+    if not present.any():
+        return pd.Series(keys, index=series.index, dtype=object)
+
+    # 相同的property值只解析一次
+    codes, uniques = pd.factorize(values[present])
+    uniques = pd.Series(uniques, dtype=object)
+    has_both = uniques.str.contains(':', regex=False) & uniques.str.contains(';', regex=False)
+    parsed = uniques.str.extract(FIRST_KEY_PATTERN, expand=False)
+    parsed = np.where((has_both & parsed.notna()).to_numpy(), parsed.to_numpy(dtype=object), None)
+
+    keys[present] = parsed[codes]
+    return pd.Series(keys, index=series.index, dtype=object)
+
+
+def explode_properties(series, intern_values=False):
+    """把property列展开为 (row, key, value) 长表
+
+    row 为原DataFrame中的位置序号；key 使用category字典编码，
+    intern_values=True 时 value 也使用字典编码
+    """
+    values = _as_object_strings(series).reset_index(drop=True)
+    parts = values.dropna().str.split(';').explode()
+    parts = parts[parts.str.contains(':', regex=False, na=False)]
+
+    if parts.empty:
+        # 没有任何 key:value 片段时 str.partition 返回无列的DataFrame，直接给出空长表
+        result = pd.DataFrame({
+            'row': np.array([], dtype='int64'),
+            'key': pd.Categorical([]),
+            'value': np.array([], dtype=object),
+        })
+    else:
+        pairs = parts.str.partition(':')
+        result = pd.DataFrame({
+            'row': parts.index.to_numpy(dtype='int64'),
+            'key': pd.Categorical(pairs[0].to_numpy(dtype=object)),
+            'value': pairs[2].to_numpy(dtype=object),
+        })
+    if intern_values:
+        result['value'] = result['value'].astype('category')
+    return result
@@ -0,0 +1,411 @@
+"""
+日期 × 一级类别（day × cat1）汇总立方体
+每个单元格保存 行数、购买总量、交易笔数（auction_id 非空计数）和用户的 HyperLogLog 草图，
+按月/按天/按类别的销量、交易笔数以及用户数都可以从几千个单元格上汇总得到，不需要读取明细表。
+立方体保存在本地文件或MySQL汇总表中，刷新时只读取水位线（原始 day 值）当天及之后的数据，
+水位线当天的单元格重新汇总（纳入当天晚到的行），其余新数据直接合并；
+汇总数据和水位线总是一起替换，中途失败时下次刷新仍从旧水位线开始，不会重复计入
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from day_decode import decode_day
+from distinct_sketch import DistinctEstimate, GroupedHyperLogLog
+from db_stream import iter_table_chunks, _placeholder, DEFAULT_CHUNK_SIZE
+
+# 单元格用户草图的精度：每个单元格 1KB，相对标准误差约 3.3%
+CUBE_PRECISION = 10
+
+DEFAULT_CUBE_DIR = ".rollup_cube"
+DEFAULT_SUMMARY_TABLE = "rollup_day_cat1"
+
+# 汇总表的元数据表（一行：来源表、水位线、精度等）的表名后缀，与汇总表在同一条 RENAME 中替换
+META_TABLE_SUFFIX = "__meta"
+
+# 单元格的度量列（day_key 为 YYYYMMDD 整数，无效日期为 0；cat1 缺失为 NaN）
+CELL_COLUMNS = ['day_key', 'cat1', 'row_count', 'quantity', 'transactions']
+
+
+# ==================== 单元格计算 ====================
+def _day_keys(day):
+    """日期列转换为 YYYYMMDD 整数键，无效日期为0
+
+    原始列按与预处理相同的规则解码；数值列先转为可空整数，
+    含缺失值的块读出为浮点列（20140110.0）时与整数块得到相同的日期
+    """
+    if not pd.api.types.is_datetime64_any_dtype(day):
+        if pd.api.types.is_float_dtype(day):
+            whole = day.isna() | (day == np.floor(day))
+            day = day.where(whole).astype('Int64')
+        day = decode_day(day)
+    keys = day.dt.year * 10000 + day.dt.month * 100 + day.dt.day
+    return keys.fillna(0).to_numpy(dtype=np.int64)
+
+
+def _user_keys(user_id):
+    """用户ID统一为字符串形式，同一个ID在整数列/浮点列/字符串列中得到相同的哈希"""
+    if isinstance(user_id.dtype, pd.CategoricalDtype):
+        user_id = user_id.astype(object)
+    if pd.api.types.is_numeric_dtype(user_id):
+        try:
+            integers = user_id.astype('Int64')
+            return integers.astype(str).where(integers.notna(), None)
+        except (TypeError, ValueError):
+            pass
+    return user_id.astype(str).where(user_id.notna(), None)
+
+
+def _is_whole(values):
+    """整数列，或含缺失值读出为浮点列但取值都是整数（按块读取时同一列在不同块中的类型可能不同）"""
+    if pd.api.types.is_integer_dtype(values):
+        return True
+    if not pd.api.types.is_float_dtype(values):
+        return False
+    values = values.dropna()
+    return bool((values == np.floor(values)).all())
+
+
+def _key_dtype(cat1):
+    """cat1 汇总键的类型：取值都是整数时为 int64，否则为 float64"""
+    return 'int64' if _is_whole(cat1) else 'float64'
+
+
+def _group_cells(day_key, cat1, row_count, quantity, transactions, registers):
+    """按 (day_key, cat1) 合并相同的单元格：度量相加，草图逐寄存器取最大值"""
+    day_codes, day_uniques = pd.factorize(day_key, sort=True)
+    cat_codes, cat_uniques = pd.factorize(cat1, sort=True, use_na_sentinel=False)
+    group = day_codes.astype(np.int64) * len(cat_uniques) + cat_codes
+    groups, inverse = np.unique(group, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+    cells = pd.DataFrame({
+        'day_key': np.asarray(day_uniques)[groups // len(cat_uniques)],
+        'cat1': np.asarray(cat_uniques, dtype=np.float64)[groups % len(cat_uniques)],
+        'row_count': np.bincount(inverse, weights=row_count, minlength=len(groups)).astype(np.int64),
+        'quantity': np.bincount(inverse, weights=quantity, minlength=len(groups)),
+        'transactions': np.bincount(inverse, weights=transactions, minlength=len(groups)).astype(np.int64),
+    })
+    merged = np.maximum.reduceat(registers[order], starts, axis=0) if len(order) else registers[:0]
+    return cells, merged
+
+
+class RollupCube:
+    """day × cat1 汇总立方体
+
+    watermark 为已汇总数据中原始 day 列的最大值，刷新时读取 day >= watermark 的行并重新汇总水位线当天；
+    quantity_integer / cat1_dtype 记录原始列的类型，汇总结果的类型与明细数据上的聚合一致
+    """
+
+    def __init__(self, cells=None, registers=None, precision=CUBE_PRECISION, watermark=None,
+                 quantity_integer=True, cat1_dtype='float64'):
+        self.cells = cells if cells is not None else pd.DataFrame(
+            {'day_key': np.empty(0, np.int64), 'cat1': np.empty(0), 'row_count': np.empty(0, np.int64),
+             'quantity': np.empty(0), 'transactions': np.empty(0, np.int64)})
+        self.registers = registers if registers is not None else \
+            np.zeros((len(self.cells), 1 << precision), dtype=np.uint8)
+        self.precision = precision
+        self.watermark = watermark
+        self.quantity_integer = quantity_integer
+        self.cat1_dtype = cat1_dtype
+
+    @property
+    def rows(self):
+        return int(self.cells['row_count'].sum())
+
+    @classmethod
+    def from_frame(cls, df, precision=CUBE_PRECISION):
+        """由一块明细数据（原始表的列，或预处理后的数据）建立立方体"""
+        if df is None or len(df) == 0:
+            return cls(precision=precision)
+        day_key = _day_keys(df['day'])
+        cat1 = pd.to_numeric(df['cat1'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        quantity = np.nan_to_num(pd.to_numeric(df['buy_mount'], errors='coerce')
+                                 .to_numpy(dtype=np.float64, na_value=np.nan))
+        transactions = df['auction_id'].notna().to_numpy().astype(np.float64)
+
+        # 先在行上分组得到单元格编号，再为每个单元格建立用户草图
+        day_codes, day_uniques = pd.factorize(day_key, sort=True)
+        cat_codes, cat_uniques = pd.factorize(cat1, sort=True, use_na_sentinel=False)
+        row_groups = day_codes.astype(np.int64) * len(cat_uniques) + cat_codes
+        groups, inverse = np.unique(row_groups, return_inverse=True)
+        sketch = GroupedHyperLogLog(pd.RangeIndex(len(groups)), precision).add(inverse, _user_keys(df['user_id']))
+        cells, registers = _group_cells(
+            np.asarray(day_uniques)[groups // len(cat_uniques)],
+            np.asarray(cat_uniques, dtype=np.float64)[groups % len(cat_uniques)],
+            np.bincount(inverse, minlength=len(groups)),
+            np.bincount(inverse, weights=quantity, minlength=len(groups)),
+            np.bincount(inverse, weights=transactions, minlength=len(groups)),
+            sketch.registers)
+
+        watermark = None
+        if pd.api.types.is_numeric_dtype(df['day']) and df['day'].notna().any():
+            watermark = df['day'].max()
+            watermark = int(watermark) if float(watermark).is_integer() else float(watermark)
+        return cls(cells, registers, precision, watermark,
+                   quantity_integer=_is_whole(df['buy_mount']), cat1_dtype=_key_dtype(df['cat1']))
+
+    @classmethod
+    def from_chunks(cls, chunks, precision=CUBE_PRECISION):
+        """逐块建立并合并"""
+        cube = None
+        for chunk in chunks:
+            if chunk is None or len(chunk) == 0:
+                continue
+            part = cls.from_frame(chunk, precision)
+            cube = part if cube is None else cube.merge(part)
+        return cube if cube is not None else cls(precision=precision)
+
+    def merge(self, other):
+        """合并另一个立方体（例如新到达的数据），返回新的立方体"""
+        if other.precision != self.precision:
+            raise ValueError(f"草图精度不同: {self.precision} 与 {other.precision}")
+        if len(other.cells) == 0:
+            return self
+        if len(self.cells) == 0:
+            return other
+        cells = pd.concat([self.cells, other.cells], ignore_index=True)
+        merged_cells, registers = _group_cells(
+            cells['day_key'].to_numpy(), cells['cat1'].to_numpy(), cells['row_count'].to_numpy(),
+            cells['quantity'].to_numpy(), cells['transactions'].to_numpy(),
+            np.concatenate([self.registers, other.registers]))
+        watermarks = [w for w in (self.watermark, other.watermark) if w is not None]
+        return RollupCube(merged_cells, registers, self.precision,
+                          watermark=max(watermarks) if watermarks else None,
+                          quantity_integer=self.quantity_integer and other.quantity_integer,
+                          cat1_dtype=str(np.result_type(self.cat1_dtype, other.cat1_dtype)))
+
+    def without_day(self, day_key):
+        """去掉某一天（YYYYMMDD 整数键）的全部单元格，返回新的立方体（水位线不变）"""
+        keep = (self.cells['day_key'] != day_key).to_numpy()
+        return RollupCube(self.cells[keep].reset_index(drop=True), self.registers[keep], self.precision,
+                          self.watermark, self.quantity_integer, self.cat1_dtype)
+
+    # ==================== 查询 ====================
+    def _quantity(self, values):
+        return values.round().astype(np.int64) if self.quantity_integer else values
+
+    def _rollup(self, key, cells, registers=None):
+        """按 key 汇总单元格，返回 (按key升序的汇总表, 每组合并后的草图或None)"""
+        codes, uniques = pd.factorize(key, sort=True)
+        valid = codes >= 0
+        codes = codes[valid]
+        summary = pd.DataFrame({
+            'sum_buy_mount': np.bincount(codes, weights=cells['quantity'].to_numpy()[valid], minlength=len(uniques)),
+            'count_auction_id': np.bincount(codes, weights=cells['transactions'].to_numpy()[valid],
+                                            minlength=len(uniques)).astype(np.int64),
+            'size': np.bincount(codes, weights=cells['row_count'].to_numpy()[valid],
+                                minlength=len(uniques)).astype(np.int64),
+        })
+        summary['sum_buy_mount'] = self._quantity(summary['sum_buy_mount'])
+        sketches = None
+        if registers is not None and len(codes):
+            order = np.argsort(codes, kind='stable')
+            starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+            sketches = np.maximum.reduceat(registers[valid][order], starts, axis=0)
+        return uniques, summary, sketches
+
+    def _dates(self, cells):
+        valid = cells['day_key'].to_numpy() > 0
+        dates = pd.to_datetime(pd.Series(cells['day_key'].to_numpy()[valid]).astype(str), format='%Y%m%d')
+        return valid, dates
+
+    def _key_series(self, by):
+        """每个单元格在某个汇总维度上的取值（不属于任何分组的为缺失）"""
+        if by == 'cat1':
+            return self.cells['cat1']
+        valid, dates = self._dates(self.cells)
+        values = dates if by == 'day' else dates.dt.to_period('M')
+        full = pd.Series(pd.NaT, index=self.cells.index, dtype=values.dtype)
+        full[valid] = values.to_numpy() if by == 'day' else values.array
+        return full
+
+    def aggregates(self):
+        """与共享聚合计划格式相同的结果：{'year_month'|'day'|'cat1': DataFrame}
+
+        可直接交给 analyze_sales_trend / analyze_product_categories
+        """
+        results = {}
+        for key in ('year_month', 'day', 'cat1'):
+            uniques, summary, _ = self._rollup(self._key_series(key), self.cells)
+            values = pd.Series(uniques)
+            if key == 'cat1' and pd.api.types.is_integer_dtype(np.dtype(self.cat1_dtype)):
+                values = values.astype(self.cat1_dtype)
+            summary.insert(0, key, values.array if key == 'year_month' else values.to_numpy())
+            results[key] = summary
+        return results
+
+    def user_counts(self, by=None):
+        """用户数估计：by=None 时为全体用户（DistinctEstimate），否则为按 year_month/day/cat1 的Series"""
+        if by is None:
+            registers = self.registers.max(axis=0) if len(self.registers) else \
+                np.zeros(1 << self.precision, dtype=np.uint8)
+            sketch = GroupedHyperLogLog([0], self.precision, registers[None, :])
+            return DistinctEstimate(float(sketch.count().iloc[0]), sketch.relative_error)
+        uniques, _, registers = self._rollup(self._key_series(by), self.cells, self.registers)
+        if registers is None:
+            return pd.Series([], dtype=float, name='users')
+        sketch = GroupedHyperLogLog(pd.Index(uniques, name=by), self.precision, registers)
+        return sketch.count().round().astype(np.int64).rename('users')
+
+    def dataset_summary(self):
+        """数据集概况，格式与 pushdown_dataset_summary 的概况字典相同（用户数为近似值）"""
+        valid, dates = self._dates(self.cells)
+        categories = self.cells['cat1'].dropna().nunique()
+        return {
+            'rows': self.rows,
+            'users': self.user_counts(),
+            'categories': int(categories),
+            'day_min': dates.min() if len(dates) else pd.NaT,
+            'day_max': dates.max() if len(dates) else pd.NaT,
+        }
+
+    # ==================== 序列化 ====================
+    def meta(self):
+        return {'precision': self.precision, 'watermark': self.watermark,
+                'quantity_integer': self.quantity_integer, 'cat1_dtype': self.cat1_dtype}
+
+    @classmethod
+    def from_parts(cls, cells, registers, meta):
+        return cls(cells, registers, meta['precision'], meta['watermark'],
+                   meta['quantity_integer'], meta['cat1_dtype'])
+
+
+# ==================== 存储 ====================
+class LocalCubeStore:
+    """立方体保存为本地 .npz 文件（单元格度量 + 草图寄存器 + 元数据）"""
+
+    def __init__(self, table_name, cube_dir=DEFAULT_CUBE_DIR):
+        safe_name = re.sub(r'[^0-9A-Za-z_.-]+', '_', table_name).strip('_')
+        self.path = os.path.join(cube_dir, safe_name + ".npz")
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with np.load(self.path, allow_pickle=False) as data:
+            cells = pd.DataFrame({column: data[column] for column in CELL_COLUMNS})
+            return RollupCube.from_parts(cells, data['registers'], json.loads(str(data['meta'])))
+
+    def save(self, cube):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = self.path + ".tmp.npz"
+        arrays = {column: cube.cells[column].to_numpy() for column in CELL_COLUMNS}
+        np.savez_compressed(temp_path, registers=cube.registers, meta=np.array(json.dumps(cube.meta())), **arrays)
+        # 写完后再替换，读取方不会读到写了一半的文件
+        os.replace(temp_path, self.path)
+
+
+class MySQLCubeStore:
+    """立方体保存在MySQL汇总表中（草图以十六进制文本存储），元数据和水位线记录在同名的元数据表
+
+    两张表都先写入临时表，再用一条 RENAME TABLE 语句一起替换，
+    不会出现汇总表已更新而水位线还是旧值（下次刷新重复计入新数据）的情况
+    """
+
+    def __init__(self, connection, source_table, summary_table=DEFAULT_SUMMARY_TABLE):
+        self.connection = connection
+        self.source_table = source_table
+        self.summary_table = summary_table
+        self.meta_table = summary_table + META_TABLE_SUFFIX
+
+    def load(self):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("SELECT COUNT(*) FROM information_schema.tables "
+                           "WHERE table_schema = DATABASE() AND table_name = %s", (self.meta_table,))
+            if cursor.fetchone()[0] == 0:
+                return None
+            cursor.execute(f"SELECT `meta` FROM `{self.meta_table}`")
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            meta = json.loads(row[0])
+            cursor.execute(f"SELECT `day_key`, `cat1`, `row_count`, `quantity`, `transactions`, `user_sketch` "
+                           f"FROM `{self.summary_table}`")
+            records = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        frame = pd.DataFrame.from_records(records, columns=CELL_COLUMNS + ['user_sketch'])
+        cells = pd.DataFrame({
+            'day_key': frame['day_key'].astype(np.int64),
+            'cat1': pd.to_numeric(frame['cat1']).astype(np.float64),
+            'row_count': frame['row_count'].astype(np.int64),
+            'quantity': frame['quantity'].astype(np.float64),
+            'transactions': frame['transactions'].astype(np.int64),
+        })
+        width = 1 << meta['precision']
+        registers = np.frombuffer(bytes.fromhex("".join(frame['user_sketch'])), dtype=np.uint8)
+        return RollupCube.from_parts(cells, registers.reshape(-1, width).copy(), meta)
+
+    def save(self, cube):
+        from bulk_writer import BulkTableWriter, commit_tables
+        frame = cube.cells[CELL_COLUMNS].copy()
+        frame['user_sketch'] = [row.tobytes().hex() for row in cube.registers]
+        meta = pd.DataFrame({'source_table': [self.source_table], 'watermark_value': [str(cube.watermark)],
+                             'meta': [json.dumps(cube.meta())], 'updated_at': [datetime.now()]})
+        writers = [BulkTableWriter(self.connection, self.summary_table),
+                   BulkTableWriter(self.connection, self.meta_table)]
+        try:
+            writers[0].write(frame)
+            writers[1].write(meta)
+        except Exception:
+            for writer in writers:
+                writer.abort()
+            raise
+        commit_tables(writers)
+
+
+def open_cube_store(kind, connection, source_table, cube_dir=DEFAULT_CUBE_DIR, summary_table=None):
+    """kind='local' 使用本地文件，kind='mysql' 使用MySQL汇总表"""
+    if kind == 'local':
+        return LocalCubeStore(source_table, cube_dir)
+    if kind == 'mysql':
+        return MySQLCubeStore(connection, source_table, summary_table or DEFAULT_SUMMARY_TABLE)
+    raise ValueError(f"不支持的立方体存储方式: {kind}")
+
+
+def refresh_cube(connection, source_table, store, chunk_size=DEFAULT_CHUNK_SIZE, precision=CUBE_PRECISION):
+    """增量刷新立方体：汇总水位线当天及之后的数据并合并，返回 (立方体, 新汇总的行数)
+
+    单元格中的计数和用户草图无法逐行去重，因此水位线当天的单元格整体丢弃后按 day >= 水位线
+    重新汇总，当天晚到的行不会被跳过，已汇总的行也不会重复计入；水位线不是有效日期时
+    （无效日期都落在 day_key=0 的单元格中，无法只去掉这一天）仍只读取 day > 水位线 的数据。
+    首次刷新时汇总整张表；与增量清洗相同，day 为空的行只在首次构建时计入
+    """
+    cube = store.load()
+    boundary_key = 0
+    if cube is None or cube.watermark is None:
+        print("未找到汇总立方体，汇总整张表")
+        where, where_params = None, None
+        cube = None
+    else:
+        boundary_key = int(_day_keys(pd.Series([cube.watermark]))[0])
+        operator = '>=' if boundary_key else '>'
+        print(f"汇总立方体水位线: day {operator} {cube.watermark}")
+        where, where_params = f"`day` {operator} {_placeholder(connection)}", [cube.watermark]
+
+    chunks = iter_table_chunks(connection, source_table, chunk_size=chunk_size,
+                               where=where, where_params=where_params,
+                               columns=['user_id', 'auction_id', 'cat1', 'buy_mount', 'day'])
+    delta = RollupCube.from_chunks(chunks, precision=cube.precision if cube is not None else precision)
+    new_rows = delta.rows
+    if cube is None:
+        cube = delta
+    elif new_rows:
+        base = cube.without_day(boundary_key) if boundary_key else cube
+        # 重新汇总的水位线当天中，之前已汇总过的行不算新行
+        new_rows -= cube.rows - base.rows
+        cube = base.merge(delta)
+
+    if new_rows:
+        store.save(cube)
+        print(f"汇总立方体已更新: 新增 {new_rows} 行明细，共 {len(cube.cells)} 个单元格，水位线 day = {cube.watermark}")
+    else:
+        print("没有新数据，汇总立方体无需更新")
+    return cube, new_rows
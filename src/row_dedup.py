@@ -0,0 +1,525 @@
+"""
+基于整行哈希的去重
+每行先用向量化哈希压缩成64位（或128位）键，之后只比较哈希键，不再比较整行（包括很长的property字符串）。
+DuplicateFilter 可以跨数据块、跨多次运行去重：
+    - 内存模式：已出现的哈希键保存为若干有序数组（每个键8/16字节），精确判断；
+    - 溢写模式：超出内存上限后有序数组写到磁盘并用内存映射查找，仍然精确；
+    - Bloom模式：超出内存上限后改用Bloom过滤器，内存固定，误判率可配置（误判会把新行当作重复删除），
+      装满后报错而不是继续以更高的误判率删除新行。
+指定 spill_dir 时状态保存在该目录，下次用同一目录创建即可继续去重（例如多次增量清洗）；
+在 with 语句中出错退出时不保存本次记录的键，目录中保留上次成功运行后的状态
+"""
+
+import json
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 两次哈希使用不同的16字节密钥（只影响字符串列），组合成128位键
+_HASH_KEYS = ("0123456789123456", "taobao-dedup-128")
+
+_KEY_DTYPES = {
+    64: np.dtype('<u8'),
+    128: np.dtype([('hi', '<u8'), ('lo', '<u8')]),
+}
+
+_MB = 1024 * 1024
+
+_META_FILE = "dedup_meta.json"
+_BLOOM_FILE = "bloom.bin"
+
+# 磁盘上的有序数组超过这个数量时合并，控制每块查找的次数
+_MAX_DISK_RUNS = 8
+
+# 合并磁盘上的有序数组时每次读入的键数
+_MERGE_BLOCK = 1 << 20
+
+
+# ==================== 行哈希 ====================
+def _mix64(values):
+    """splitmix64 的最终混合步骤（64位上的双射），由64位哈希派生第二个独立的哈希"""
+    with np.errstate(over='ignore'):
+        z = values + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _typed_value(value):
+    """混合类型的对象列：数字统一写成数值形式，其他非字符串值带上类型名，避免 1000 与 '1000' 哈希相同"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (bool, int, np.integer)):
+        return f"\x1fnum:{int(value)}"
+    if isinstance(value, (float, np.floating)):
+        number = float(value)
+        return f"\x1fnum:{int(number)}" if number.is_integer() else f"\x1fnum:{number!r}"
+    return f"\x1f{type(value).__name__}:{value}"
+
+
+def _hashable_frame(df):
+    """纯字符串或纯数值的列原样哈希，只有混合类型的对象列需要逐个转换"""
+    columns = {}
+    for column in df.columns:
+        series = df[column]
+        if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in ('string', 'empty'):
+            series = series.map(_typed_value, na_action='ignore')
+        columns[column] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _chained_hashes(frame):
+    """逐列哈希后依次混合成一个64位哈希
+
+    数值列的哈希与 hash_key 无关，只换密钥再算一次 hash_pandas_object 时纯数值的行两次结果相同；
+    这里换用另一种组合方式（每一步都是双射，只有一列不同的两行一定不同），与其结果相互独立
+    """
+    combined = np.zeros(len(frame), dtype=np.uint64)
+    for column in frame.columns:
+        hashes = pd.util.hash_pandas_object(frame[column], index=False, hash_key=_HASH_KEYS[1]).to_numpy()
+        combined = _mix64(combined ^ hashes)
+    return combined
+
+
+def row_hashes(df, bits=64):
+    """每行的哈希键：bits=64 时为 uint64 数组，bits=128 时为 (hi, lo) 结构化数组
+
+    与 DataFrame.duplicated 一致，缺失值（None/NaN）视为相等
+    """
+    if bits not in _KEY_DTYPES:
+        raise ValueError(f"不支持的哈希位数: {bits}")
+    frame = _hashable_frame(df)
+    if bits == 64:
+        return pd.util.hash_pandas_object(frame, index=False, hash_key=_HASH_KEYS[0]).to_numpy()
+    keys = np.empty(len(frame), dtype=_KEY_DTYPES[128])
+    keys['hi'] = pd.util.hash_pandas_object(frame, index=False, hash_key=_HASH_KEYS[0]).to_numpy()
+    keys['lo'] = _chained_hashes(frame)
+    return keys
+
+
+def _duplicated_keys(keys):
+    """块内重复：除第一次出现外都标记为True"""
+    if keys.dtype.names:
+        return pd.DataFrame({name: keys[name] for name in keys.dtype.names}).duplicated().to_numpy(copy=True)
+    return pd.Series(keys).duplicated().to_numpy(copy=True)
+
+
+def duplicated_rows(df, bits=64):
+    """按整行哈希标记重复行（与 df.duplicated() 相同的含义，返回布尔数组）"""
+    return _duplicated_keys(row_hashes(df, bits))
+
+
+# ==================== 有序数组存储（精确） ====================
+def _sorted_contains(run, keys):
+    """keys 中哪些出现在有序数组 run 中"""
+    if len(run) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    positions = np.searchsorted(run, keys)
+    found = positions < len(run)
+    found[found] = run[positions[found]] == keys[found]
+    return found
+
+
+def _merge_files(first, second, path, dtype):
+    """分块归并两个磁盘上的有序数组，内存占用不超过 2 * _MERGE_BLOCK 个键"""
+    i = j = 0
+    with open(path, 'wb') as f:
+        while i < len(first) or j < len(second):
+            a = np.asarray(first[i:i + _MERGE_BLOCK])
+            b = np.asarray(second[j:j + _MERGE_BLOCK])
+            if len(a) and len(b):
+                # 只输出不大于两块末尾较小者的键，剩余部分留到下一轮
+                # （用长度为1的数组比较，128位的结构化键也适用）
+                pivot = np.sort(np.concatenate([a[-1:], b[-1:]]))[:1]
+                a = a[:np.searchsorted(a, pivot, side='right')[0]]
+                b = b[:np.searchsorted(b, pivot, side='right')[0]]
+            merged = np.concatenate([a, b])
+            merged.sort(kind='stable')
+            merged.astype(dtype, copy=False).tofile(f)
+            i += len(a)
+            j += len(b)
+
+
+class _SortedRuns:
+    """已出现的哈希键，保存为若干互不相交的有序数组
+
+    新键作为一个有序数组加入，相邻数组按大小合并，数组个数保持在 O(log n)；
+    内存中的键超过 max_bytes 时整体写到磁盘，之后用内存映射查找
+    """
+
+    def __init__(self, dtype, max_bytes, directory_factory):
+        self.dtype = dtype
+        self.max_bytes = max_bytes
+        self._directory = directory_factory
+        self.memory_runs = []
+        self.disk_runs = []
+        self._next_file = 0
+        # 已保存的状态引用的文件：合并后也要保留到新状态保存（或放弃本次变化）时
+        self._committed = set()
+        self._obsolete = []
+
+    @property
+    def size(self):
+        return sum(len(run) for run in self.memory_runs) + sum(len(run) for _, run in self.disk_runs)
+
+    @property
+    def memory_bytes(self):
+        return sum(run.nbytes for run in self.memory_runs)
+
+    def contains(self, keys):
+        found = np.zeros(len(keys), dtype=bool)
+        for run in self.memory_runs + [run for _, run in self.disk_runs]:
+            remaining = ~found
+            if not remaining.any():
+                break
+            found[remaining] = _sorted_contains(run, keys[remaining])
+        return found
+
+    def add(self, keys):
+        """加入有序且互不重复、也未出现过的键"""
+        if len(keys) == 0:
+            return
+        self.memory_runs.append(np.array(keys, dtype=self.dtype))
+        while len(self.memory_runs) > 1 and len(self.memory_runs[-2]) < 2 * len(self.memory_runs[-1]):
+            last = self.memory_runs.pop()
+            merged = np.concatenate([self.memory_runs.pop(), last])
+            merged.sort(kind='stable')
+            self.memory_runs.append(merged)
+
+    def memory_exceeded(self):
+        return self.memory_bytes > self.max_bytes
+
+    def all_memory_keys(self):
+        return np.concatenate(self.memory_runs) if self.memory_runs else np.empty(0, dtype=self.dtype)
+
+    # ---------- 磁盘 ----------
+    def _new_file(self):
+        directory = self._directory()
+        while True:
+            path = os.path.join(directory, f"run-{self._next_file:06d}.bin")
+            self._next_file += 1
+            if not os.path.exists(path):
+                return path
+
+    def _open(self, path):
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(path, dtype=self.dtype, mode='r')
+
+    def spill(self):
+        """把内存中的键合并成一个有序数组写到磁盘"""
+        if not self.memory_runs:
+            return
+        keys = self.all_memory_keys()
+        keys.sort(kind='stable')
+        path = self._new_file()
+        keys.tofile(path)
+        self.memory_runs = []
+        self.disk_runs.append((path, self._open(path)))
+        self._compact_disk()
+
+    def _compact_disk(self):
+        while len(self.disk_runs) > _MAX_DISK_RUNS:
+            # 合并最小的两个
+            self.disk_runs.sort(key=lambda item: len(item[1]), reverse=True)
+            (second_path, second), (first_path, first) = self.disk_runs.pop(), self.disk_runs.pop()
+            path = self._new_file()
+            _merge_files(first, second, path, self.dtype)
+            del first, second
+            self._remove(first_path)
+            self._remove(second_path)
+            self.disk_runs.append((path, self._open(path)))
+
+    def _remove(self, path):
+        if os.path.basename(path) in self._committed:
+            self._obsolete.append(path)
+        else:
+            os.remove(path)
+
+    def load(self, files):
+        for name in files:
+            path = os.path.join(self._directory(), name)
+            self.disk_runs.append((path, self._open(path)))
+        self._next_file = len(files)
+        self._committed = set(files)
+
+    def files(self):
+        return [os.path.basename(path) for path, _ in self.disk_runs]
+
+    def commit(self):
+        """新的状态已保存：删除旧状态引用、现在已被合并掉的文件"""
+        for path in self._obsolete:
+            if os.path.exists(path):
+                os.remove(path)
+        self._obsolete = []
+        self._committed = set(self.files())
+
+    def discard(self):
+        """放弃上次保存之后的变化：删除之后新写的文件，旧状态引用的文件原样保留"""
+        for path, _ in self.disk_runs:
+            if os.path.basename(path) not in self._committed:
+                os.remove(path)
+        self.memory_runs = []
+        self.disk_runs = []
+        self._obsolete = []
+
+
+# ==================== Bloom过滤器（近似） ====================
+class DedupCapacityError(RuntimeError):
+    """Bloom过滤器已满：继续插入会使误判率超过目标值，把更多的新行误删为重复行"""
+
+
+def bloom_filter_bytes(rows, error_rate):
+    """容纳 rows 个键且误判率不超过 error_rate 的Bloom过滤器的字节数：m = -n * ln(p) / ln2^2 位"""
+    words = math.ceil(-rows * math.log(error_rate) / math.log(2) ** 2 / 64)
+    # 多留一个字，避免浮点舍入使容量略小于 rows
+    return (words + 1) * 8
+
+
+class _BloomFilter:
+    """位数组大小为 max_bytes，哈希函数个数 k 由目标误判率决定
+
+    容量（误判率不超过目标值时可插入的键数）约为 -m * ln2^2 / ln(error_rate)，
+    插入超过容量的键时抛出 DedupCapacityError
+    """
+
+    def __init__(self, max_bytes, error_rate, words=None, hashes=None, count=0):
+        if not 0 < error_rate < 1:
+            raise ValueError(f"误判率必须在0和1之间: {error_rate}")
+        self.error_rate = error_rate
+        self.words = words if words is not None else np.zeros(max(1, max_bytes // 8), dtype=np.uint64)
+        self.bits = len(self.words) * 64
+        self.hashes = hashes or max(1, round(-math.log(error_rate) / math.log(2)))
+        self.count = count
+        self.capacity = int(-self.bits * math.log(2) ** 2 / math.log(error_rate))
+
+    def _positions(self, keys):
+        if keys.dtype.names:
+            first, second = keys['hi'], keys['lo']
+        else:
+            first, second = keys, _mix64(keys)
+        second = second | np.uint64(1)
+        steps = np.arange(self.hashes, dtype=np.uint64)[:, None]
+        with np.errstate(over='ignore'):
+            return (first[None, :] + steps * second[None, :]) % np.uint64(self.bits)
+
+    def contains(self, keys):
+        if len(keys) == 0:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(keys)
+        bits = (self.words[positions >> np.uint64(6)] >> (positions & np.uint64(63))) & np.uint64(1)
+        return bits.all(axis=0)
+
+    def add(self, keys):
+        if len(keys) == 0:
+            return
+        if self.count + len(keys) > self.capacity:
+            raise DedupCapacityError(
+                f"Bloom过滤器已满：容量 {self.capacity} 个键（{len(self.words) * 8 / _MB:.1f} MB，"
+                f"误判率 {self.error_rate:g}），已有 {self.count} 个，本次加入 {len(keys)} 个；"
+                f"请增大内存上限、给出预计行数或改用溢写模式")
+        positions = self._positions(keys).ravel()
+        np.bitwise_or.at(self.words, positions >> np.uint64(6), np.uint64(1) << (positions & np.uint64(63)))
+        self.count += len(keys)
+
+    def estimated_error_rate(self):
+        """按已插入键数估计的误判率 (1 - e^(-kn/m))^k"""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+
+# ==================== 去重器 ====================
+class DuplicateFilter:
+    """跨数据块的整行去重
+
+    bits：哈希位数，64 位在上亿行时仍极少碰撞，128 位几乎不会碰撞；
+    max_memory_mb：保存已出现哈希键的内存上限；
+    fallback：超出内存上限后的方式，'spill' 溢写到磁盘（精确），'bloom' 改用Bloom过滤器（近似）；
+    error_rate：Bloom过滤器的目标误判率；
+    expected_rows：预计检查的总行数，用于确定Bloom过滤器的大小（未给出时用满内存上限），
+    内存上限装不下时改为溢写；Bloom过滤器装满后抛出 DedupCapacityError，不会继续误删新行；
+    spill_dir：保存状态的目录，为None时使用临时目录并在 close() 时删除
+    """
+
+    def __init__(self, bits=64, max_memory_mb=256, fallback='spill', error_rate=1e-4, spill_dir=None,
+                 expected_rows=None):
+        if bits not in _KEY_DTYPES:
+            raise ValueError(f"不支持的哈希位数: {bits}")
+        if fallback not in ('spill', 'bloom'):
+            raise ValueError(f"不支持的回退方式: {fallback}")
+        self.bits = bits
+        self.max_bytes = int(max_memory_mb * _MB)
+        self.fallback = fallback
+        self.error_rate = error_rate
+        self.expected_rows = expected_rows
+        self.spill_dir = spill_dir
+        self.persistent = spill_dir is not None
+        self.mode = 'memory'
+        self.rows = 0
+        self.duplicates = 0
+        self._bloom = None
+        self._bloom_file = None
+        self._runs = _SortedRuns(_KEY_DTYPES[bits], self.max_bytes, self._directory)
+        if self.persistent and os.path.exists(os.path.join(spill_dir, _META_FILE)):
+            self._load_state()
+
+    def _directory(self):
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='taobao_dedup_')
+        os.makedirs(self.spill_dir, exist_ok=True)
+        return self.spill_dir
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # 清洗失败时本次记录的键对应的行并未写出，不能保存，否则下次会被当作重复行删除
+        self.close(commit=exc_type is None)
+        return False
+
+    def expect_rows(self, rows):
+        """给出预计检查的总行数（未指定 expected_rows 时使用）"""
+        if self.expected_rows is None:
+            self.expected_rows = rows
+
+    # ---------- 去重 ----------
+    def duplicated(self, chunk):
+        """标记本块中在之前的块或本块前面已出现过的行（返回布尔数组），并记录本块的新行"""
+        keys = row_hashes(chunk, self.bits)
+        duplicated = _duplicated_keys(keys)
+        candidates = np.flatnonzero(~duplicated)
+        if len(candidates):
+            order = np.argsort(keys[candidates], kind='stable')
+            candidates = candidates[order]
+            sorted_keys = keys[candidates]
+            seen = self._store_contains(sorted_keys)
+            duplicated[candidates[seen]] = True
+            self._store_add(sorted_keys[~seen])
+        self.rows += len(chunk)
+        self.duplicates += int(duplicated.sum())
+        return duplicated
+
+    def drop_duplicates(self, chunk):
+        """去掉本块中已出现过的行"""
+        duplicated = self.duplicated(chunk)
+        return chunk[~duplicated] if duplicated.any() else chunk
+
+    def _store_contains(self, keys):
+        if self.mode == 'bloom':
+            return self._bloom.contains(keys)
+        return self._runs.contains(keys)
+
+    def _store_add(self, keys):
+        if self.mode == 'bloom':
+            self._bloom.add(keys)
+            return
+        self._runs.add(keys)
+        if self._runs.memory_exceeded():
+            if self.fallback == 'bloom' and self.mode == 'memory' and self._switch_to_bloom():
+                return
+            self._runs.spill()
+            self.mode = 'spill'
+
+    def _switch_to_bloom(self):
+        """改用Bloom过滤器；内存上限内的过滤器装不下预计行数时返回False（改为溢写）"""
+        size = self.max_bytes
+        if self.expected_rows is not None:
+            size = bloom_filter_bytes(max(self.expected_rows, 1), self.error_rate)
+            if size > self.max_bytes:
+                print(f"按预计 {self.expected_rows} 行、误判率 {self.error_rate:g} 需要 "
+                      f"{size / _MB:.1f} MB 的Bloom过滤器，超过内存上限，改为溢写到磁盘精确去重")
+                return False
+        bloom = _BloomFilter(size, self.error_rate)
+        keys = self._runs.all_memory_keys()
+        if len(keys) > bloom.capacity:
+            return False
+        bloom.add(keys)
+        self._bloom = bloom
+        self._runs = _SortedRuns(_KEY_DTYPES[self.bits], self.max_bytes, self._directory)
+        self.mode = 'bloom'
+        return True
+
+    # ---------- 状态 ----------
+    @property
+    def distinct(self):
+        """已记录的不同行数（Bloom模式下为插入的键数）"""
+        return self._bloom.count if self.mode == 'bloom' else self._runs.size
+
+    def summary(self):
+        """一行文字说明去重方式和结果"""
+        names = {'memory': "内存精确去重", 'spill': "磁盘溢写精确去重", 'bloom': "Bloom过滤器近似去重"}
+        text = f"{names[self.mode]}（{self.bits}位哈希）：检查 {self.rows} 行，发现 {self.duplicates} 个重复行"
+        if self.mode == 'bloom':
+            text += (f"，估计误判率 {self._bloom.estimated_error_rate():.2e}"
+                     f"（已用容量 {self._bloom.count}/{self._bloom.capacity}）")
+        return text
+
+    def _load_state(self):
+        with open(os.path.join(self.spill_dir, _META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['bits'] != self.bits:
+            raise ValueError(f"目录 {self.spill_dir} 中的去重状态为 {meta['bits']} 位哈希")
+        self.mode = meta['mode']
+        if self.mode == 'bloom':
+            bloom = meta['bloom']
+            self._bloom_file = bloom.get('file', _BLOOM_FILE)
+            words = np.fromfile(os.path.join(self.spill_dir, self._bloom_file), dtype=np.uint64)
+            self._bloom = _BloomFilter(self.max_bytes, bloom['error_rate'], words=words,
+                                       hashes=bloom['hashes'], count=bloom['count'])
+        else:
+            self._runs.load(meta['runs'])
+
+    def _new_bloom_file(self, directory):
+        index = 0
+        while True:
+            name = f"bloom-{index:06d}.bin"
+            if name != self._bloom_file and not os.path.exists(os.path.join(directory, name)):
+                return name
+            index += 1
+
+    def save(self):
+        """把状态写入 spill_dir，之后用同一目录创建的 DuplicateFilter 会继续去重
+
+        数据文件都写成新文件，最后原子替换元数据文件，中途失败时目录中仍是上次保存的状态
+        """
+        directory = self._directory()
+        meta = {'bits': self.bits, 'mode': self.mode}
+        old_bloom = None
+        if self.mode == 'bloom':
+            name = self._new_bloom_file(directory)
+            self._bloom.words.tofile(os.path.join(directory, name))
+            meta['bloom'] = {'file': name, 'hashes': self._bloom.hashes, 'count': self._bloom.count,
+                             'error_rate': self._bloom.error_rate}
+            old_bloom, self._bloom_file = self._bloom_file, name
+        else:
+            self._runs.spill()
+            meta['mode'] = 'spill' if self._runs.disk_runs else 'memory'
+            meta['runs'] = self._runs.files()
+        temp_path = os.path.join(directory, _META_FILE + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(temp_path, os.path.join(directory, _META_FILE))
+        self._runs.commit()
+        if old_bloom is not None and os.path.exists(os.path.join(directory, old_bloom)):
+            os.remove(os.path.join(directory, old_bloom))
+
+    def discard(self):
+        """放弃上次保存之后记录的键，spill_dir 中保留上次保存的状态"""
+        self._runs.discard()
+        self._bloom = None
+
+    def close(self, commit=True):
+        """结束去重：指定了 spill_dir 时保存状态（commit=False 时放弃本次的变化），否则删除临时文件"""
+        if self.persistent:
+            if commit:
+                self.save()
+            else:
+                self.discard()
+        else:
+            self._runs = _SortedRuns(_KEY_DTYPES[self.bits], self.max_bytes, self._directory)
+            if self.spill_dir is not None:
+                shutil.rmtree(self.spill_dir, ignore_errors=True)
+                self.spill_dir = None
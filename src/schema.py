@@ -0,0 +1,42 @@
+"""
+交易数据紧凑类型方案
+ID列用字典编码（category），数量、类别编码和日期用能容纳取值的最窄整数类型，
+在读取数据时应用，分析函数无需修改即可在压缩后的DataFrame上运行
+"""
+
+import pandas as pd
+
+# 以字典编码存储的ID列
+CATEGORICAL_COLUMNS = ['user_id', 'auction_id', 'cat_id']
+
+# 压缩为最窄整数类型的列（day 为 YYYYMMDD 整数，压缩后为 int32；year/month/weekday 为预处理衍生列）
+INTEGER_COLUMNS = ['cat1', 'buy_mount', 'day', 'year', 'month', 'weekday']
+
+
+def frame_memory_mb(df):
+    """DataFrame实际占用的内存（MB），包含object列中的字符串"""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def compact_frame(df, categorical_columns=CATEGORICAL_COLUMNS, integer_columns=INTEGER_COLUMNS, verbose=True):
+    """按紧凑类型方案转换DataFrame，返回新的DataFrame"""
+    if df is None or len(df) == 0:
+        return df
+
+    before = frame_memory_mb(df) if verbose else None
+    df_compact = df.copy()
+
+    for column in categorical_columns:
+        if column in df_compact.columns and not isinstance(df_compact[column].dtype, pd.CategoricalDtype):
+            df_compact[column] = df_compact[column].astype('category')
+
+    for column in integer_columns:
+        if column in df_compact.columns and pd.api.types.is_integer_dtype(df_compact[column]):
+            df_compact[column] = pd.to_numeric(df_compact[column], downcast='integer')
+
+    if verbose:
+        after = frame_memory_mb(df_compact)
+        ratio = before / after if after > 0 else float('nan')
+        print(f"紧凑类型转换: 内存占用 {before:.2f} MB → {after:.2f} MB (压缩 {ratio:.1f} 倍)")
+
+    return df_compact
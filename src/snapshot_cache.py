@@ -0,0 +1,129 @@
+"""
+数据表本地快照缓存
+把MySQL表保存为本地列式文件（Arrow IPC / Feather），表未变化时直接内存映射读取，
+避免每次分析都通过网络重新拉取整张表
+"""
+
+import json
+import os
+import re
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = ".table_cache"
+
+
+def _snapshot_paths(cache_dir, table_name):
+    """返回快照数据文件和元数据文件的路径"""
+    safe_name = re.sub(r'[^0-9A-Za-z_.-]+', '_', table_name).strip('_')
+    base = os.path.join(cache_dir, safe_name)
+    return base + ".arrow", base + ".meta.json"
+
+
+def table_fingerprint(connection, table_name, key_column='day', update_time=True):
+    """计算表指纹：行数 + 最大键值 (+ information_schema 中记录的表最后修改时间)
+
+    所有计算都在数据库端完成，只返回一行结果；不使用 CHECKSUM TABLE（会完整扫描整张表）。
+    键列有索引时 MAX 只读取索引末端，修改时间用于发现行数和最大键值都没有变化的原地修改
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SELECT COUNT(*), MAX(`{key_column}`) FROM `{table_name}`")
+        row_count, max_key = cursor.fetchone()
+        fingerprint = {'table': table_name, 'rows': int(row_count), 'max_key': str(max_key)}
+
+        if update_time:
+            try:
+                # MySQL 8 默认缓存 information_schema 中的表统计信息（最长24小时），本会话关闭缓存读取当前值
+                cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+            except Exception:
+                # MySQL 5.7 没有这个变量，UPDATE_TIME 本身就是实时的
+                pass
+            try:
+                cursor.execute("SELECT UPDATE_TIME FROM information_schema.TABLES "
+                               "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", (table_name,))
+                row = cursor.fetchone()
+                fingerprint['update_time'] = str(row[0]) if row and row[0] is not None else None
+            except Exception:
+                # 非MySQL数据库没有 information_schema
+                fingerprint['update_time'] = None
+        return fingerprint
+    finally:
+        cursor.close()
+
+
+def read_snapshot(table_name, fingerprint=None, cache_dir=DEFAULT_CACHE_DIR):
+    """读取本地快照；指纹不匹配或快照不存在时返回None"""
+    data_path, meta_path = _snapshot_paths(cache_dir, table_name)
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None
+
+    with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if fingerprint is not None and meta.get('fingerprint') != fingerprint:
+        return None
+
+    try:
+        if meta.get('format') == 'arrow':
+            import pyarrow.feather as feather
+            # 未压缩的Arrow文件可直接内存映射，省去读文件和解码；
+            # 但 to_pandas() 仍会把各列复制为pandas数组（文本列逐个生成Python字符串），
+            # 返回的DataFrame占用与整表相同的内存，映射的文件页在转换完成后即可释放
+            return feather.read_table(data_path, memory_map=True).to_pandas()
+        return pd.read_pickle(data_path)
+    except ImportError:
+        print("未安装pyarrow，无法读取Arrow快照")
+        return None
+    except Exception as e:
+        print(f"快照读取失败: {e}")
+        return None
+
+
+def write_snapshot(df, table_name, fingerprint, cache_dir=DEFAULT_CACHE_DIR):
+    """把DataFrame写入本地快照并记录指纹"""
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path, meta_path = _snapshot_paths(cache_dir, table_name)
+
+    try:
+        import pyarrow.feather as feather
+        feather.write_feather(df, data_path, compression='uncompressed')
+        file_format = 'arrow'
+    except ImportError:
+        print("未安装pyarrow，快照改用pickle格式保存")
+        df.to_pickle(data_path)
+        file_format = 'pickle'
+    except Exception as e:
+        print(f"快照写入失败: {e}")
+        return False
+
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, 'format': file_format}, f, ensure_ascii=False, indent=2)
+    return True
+
+
+def load_table_cached(connection, table_name, loader, key_column='day', update_time=True,
+                      cache_dir=DEFAULT_CACHE_DIR, offline=False):
+    """优先从本地快照读取表数据，表有变化时调用loader重新读取并更新快照
+
+    loader 为无参可调用对象，返回完整的DataFrame；
+    offline=True 时不查询数据库指纹，直接使用已有快照
+    """
+    if offline:
+        fingerprint = None
+    else:
+        try:
+            fingerprint = table_fingerprint(connection, table_name, key_column, update_time)
+        except Exception as e:
+            print(f"计算表指纹失败，跳过快照缓存: {e}")
+            return loader()
+
+    df = read_snapshot(table_name, fingerprint, cache_dir)
+    if df is not None:
+        print(f"命中本地快照，读取 {len(df)} 行数据")
+        return df
+
+    df = loader()
+    if df is not None and len(df) > 0 and fingerprint is not None:
+        if write_snapshot(df, table_name, fingerprint, cache_dir):
+            print(f"已更新本地快照: {_snapshot_paths(cache_dir, table_name)[0]}")
+    return df
@@ -0,0 +1,130 @@
+"""
+SQL下推聚合
+把共享聚合计划中的分组统计翻译成 GROUP BY 查询交给MySQL执行，
+只把聚合后的小表传回Python，结果格式与 AggregationPlan.execute 一致；
+SQLite 连接（本地基准测试）使用等价的日期表达式
+"""
+
+import pandas as pd
+
+from aggregation import metric_name
+from db_stream import _is_sqlite
+
+# day 列为 YYYYMMDD 整数，无效日期由 STR_TO_DATE 返回 NULL（对应预处理中的 NaT）
+DAY_EXPR = "STR_TO_DATE(CAST(`day` AS CHAR), '%Y%m%d')"
+
+# 分组键/指标列在原始表上的SQL表达式，与 preprocess_data 的衍生列对应
+COLUMN_EXPRESSIONS = {
+    'day': DAY_EXPR,
+    'year_month': f"DATE_FORMAT({DAY_EXPR}, '%Y-%m')",
+}
+
+# SQLite 没有 STR_TO_DATE：拼出 YYYY-MM-DD 文本，date(文本, '+0 days') 会把 2月31日 这样的日期顺延、
+# 把 13月 这样的日期变为NULL，规范化后与原文本相同的才是有效日期
+_SQLITE_DAY_TEXT = "CAST(CAST(`day` AS INTEGER) AS TEXT)"
+_SQLITE_ISO_TEXT = (f"(substr({_SQLITE_DAY_TEXT}, 1, 4) || '-' || substr({_SQLITE_DAY_TEXT}, 5, 2) "
+                    f"|| '-' || substr({_SQLITE_DAY_TEXT}, 7, 2))")
+SQLITE_DAY_EXPR = (f"(CASE WHEN length({_SQLITE_DAY_TEXT}) = 8 "
+                   f"AND date({_SQLITE_ISO_TEXT}, '+0 days') = {_SQLITE_ISO_TEXT} THEN {_SQLITE_ISO_TEXT} END)")
+
+SQLITE_COLUMN_EXPRESSIONS = {
+    'day': SQLITE_DAY_EXPR,
+    'year_month': f"substr({SQLITE_DAY_EXPR}, 1, 7)",
+}
+
+AGGREGATE_SQL = {
+    'size': "COUNT(*)",
+    'count': "COUNT({expr})",
+    'sum': "SUM({expr})",
+    'nunique': "COUNT(DISTINCT {expr})",
+}
+
+
+def _column_expr(column, sqlite=False):
+    """返回列在原始表上的SQL表达式"""
+    expressions = SQLITE_COLUMN_EXPRESSIONS if sqlite else COLUMN_EXPRESSIONS
+    return expressions.get(column, f"`{column}`")
+
+
+def build_pushdown_query(table_name, key, metrics, sqlite=False):
+    """为一个分组键生成 GROUP BY 查询"""
+    key_expr = _column_expr(key, sqlite)
+    select_items = [f"{key_expr} AS `{key}`"]
+    for func, column in metrics:
+        agg = AGGREGATE_SQL[func].format(expr=_column_expr(column, sqlite) if column else "")
+        select_items.append(f"{agg} AS `{metric_name(func, column)}`")
+
+    return (f"SELECT {', '.join(select_items)} FROM `{table_name}` "
+            f"WHERE {key_expr} IS NOT NULL GROUP BY {key_expr} ORDER BY 1")
+
+
+def _run_query(connection, query):
+    """执行查询并返回DataFrame"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query)
+        columns = [desc[0] for desc in cursor.description]
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+    finally:
+        cursor.close()
+
+
+def _normalize_result(frame, key, metrics):
+    """把查询结果转换成与本地聚合一致的类型和排序"""
+    if key == 'day':
+        frame[key] = pd.to_datetime(frame[key])
+    elif key == 'user_id':
+        # preprocess_data 会把 user_id 转为字符串，排序也按字符串
+        frame[key] = frame[key].astype(str)
+        frame = frame.sort_values(key, kind='mergesort').reset_index(drop=True)
+
+    for func, column in metrics:
+        name = metric_name(func, column)
+        values = pd.to_numeric(frame[name])
+        if func != 'sum' or (values.dropna() % 1 == 0).all():
+            values = values.fillna(0).astype('int64')
+        frame[name] = values
+    return frame
+
+
+def pushdown_aggregates(connection, table_name, plan):
+    """在数据库端执行聚合计划，返回 {分组键: 聚合结果DataFrame}"""
+    aggregates = {}
+    for key, metrics in plan.metrics.items():
+        query = build_pushdown_query(table_name, key, metrics, sqlite=_is_sqlite(connection))
+        try:
+            frame = _run_query(connection, query)
+        except Exception as e:
+            print(f"下推查询失败（分组键 {key}）: {e}")
+            continue
+        aggregates[key] = _normalize_result(frame, key, metrics)
+        print(f"下推聚合 {key}: 返回 {len(frame)} 行")
+    return aggregates
+
+
+def pushdown_dataset_summary(connection, table_name):
+    """在数据库端计算数据集概况和购买数量分布
+
+    返回 (概况字典, buy_mount取值频次Series)，供报告和购买模式分析使用
+    """
+    day_expr = _column_expr('day', _is_sqlite(connection))
+    row = _run_query(connection, (
+        f"SELECT COUNT(*) AS `rows`, COUNT(DISTINCT `user_id`) AS `users`, "
+        f"COUNT(DISTINCT `cat1`) AS `categories`, MIN({day_expr}) AS `day_min`, "
+        f"MAX({day_expr}) AS `day_max` FROM `{table_name}`"
+    )).iloc[0]
+    summary = {
+        'rows': int(row['rows']),
+        'users': int(row['users']),
+        'categories': int(row['categories']),
+        'day_min': pd.to_datetime(row['day_min']),
+        'day_max': pd.to_datetime(row['day_max']),
+    }
+
+    counts = _run_query(connection, (
+        f"SELECT `buy_mount`, COUNT(*) AS `n` FROM `{table_name}` "
+        f"WHERE `buy_mount` IS NOT NULL GROUP BY `buy_mount` ORDER BY 1"
+    ))
+    buy_mount_counts = pd.Series(counts['n'].astype('int64').to_numpy(),
+                                 index=pd.to_numeric(counts['buy_mount']), name='buy_mount')
+    return summary, buy_mount_counts
@@ -0,0 +1,288 @@
+"""
+分析阶段的任务图
+每个阶段声明读取的输入键和产出的结果键，按键之间的依赖关系组成有向无环图；
+输入都已就绪的阶段在线程池（或进程池）中并发执行，可以只运行指定结果所需的子图，
+结束时给出各阶段耗时和关键路径（决定总耗时的最长依赖链）。
+并发执行时各阶段的打印输出先分别缓存，阶段结束后整段输出，不同阶段的输出不会交错
+"""
+
+import contextlib
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from pipeline_trace import trace_stage
+
+
+class StageGraphError(ValueError):
+    """任务图定义错误：结果键重复产出、输入无来源或存在环"""
+
+
+class GraphStage:
+    """一个分析阶段：func(**inputs) 返回 {结果键: 值}，只能包含 outputs 中声明的键（可以缺少）
+
+    optional 为可选输入：产出它的阶段在本次执行中时等待其完成，否则传入None，
+    不会因此把上游阶段拉进子图（如图表和报告只使用已执行的分析的结果）。
+    进程池执行时 func 和输入必须可以pickle（模块级函数或其 functools.partial）
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), optional=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.optional = tuple(optional)
+
+    def __repr__(self):
+        return f"GraphStage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+
+class _StageOutput:
+    """替代 sys.stdout：登记了缓冲区的线程写入各自的缓冲区，其余线程照常输出"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def capture(self):
+        buffer = io.StringIO()
+        self._local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def _call_stage(func, inputs, capture):
+    """执行阶段函数，返回 (结果, 捕获的输出, 开始时间, 结束时间)；进程池中同样在子进程内计时和捕获输出"""
+    start = time.perf_counter()
+    if capture is None:
+        buffer = io.StringIO()
+        with contextlib.redirect_stdout(buffer):
+            result = func(**inputs)
+        text = buffer.getvalue()
+    else:
+        with capture() as buffer:
+            result = func(**inputs)
+        text = buffer.getvalue()
+    return result, text, start, time.perf_counter()
+
+
+class GraphRun:
+    """一次执行的结果：context 为全部键的取值，timings 为 {阶段名: (开始, 结束)}（相对执行开始的秒数）"""
+
+    def __init__(self, context, timings, wall_time, dependencies):
+        self.context = context
+        self.timings = timings
+        self.wall_time = wall_time
+        self.dependencies = dependencies
+
+    def durations(self):
+        return {name: end - start for name, (start, end) in self.timings.items()}
+
+    def critical_path(self):
+        """按实际耗时计算的最长依赖链，返回 (阶段名列表, 总耗时)"""
+        durations = self.durations()
+        finish, previous = {}, {}
+        # timings 按完成顺序记录，依赖的阶段一定先完成
+        for name in self.timings:
+            parents = [p for p in self.dependencies[name] if p in finish]
+            best = max(parents, key=finish.get, default=None)
+            previous[name] = best
+            finish[name] = durations[name] + (finish[best] if best else 0.0)
+        if not finish:
+            return [], 0.0
+        name = max(finish, key=finish.get)
+        total = finish[name]
+        path = []
+        while name is not None:
+            path.append(name)
+            name = previous[name]
+        return path[::-1], total
+
+    def print_timing(self):
+        durations = self.durations()
+        path, total = self.critical_path()
+        print("\n阶段耗时（* 为关键路径）:")
+        for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0]):
+            mark = '*' if name in path else ' '
+            print(f" {mark} {name:<24} {durations[name]:8.3f}s  ({start:.3f}s ~ {end:.3f}s)")
+        serial = sum(durations.values())
+        print(f"总耗时 {self.wall_time:.3f}s，各阶段耗时之和 {serial:.3f}s，"
+              f"关键路径 {total:.3f}s: {' -> '.join(path)}")
+
+
+class StageGraph:
+    """按输入/输出键自动连接的阶段图"""
+
+    def __init__(self, stages=(), trace_prefix='graph'):
+        self.trace_prefix = trace_prefix
+        self.stages = {}
+        self._producers = {}
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage):
+        if stage.name in self.stages:
+            raise StageGraphError(f"阶段名重复: {stage.name}")
+        for key in stage.outputs:
+            if key in self._producers:
+                raise StageGraphError(f"结果键 '{key}' 同时由 {self._producers[key]} 和 {stage.name} 产出")
+        self.stages[stage.name] = stage
+        for key in stage.outputs:
+            self._producers[key] = stage.name
+        return stage
+
+    def stage(self, name, inputs=(), outputs=(), optional=()):
+        """装饰器形式的 add"""
+        def register(func):
+            self.add(GraphStage(name, func, inputs, outputs, optional))
+            return func
+        return register
+
+    def dependencies(self, provided=()):
+        """{阶段名: 它必须依赖的阶段名集合}；provided 中的键视为已经给出"""
+        provided = set(provided)
+        dependencies = {}
+        for name, stage in self.stages.items():
+            parents = set()
+            for key in stage.inputs:
+                if key in provided:
+                    continue
+                if key not in self._producers:
+                    raise StageGraphError(f"阶段 {name} 的输入 '{key}' 没有来源")
+                parents.add(self._producers[key])
+            dependencies[name] = parents
+        return dependencies
+
+    def _optional_dependencies(self, provided):
+        return {name: {self._producers[key] for key in stage.optional
+                       if key not in provided and key in self._producers}
+                for name, stage in self.stages.items()}
+
+    def _select(self, dependencies, targets):
+        """targets（阶段名或结果键）及其全部上游阶段"""
+        if targets is None:
+            return set(self.stages)
+        pending = []
+        for target in targets:
+            if target in self.stages:
+                pending.append(target)
+            elif target in self._producers:
+                pending.append(self._producers[target])
+            else:
+                raise StageGraphError(f"未知的阶段或结果键: {target}")
+        selected = set()
+        while pending:
+            name = pending.pop()
+            if name not in selected:
+                selected.add(name)
+                pending.extend(dependencies[name])
+        return selected
+
+    def order(self, provided=(), targets=None):
+        """拓扑顺序（存在环时报错）"""
+        required = self.dependencies(provided)
+        selected = self._select(required, targets)
+        optional = self._optional_dependencies(provided)
+        dependencies = {name: required[name] | (optional[name] & selected) for name in self.stages}
+        order, done = [], set()
+        remaining = [name for name in self.stages if name in selected]
+        while remaining:
+            ready = [name for name in remaining if dependencies[name] <= done]
+            if not ready:
+                raise StageGraphError(f"阶段之间存在环: {', '.join(remaining)}")
+            order.extend(ready)
+            done.update(ready)
+            remaining = [name for name in remaining if name not in done]
+        return order
+
+    def run(self, context=None, targets=None, workers=4, executor='thread'):
+        """执行任务图，返回 GraphRun
+
+        context 为已给出的输入（如 df、aggregates），其中已有全部结果键的阶段不再执行；
+        targets 为需要的阶段名或结果键（None 为全部）；workers<=1 时按拓扑顺序依次执行；
+        executor='process' 时在进程池中执行（阶段函数和输入须可pickle）
+        """
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"不支持的执行方式: {executor}")
+        context = dict(context or {})
+        order = [name for name in self.order(context, targets)
+                 if not all(key in context for key in self.stages[name].outputs) or not self.stages[name].outputs]
+        optional = self._optional_dependencies(context)
+        dependencies = {name: (parents | optional[name]) & set(order)
+                        for name, parents in self.dependencies(context).items()}
+        pending = {name: dependencies[name] for name in order}
+
+        timings = {}
+        origin = time.perf_counter()
+
+        def finish(name, result, text, start, end):
+            stage = self.stages[name]
+            extra = set(result or {}) - set(stage.outputs)
+            if extra:
+                raise StageGraphError(f"阶段 {name} 产出了未声明的结果键: {', '.join(sorted(extra))}")
+            context.update(result or {})
+            timings[name] = (start - origin, end - origin)
+            if text:
+                sys.stdout.write(text)
+
+        def inputs_of(name):
+            stage = self.stages[name]
+            return {key: context.get(key) for key in stage.inputs + stage.optional}
+
+        if workers <= 1 or len(order) <= 1:
+            for name in order:
+                with trace_stage(f'{self.trace_prefix}.{name}'):
+                    start = time.perf_counter()
+                    result = self.stages[name].func(**inputs_of(name))
+                finish(name, result, None, start, time.perf_counter())
+            return GraphRun(context, timings, time.perf_counter() - origin, dependencies)
+
+        output = None
+        if executor == 'thread':
+            output = _StageOutput(sys.stdout)
+            sys.stdout = output
+        pool_class = ThreadPoolExecutor if executor == 'thread' else ProcessPoolExecutor
+        try:
+            with pool_class(max_workers=min(workers, len(order))) as pool:
+                running = {}
+                done = set()
+                while len(done) < len(order):
+                    for name in order:
+                        if name not in done and name not in running.values() and pending[name] <= done:
+                            future = pool.submit(self._traced, name, inputs_of(name),
+                                                 output.capture if output else None) \
+                                if executor == 'thread' else \
+                                pool.submit(_call_stage, self.stages[name].func, inputs_of(name), None)
+                            running[future] = name
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name = running.pop(future)
+                        result, text, start, end = future.result()
+                        if output is not None:
+                            output.stream.write(text)
+                            text = None
+                        finish(name, result, text, start, end)
+                        done.add(name)
+        finally:
+            if output is not None:
+                sys.stdout = output.stream
+        return GraphRun(context, timings, time.perf_counter() - origin, dependencies)
+
+    def _traced(self, name, inputs, capture):
+        with trace_stage(f'{self.trace_prefix}.{name}'):
+            return _call_stage(self.stages[name].func, inputs, capture)
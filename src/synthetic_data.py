@@ -0,0 +1,167 @@
+"""
+合成淘宝母婴交易数据
+生成与 trade history 表结构相同的数据（user_id, auction_id, cat1, buy_mount, day, property），
+包含用户/商品的长尾分布、双十一等销售高峰、完全重复行、缺失值和少量无效值，
+按块生成，规模可从1千行到5千万行，用于基准测试
+"""
+
+import sqlite3
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# 每块生成的行数
+DEFAULT_CHUNK_SIZE = 500000
+
+# 原始数据中的一级类别及其大致占比
+CATEGORY_WEIGHTS = {
+    50014815: 0.33,
+    50008168: 0.30,
+    28: 0.14,
+    50022520: 0.10,
+    122650008: 0.08,
+    38: 0.05,
+}
+
+# 原始数据覆盖的日期范围
+START_DAY = date(2012, 7, 2)
+END_DAY = date(2015, 2, 5)
+
+# 不存在的日期，用于模拟无效的 day 值
+INVALID_DAYS = [20130231, 20141301, 20140000, 20130931]
+
+# 属性键的取值池大小，以及不同property字符串的最大数量
+PROPERTY_KEYS = 400
+PROPERTY_POOL_SIZE = 20000
+
+
+def _skewed_ranks(rng, size, pool, exponent):
+    """长尾分布的排名：u**exponent 把概率集中到靠前的少数排名上"""
+    return np.floor(pool * rng.random(size) ** exponent).astype(np.int64)
+
+
+def _scramble_ids(ranks, offset):
+    """把排名映射为看起来随机且互不相同的ID（乘以奇数后对2^31取模是双射）"""
+    return (ranks * 2654435761 + offset) % (2 ** 31)
+
+
+def _day_calendar():
+    """日期表（YYYYMMDD整数）及每天的抽样权重：逐年增长、周末略高、双十一/双十二高峰"""
+    days = pd.date_range(START_DAY, END_DAY, freq='D')
+    elapsed = np.arange(len(days)) / len(days)
+    weights = 1.0 + 1.5 * elapsed
+    weights *= np.where(days.weekday >= 5, 1.15, 1.0)
+
+    month_day = days.month * 100 + days.day
+    weights *= np.select([month_day == 1111, np.isin(month_day, [1110, 1112]), month_day == 1212],
+                         [10.0, 2.5, 3.0], 1.0)
+    values = (days.year * 10000 + month_day).to_numpy(dtype=np.int64)
+    return values, weights / weights.sum()
+
+
+def _property_pool(rng, size):
+    """生成property字符串池，形如 "key1:value1;key2:value2;..." """
+    keys = _scramble_ids(_skewed_ranks(rng, (size, 6), PROPERTY_KEYS, 1.5), 7) % 100000000
+    values = rng.integers(1, 10 ** 8, size=(size, 6))
+    lengths = rng.integers(1, 7, size=size)
+    pool = []
+    for key_row, value_row, length in zip(keys.tolist(), values.tolist(), lengths.tolist()):
+        pool.append(";".join(f"{k}:{v}" for k, v in zip(key_row[:length], value_row[:length])))
+    return np.array(pool, dtype=object)
+
+
+def _generate_chunk(rng, rows, total_rows, calendar, properties, missing_rate, invalid_rate):
+    """生成一块数据（不含重复行）"""
+    day_values, day_weights = calendar
+    user_pool = max(1, total_rows)
+    auction_pool = max(1, int(total_rows * 0.6))
+
+    user_ranks = _skewed_ranks(rng, rows, user_pool, 2.0)
+    auction_ranks = _skewed_ranks(rng, rows, auction_pool, 2.5)
+
+    categories = np.array(list(CATEGORY_WEIGHTS), dtype=np.int64)
+    category_p = np.array(list(CATEGORY_WEIGHTS.values()))
+    # 同一商品属于同一类别、具有同样的属性
+    cat1 = categories[np.searchsorted(np.cumsum(category_p / category_p.sum()),
+                                      (auction_ranks * 0.6180339887) % 1.0)]
+
+    # 购买数量：大多数为1件，少量批量购买
+    buy_mount = rng.geometric(0.65, size=rows).astype(np.int64)
+    bulk = rng.random(rows) < 0.003
+    buy_mount[bulk] = rng.integers(10, 200, size=int(bulk.sum()))
+    invalid_buy = rng.random(rows) < invalid_rate
+    buy_mount[invalid_buy] = rng.integers(-2, 1, size=int(invalid_buy.sum()))
+
+    day = day_values[rng.choice(len(day_values), size=rows, p=day_weights)]
+    invalid_day = rng.random(rows) < invalid_rate
+    day[invalid_day] = rng.choice(INVALID_DAYS, size=int(invalid_day.sum()))
+
+    chunk = pd.DataFrame({
+        'user_id': _scramble_ids(user_ranks, 1000),
+        'auction_id': _scramble_ids(auction_ranks, 5000000),
+        'cat1': pd.array(cat1, dtype='Int64'),
+        'buy_mount': pd.array(buy_mount, dtype='Int64'),
+        'day': pd.array(day, dtype='Int64'),
+        'property': properties[auction_ranks % len(properties)],
+    })
+
+    # 缺失值：property 缺失最多，其余列较少；另有少量property为空串
+    for column, scale in (('cat1', 0.5), ('buy_mount', 0.5), ('day', 0.25), ('property', 2.0)):
+        missing = rng.random(rows) < missing_rate * scale
+        chunk.loc[missing, column] = None
+    empty_property = rng.random(rows) < missing_rate * 0.5
+    chunk.loc[empty_property & chunk['property'].notna().to_numpy(), 'property'] = ''
+    return chunk
+
+
+def iter_trade_history(rows, chunk_size=DEFAULT_CHUNK_SIZE, seed=0, duplicate_rate=0.01,
+                       missing_rate=0.02, invalid_rate=0.001):
+    """按块生成共 rows 行合成交易数据
+
+    每块中约 duplicate_rate 比例的行是块内其他行的完全重复；
+    missing_rate 控制缺失值比例，invalid_rate 控制无效日期和非正购买数量的比例。
+    相同参数和seed生成的数据完全相同
+    """
+    rng = np.random.default_rng(seed)
+    calendar = _day_calendar()
+    properties = _property_pool(rng, min(PROPERTY_POOL_SIZE, max(1, int(rows * 0.6))))
+
+    produced = 0
+    while produced < rows:
+        size = min(chunk_size, rows - produced)
+        duplicates = int(size * duplicate_rate) if size > 1 else 0
+        chunk = _generate_chunk(rng, size - duplicates, rows, calendar, properties,
+                                missing_rate, invalid_rate)
+        if duplicates:
+            copies = chunk.iloc[rng.integers(0, len(chunk), size=duplicates)]
+            chunk = pd.concat([chunk, copies], ignore_index=True)
+            chunk = chunk.iloc[rng.permutation(len(chunk))].reset_index(drop=True)
+        produced += len(chunk)
+        yield chunk
+
+
+def generate_trade_history(rows, seed=0, **options):
+    """生成 rows 行合成交易数据并返回一个DataFrame"""
+    chunks = list(iter_trade_history(rows, seed=seed, **options))
+    return pd.concat(chunks, ignore_index=True)
+
+
+def write_trade_history(connection, table_name, rows, chunk_size=DEFAULT_CHUNK_SIZE, seed=0, **options):
+    """把合成数据逐块写入数据库表（已存在时替换），返回写入行数
+
+    SQLite 连接使用 DataFrame.to_sql，MySQL 连接使用批量写入（LOAD DATA + 原子替换）
+    """
+    chunks = iter_trade_history(rows, chunk_size=chunk_size, seed=seed, **options)
+    if isinstance(connection, sqlite3.Connection):
+        written = 0
+        if_exists = 'replace'
+        for chunk in chunks:
+            chunk.to_sql(table_name, connection, if_exists=if_exists, index=False)
+            if_exists = 'append'
+            written += len(chunk)
+        connection.commit()
+        return written
+
+    from bulk_writer import bulk_write_table
+    return bulk_write_table(connection, chunks, table_name)
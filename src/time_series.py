@@ -0,0 +1,261 @@
+"""
+销售时间序列分析
+按天的销量保存为从首日开始的稠密日历数组（缺少交易的日期为0），在数组上用前缀和、bincount
+计算 7/30 天滚动均值、周环比/同比、月环比/同比、季节指数和峰值（含双十一）检测，不做重复的 groupby。
+追加新的日期时只重算受影响的尾部：前缀和从最早变化的位置续算，滚动结果只补算这之后的位置
+"""
+
+import numpy as np
+import pandas as pd
+
+# 默认的滚动窗口（天）
+DEFAULT_WINDOWS = (7, 30)
+
+# 各粒度峰值检测的默认参数：(基线窗口长度, z分数阈值)
+PEAK_PARAMS = {'day': (28, 3.0), 'week': (8, 2.5), 'month': (6, 2.0)}
+
+# 双十一（月, 日）
+DOUBLE_ELEVEN = (11, 11)
+
+# 1970-01-05 是星期一，用于计算星期几和按周对齐
+_MONDAY = np.datetime64('1970-01-05', 'D')
+
+
+def _growth(values, lag, valid=None):
+    """values[i] 相对 values[i-lag] 的增长率；上期为0或任一期不完整时为 NaN"""
+    growth = np.full(len(values), np.nan)
+    if len(values) <= lag:
+        return growth
+    current, previous = values[lag:], values[:-lag]
+    ok = previous > 0
+    if valid is not None:
+        ok &= valid[lag:] & valid[:-lag]
+    growth[lag:][ok] = current[ok] / previous[ok] - 1
+    return growth
+
+
+def _trailing_stats(values, window):
+    """每个位置之前 window 期（不含本期）的均值和标准差，不足 window 期时为 NaN"""
+    n = len(values)
+    prefix = np.concatenate([[0.0], np.cumsum(values)])
+    prefix_sq = np.concatenate([[0.0], np.cumsum(values ** 2)])
+    mean = np.full(n, np.nan)
+    std = np.full(n, np.nan)
+    if n > window:
+        end = np.arange(window, n)
+        total = prefix[end] - prefix[end - window]
+        total_sq = prefix_sq[end] - prefix_sq[end - window]
+        mean[window:] = total / window
+        # 样本标准差；浮点误差可能使方差略小于0
+        std[window:] = np.sqrt(np.maximum(total_sq - total ** 2 / window, 0) / (window - 1))
+    return mean, std
+
+
+def _local_maxima(values):
+    """不小于左右相邻值的位置"""
+    left = np.concatenate([[-np.inf], values[:-1]])
+    right = np.concatenate([values[1:], [-np.inf]])
+    return (values >= left) & (values >= right)
+
+
+class SalesTimeSeries:
+    """稠密日历索引的日销量序列
+
+    values[i] 为 start + i 天的销量；windows 中每个窗口的滚动均值随追加增量维护
+    """
+
+    def __init__(self, start, values, windows=DEFAULT_WINDOWS):
+        self.start = np.datetime64(start, 'D')
+        self.values = np.asarray(values, dtype=np.float64)
+        self.windows = tuple(windows)
+        self._prefix = np.concatenate([[0.0], np.cumsum(self.values)])
+        self._rolling = {window: np.empty(0) for window in self.windows}
+        self._extend_rolling(0)
+
+    @classmethod
+    def from_frame(cls, frame, day_column='day', value_column='buy_mount', windows=DEFAULT_WINDOWS):
+        """由按天（或逐笔）的销量表建立，同一天的多行相加，日期缺失的行忽略"""
+        days, values = cls._day_values(frame, day_column, value_column)
+        if len(days) == 0:
+            return cls(np.datetime64('1970-01-01'), [], windows)
+        start = days.min()
+        dense = np.bincount((days - start).astype(np.int64), weights=values)
+        return cls(start, dense, windows)
+
+    @staticmethod
+    def _day_values(frame, day_column, value_column):
+        days = pd.to_datetime(frame[day_column]).to_numpy().astype('datetime64[D]')
+        values = pd.to_numeric(frame[value_column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        keep = ~np.isnat(days)
+        return days[keep], np.nan_to_num(values[keep])
+
+    # ==================== 日历与增量更新 ====================
+    @property
+    def end(self):
+        return self.start + (len(self.values) - 1)
+
+    @property
+    def days(self):
+        return self.start + np.arange(len(self.values))
+
+    def _extend_rolling(self, position):
+        """重算 position 及之后各位置的滚动均值（窗口不满时为 NaN，与 rolling(window).mean() 一致）"""
+        index = np.arange(position, len(self.values))
+        for window in self.windows:
+            sums = self._prefix[index + 1] - self._prefix[np.maximum(index + 1 - window, 0)]
+            means = np.where(index >= window - 1, sums / window, np.nan)
+            self._rolling[window] = np.concatenate([self._rolling[window][:position], means])
+
+    def append(self, frame, day_column='day', value_column='buy_mount'):
+        """追加新的日销量（可与已有日期重叠，重叠的日期销量相加），返回受影响的首个日期
+
+        只从最早变化的日期开始续算前缀和与滚动均值；新数据早于现有首日时日历整体前移并全部重算
+        """
+        days, values = self._day_values(frame, day_column, value_column)
+        if len(days) == 0:
+            return None
+        if len(self.values) == 0:
+            self.start = days.min()
+        if days.min() < self.start:
+            shift = int((self.start - days.min()).astype(np.int64))
+            self.values = np.concatenate([np.zeros(shift), self.values])
+            self.start = days.min()
+            self._rolling = {window: np.empty(0) for window in self.windows}
+            self._prefix = np.zeros(1)
+        positions = (days - self.start).astype(np.int64)
+        if positions.max() >= len(self.values):
+            self.values = np.concatenate([self.values, np.zeros(positions.max() + 1 - len(self.values))])
+        np.add.at(self.values, positions, values)
+
+        first = min(int(positions.min()), len(self._prefix) - 1)
+        self._prefix = np.concatenate([self._prefix[:first + 1],
+                                       self._prefix[first] + np.cumsum(self.values[first:])])
+        self._extend_rolling(first)
+        return pd.Timestamp(self.start + first)
+
+    # ==================== 滚动窗口 ====================
+    def rolling_mean(self, window):
+        if window not in self._rolling:
+            raise KeyError(f"未维护 {window} 天的滚动窗口，可选: {self.windows}")
+        return self._rolling[window]
+
+    def rolling_frame(self):
+        """每天的销量及各窗口的滚动日均销量"""
+        frame = pd.DataFrame({'day': pd.to_datetime(self.days), 'buy_mount': self.values})
+        for window in self.windows:
+            frame[f'rolling_{window}'] = self._rolling[window]
+        return frame
+
+    # ==================== 周/月汇总与增长率 ====================
+    def _period_totals(self, codes, minlength=0):
+        totals = np.bincount(codes, weights=self.values, minlength=minlength)
+        days = np.bincount(codes, minlength=minlength)
+        return totals, days
+
+    def _weekly_totals(self):
+        """(周一日期, 周销量, 天数, 是否完整的周)"""
+        offset = int((self.start - _MONDAY).astype(np.int64) % 7)
+        codes = (np.arange(len(self.values)) + offset) // 7
+        totals, days = self._period_totals(codes)
+        labels = pd.to_datetime(self.start - offset + 7 * np.arange(len(totals)))
+        return labels, totals, days, days == 7
+
+    def _monthly_totals(self):
+        """(年月, 月销量, 天数, 是否完整的月)"""
+        months = self.days.astype('datetime64[M]')
+        if len(months) == 0:
+            return np.array([], dtype=object), np.empty(0), np.empty(0, np.int64), np.empty(0, bool)
+        codes = (months - months[0]).astype(np.int64)
+        totals, days = self._period_totals(codes)
+        labels = months[0] + np.arange(len(totals))
+        month_days = ((labels + 1).astype('datetime64[D]') - labels.astype('datetime64[D]')).astype(np.int64)
+        return labels.astype(str).astype(object), totals, days, days == month_days
+
+    def weekly(self):
+        """按周（周一开始）汇总：周销量、周环比、同比（相隔52周）；首尾不完整的周不计算增长率"""
+        labels, totals, days, complete = self._weekly_totals()
+        return pd.DataFrame({
+            'week': labels,
+            'buy_mount': totals,
+            'days': days,
+            'wow_growth': _growth(totals, 1, complete),
+            'yoy_growth': _growth(totals, 52, complete),
+        })
+
+    def monthly(self):
+        """按月汇总：月销量、环比、同比（相隔12个月）；首尾不完整的月不计算增长率"""
+        labels, totals, days, complete = self._monthly_totals()
+        return pd.DataFrame({
+            'year_month': labels,
+            'buy_mount': totals,
+            'days': days,
+            'mom_growth': _growth(totals, 1, complete),
+            'yoy_growth': _growth(totals, 12, complete),
+        })
+
+    # ==================== 季节性 ====================
+    def seasonality(self):
+        """季节指数：各星期几 / 一年中的第几周 / 各月份的日均销量 ÷ 全部日期的日均销量
+
+        返回 {'day': 按星期几(0=周一), 'week': 按一年中的第几周(1~52), 'month': 按月份(1~12)} 的Series
+        """
+        days = self.days
+        overall = self.values.mean() if len(self.values) else np.nan
+        day_of_year = (days - days.astype('datetime64[Y]')).astype(np.int64)
+        buckets = {
+            'day': ((days - _MONDAY).astype(np.int64) % 7, np.arange(7)),
+            'week': (np.minimum(day_of_year // 7, 51), np.arange(1, 53)),
+            'month': ((days.astype('datetime64[M]').astype(np.int64) % 12), np.arange(1, 13)),
+        }
+        result = {}
+        for grain, (codes, labels) in buckets.items():
+            totals, counts = self._period_totals(codes, minlength=len(labels))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                index = totals / counts / overall
+            result[grain] = pd.Series(index, index=pd.Index(labels, name=grain), name='seasonal_index')
+        return result
+
+    # ==================== 峰值检测 ====================
+    def _grain_series(self, grain):
+        """(期间标签, 销量)，周/月只保留完整的期间"""
+        if grain == 'day':
+            return pd.to_datetime(self.days), self.values
+        labels, totals, _, complete = self._weekly_totals() if grain == 'week' else self._monthly_totals()
+        return np.asarray(labels)[complete], totals[complete]
+
+    def peaks(self, grain='day', window=None, threshold=None):
+        """销量峰值：高于之前 window 期均值 threshold 倍标准差，且不低于相邻期间
+
+        返回 period/buy_mount/baseline/lift/zscore 列的DataFrame，按 period 排序
+        """
+        default_window, default_threshold = PEAK_PARAMS[grain]
+        window = window or default_window
+        threshold = default_threshold if threshold is None else threshold
+        labels, values = self._grain_series(grain)
+        mean, std = _trailing_stats(values, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            zscore = (values - mean) / std
+            lift = values / mean
+        peak = (zscore >= threshold) & _local_maxima(values)
+        return pd.DataFrame({
+            'period': labels[peak], 'buy_mount': values[peak], 'baseline': mean[peak],
+            'lift': lift[peak], 'zscore': zscore[peak],
+        })
+
+    def double_eleven(self, baseline_window=30):
+        """每年双十一当天的销量、之前 baseline_window 天的日均销量、倍数，以及是否被检测为日峰值"""
+        days = self.days
+        dates = pd.DatetimeIndex(days)
+        positions = np.flatnonzero((dates.month == DOUBLE_ELEVEN[0]) & (dates.day == DOUBLE_ELEVEN[1]))
+        start = np.maximum(positions - baseline_window, 0)
+        baseline = (self._prefix[positions] - self._prefix[start]) / np.maximum(positions - start, 1)
+        peak_days = set(self.peaks('day')['period'])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            lift = self.values[positions] / baseline
+        return pd.DataFrame({
+            'day': dates[positions],
+            'buy_mount': self.values[positions],
+            'baseline': baseline,
+            'lift': lift,
+            'is_peak': [day in peak_days for day in dates[positions]],
+        })
@@ -0,0 +1,11 @@
+import json
+
+import benchmark
+
+
+def test_benchmark_smoke(tmp_path):
+    output = tmp_path / 'timings.json'
+    assert benchmark.main(['--scales', '1k', '--render-workers', '1', '--output', str(output)]) == 0
+    stages = {record['stage'] for record in json.loads(output.read_text(encoding='utf-8'))}
+    assert {'load_data_to_dataframe', 'save_cleaned_data', 'load_data_chunked',
+            'clean_taobao_data_chunked', 'sql_pushdown', 'rollup_cube_build'} <= stages
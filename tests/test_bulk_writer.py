@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import bulk_writer
+from bulk_writer import BulkTableWriter, bulk_write_table, commit_tables
+
+
+def _frame(rows=5):
+    return pd.DataFrame({
+        'id': np.arange(rows),
+        'amount': [1.5, None, 2.0, 3.0, 4.0][:rows],
+        'day': pd.to_datetime(['2014-01-01', None, '2014-01-03', '2014-01-04', '2014-01-05'][:rows]),
+        'note': ['a', None, 'b\tc', 'd', 'e'][:rows],
+    })
+
+
+class _RecordingConnection:
+    """只记录SQL的MySQL连接替身"""
+
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self, *args, **kwargs):
+        return _RecordingCursor(self.statements)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class _RecordingCursor:
+    def __init__(self, statements):
+        self.statements = statements
+        self.description = None
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+        self.description = ('count',) if 'COUNT(*)' in sql else None
+
+    def fetchall(self):
+        return [(0,)]
+
+    def close(self):
+        pass
+
+
+def test_sqlite_replace_and_append():
+    connection = sqlite3.connect(':memory:')
+    bulk_write_table(connection, _frame(), 'cleaned')
+    bulk_write_table(connection, _frame(2), 'cleaned')
+    assert connection.execute("SELECT COUNT(*) FROM cleaned").fetchone()[0] == 2
+    bulk_write_table(connection, _frame(), 'cleaned', mode='append')
+    result = pd.read_sql("SELECT * FROM cleaned", connection)
+    assert len(result) == 7
+    assert result['day'].iloc[0] == '2014-01-01 00:00:00'
+    tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {'cleaned'}
+
+
+def test_sqlite_commit_tables_swaps_together():
+    connection = sqlite3.connect(':memory:')
+    writers = [BulkTableWriter(connection, 'summary'), BulkTableWriter(connection, 'summary__meta')]
+    writers[0].write(_frame())
+    writers[1].write(_frame(1))
+    commit_tables(writers)
+    assert connection.execute("SELECT COUNT(*) FROM summary").fetchone()[0] == 5
+    assert connection.execute("SELECT COUNT(*) FROM summary__meta").fetchone()[0] == 1
+
+
+def test_load_data_path_uses_forward_slashes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    windows_path = 'C:\\Users\\me\\AppData\\tmp1.tsv'
+    mkstemp = tempfile.mkstemp
+
+    def fake_mkstemp(suffix=''):
+        fd, _ = mkstemp(suffix=suffix, dir=tmp_path)
+        return fd, windows_path
+
+    monkeypatch.setattr(bulk_writer.tempfile, 'mkstemp', fake_mkstemp)
+    connection = _RecordingConnection()
+    bulk_write_table(connection, _frame(), 'cleaned', method='load_data')
+    load = [sql for sql in connection.statements if sql.startswith('LOAD DATA')]
+    assert load and "'C:/Users/me/AppData/tmp1.tsv'" in load[0]
+    assert not os.path.exists(windows_path)
+
+
+def test_executemany_passes_datetime_objects():
+    writer = BulkTableWriter(_RecordingConnection(), 'cleaned')
+    prepared = writer._prepare(_frame(), escape_text=False)
+    values = prepared['day'].astype(object).where(prepared['day'].notna(), None).tolist()
+    assert type(values[0]) is datetime
+    assert values[1] is None
@@ -0,0 +1,22 @@
+import sqlite3
+
+import pandas as pd
+
+import data_analyze
+from synthetic_data import write_trade_history
+
+
+def test_streaming_context_matches_in_memory_aggregates():
+    connection = sqlite3.connect(':memory:')
+    write_trade_history(connection, 'trades', 20000, seed=4)
+    context = data_analyze.load_streaming_context(connection, 'trades', chunk_size=3000)
+    df = data_analyze.preprocess_data(pd.read_sql("SELECT * FROM trades", connection))
+
+    expected = data_analyze.compute_shared_aggregates(df)
+    assert context['df'] is None
+    assert set(context['aggregates']) == set(expected)
+    for key, frame in expected.items():
+        pd.testing.assert_frame_equal(context['aggregates'][key], frame, check_dtype=False)
+    assert context['dataset_summary']['rows'] == len(df)
+    assert context['dataset_summary']['users'] == df['user_id'].nunique()
+    assert context['buy_mount_counts'].to_dict() == df['buy_mount'].value_counts().to_dict()
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+import primary_clean
+from data_profile import DataProfile
+from synthetic_data import generate_trade_history
+
+
+def _frame_with_collisions():
+    # 两行只在缺失值/无效日期处不同：填充或日期转换后才变为完全相同
+    rows = pd.DataFrame({
+        'user_id': ['u1', 'u1', 'u2', 'u2', 'u3', 'u3'],
+        'buy_mount': [2.0, np.nan, 1.0, 1.0, 5.0, 5.0],
+        'day': [20140101, 20140101, 20141399, 20141398, 20140105, 20140105],
+        'property': ['a:1', 'a:1', 'b:2', 'b:2', None, 'c:3'],
+    })
+    return pd.concat([rows] * 3, ignore_index=True)
+
+
+def test_profile_duplicated_matches_pandas():
+    df = generate_trade_history(5000, seed=3, duplicate_rate=0.05)
+    profile = DataProfile.from_frame(df)
+    np.testing.assert_array_equal(profile.duplicated(), df.duplicated().to_numpy())
+
+
+def test_profile_duplicates_follow_fill_and_row_removal():
+    df = _frame_with_collisions()
+    profile = DataProfile.from_frame(df)
+    filled = df.copy()
+    filled['buy_mount'] = filled['buy_mount'].fillna(2.0)
+    profile.fill_missing('buy_mount', 2.0, filled['buy_mount'])
+    filled['property'] = filled['property'].fillna('new')
+    profile.fill_missing('property', 'new', filled['property'])
+    np.testing.assert_array_equal(profile.duplicated(), filled.duplicated().to_numpy())
+
+    mask = filled.duplicated().to_numpy()
+    profile.remove_rows(filled, mask)
+    assert profile.rows == int((~mask).sum())
+    assert profile.duplicates == 0
+
+
+def test_clean_counts_duplicates_created_by_invalid_dates():
+    df = _frame_with_collisions()
+    profile = DataProfile.from_frame(df)
+    cleaned, _ = primary_clean.clean_taobao_data(df, None, profile=profile)
+    assert profile.rows == len(cleaned)
+    assert profile.duplicates == int(cleaned.duplicated().sum()) > 0
@@ -0,0 +1,60 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+import primary_clean
+from synthetic_data import generate_trade_history
+
+
+def _sqlite_table(df):
+    connection = sqlite3.connect(':memory:')
+    df.to_sql('trades', connection, index=False)
+    return connection
+
+
+def test_chunked_clean_matches_in_memory_with_all_null_chunk():
+    df = generate_trade_history(6000, seed=5)
+    # 第一个数据块中 buy_mount 全为NULL，读出的是object类型
+    df.loc[:999, 'buy_mount'] = np.nan
+    connection = _sqlite_table(df)
+
+    expected, _ = primary_clean.clean_taobao_data(pd.read_sql("SELECT * FROM trades", connection), None)
+    parts = []
+    primary_clean.clean_taobao_data_chunked(
+        lambda: primary_clean.load_data_to_dataframe(connection, 'trades', chunk_size=1000), parts.append)
+    pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), expected)
+
+
+def test_statistics_ignore_dtype_of_all_null_chunk():
+    chunks = [pd.DataFrame({'buy_mount': [None, None]}), pd.DataFrame({'buy_mount': [1.0, 3.0, None]})]
+    stats = primary_clean.collect_clean_statistics(chunks)
+    assert stats['dtypes'] == {'buy_mount': np.dtype('float64')}
+    assert stats['missing'] == {'buy_mount': 3}
+    assert 'buy_mount' not in stats['counts_from']
+
+
+def test_incremental_clean_picks_up_late_rows_of_watermark_day(tmp_path, monkeypatch):
+    path = str(tmp_path / 'trades.sqlite')
+    monkeypatch.setattr(primary_clean, 'get_connection', lambda: sqlite3.connect(path))
+    connection = sqlite3.connect(path)
+    # 读取游标和写入连接同时打开
+    connection.execute('PRAGMA journal_mode=WAL')
+    df = generate_trade_history(4000, seed=7, duplicate_rate=0)
+    df = df[df['day'].notna()].sort_values('day', kind='mergesort').reset_index(drop=True)
+    boundary = df['day'] == df['day'].max()
+    late_rows = boundary & (boundary.cumsum() > boundary.sum() // 2)
+
+    df[~late_rows].to_sql('trades', connection, index=False)
+    connection.commit()
+    primary_clean.incremental_clean(connection, 'trades', 'cleaned', chunk_size=700)
+    df[late_rows].to_sql('trades', connection, index=False, if_exists='append')
+    connection.commit()
+    shape, _ = primary_clean.incremental_clean(connection, 'trades', 'cleaned', chunk_size=700)
+    assert shape[0] == int(late_rows.sum())
+    assert primary_clean.incremental_clean(connection, 'trades', 'cleaned', chunk_size=700)[0] == (0, 0)
+
+    expected, _ = primary_clean.clean_taobao_data(pd.read_sql("SELECT * FROM trades", connection), None)
+    stored = pd.read_sql("SELECT * FROM cleaned", connection)
+    assert len(stored) == len(expected)
+    assert sorted(stored['auction_id']) == sorted(expected['auction_id'])
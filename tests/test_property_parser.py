@@ -0,0 +1,31 @@
+import pandas as pd
+
+from property_parser import explode_properties
+
+
+def test_explode_without_pairs_returns_empty_frame():
+    result = explode_properties(pd.Series(['abc', None, 3, '']))
+    assert list(result.columns) == ['row', 'key', 'value']
+    assert len(result) == 0
+    assert result['row'].dtype == 'int64'
+    assert isinstance(result['key'].dtype, pd.CategoricalDtype)
+    assert result['value'].dtype == object
+    assert isinstance(explode_properties(pd.Series([], dtype=object), intern_values=True)['value'].dtype,
+                      pd.CategoricalDtype)
+
+
+def test_explode_skips_malformed_fragments():
+    result = explode_properties(pd.Series(['noise;a:1;;b', None, ':x;c:', 'plain']))
+    assert result['row'].tolist() == [0, 2, 2]
+    assert result['key'].tolist() == ['a', '', 'c']
+    assert result['value'].tolist() == ['1', 'x', '']
+
+
+def test_explode_multiple_pairs_keeps_row_positions():
+    series = pd.Series(['a:1;b:2', 'a:3;c:4:5'], index=[10, 20])
+    result = explode_properties(series, intern_values=True)
+    assert result['row'].tolist() == [0, 0, 1, 1]
+    assert result['key'].tolist() == ['a', 'b', 'a', 'c']
+    assert result['value'].tolist() == ['1', '2', '3', '4:5']
+    assert sorted(result['key'].cat.categories) == ['a', 'b', 'c']
+    assert isinstance(result['value'].dtype, pd.CategoricalDtype)
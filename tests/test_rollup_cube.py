@@ -0,0 +1,28 @@
+import sqlite3
+
+import pandas as pd
+
+from rollup_cube import LocalCubeStore, RollupCube, refresh_cube
+from synthetic_data import generate_trade_history
+
+
+def _sorted_cells(cube):
+    return cube.cells.sort_values(['day_key', 'cat1']).reset_index(drop=True)
+
+
+def test_refresh_counts_late_rows_of_watermark_day_once(tmp_path):
+    df = generate_trade_history(20000, seed=3)
+    df = df[df['day'].notna()].sort_values('day', kind='mergesort').reset_index(drop=True)
+    boundary = df['day'] == df['day'].max()
+    late_rows = boundary & (boundary.cumsum() > boundary.sum() // 2)
+    connection = sqlite3.connect(':memory:')
+    store = LocalCubeStore('trades', str(tmp_path))
+
+    df[~late_rows].to_sql('trades', connection, index=False)
+    assert refresh_cube(connection, 'trades', store, chunk_size=3000)[1] == int((~late_rows).sum())
+    df[late_rows].to_sql('trades', connection, index=False, if_exists='append')
+    assert refresh_cube(connection, 'trades', store, chunk_size=3000)[1] == int(late_rows.sum())
+    assert refresh_cube(connection, 'trades', store)[1] == 0
+
+    expected = RollupCube.from_frame(pd.read_sql("SELECT * FROM trades", connection))
+    pd.testing.assert_frame_equal(_sorted_cells(store.load()), _sorted_cells(expected), check_dtype=False)
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import row_dedup
+from row_dedup import DedupCapacityError, DuplicateFilter, row_hashes
+
+
+def _frame(start, stop):
+    values = np.arange(start, stop)
+    return pd.DataFrame({'user_id': values, 'auction_id': values * 7, 'property': [f"p{v}" for v in values]})
+
+
+def _chunks(frame, size):
+    return [frame.iloc[i:i + size] for i in range(0, len(frame), size)]
+
+
+def test_128_bit_halves_are_independent_for_numeric_rows():
+    frame = pd.DataFrame({'a': np.arange(1000), 'b': np.arange(1000) * 3.5})
+    keys = row_hashes(frame, bits=128)
+    assert not (keys['hi'] == keys['lo']).any()
+    assert len(np.unique(keys['lo'])) == len(frame)
+
+
+def test_spill_matches_exact_dedup(tmp_path, monkeypatch):
+    monkeypatch.setattr(row_dedup, '_MAX_DISK_RUNS', 2)
+    frame = pd.concat([_frame(0, 5000), _frame(2000, 6000)], ignore_index=True)
+    frame = frame.sample(frac=1, random_state=0).reset_index(drop=True)
+    expected = frame.duplicated().to_numpy()
+
+    with DuplicateFilter(max_memory_mb=0.01, spill_dir=str(tmp_path)) as dedup:
+        result = np.concatenate([dedup.duplicated(chunk) for chunk in _chunks(frame, 700)])
+        assert dedup.mode == 'spill'
+    np.testing.assert_array_equal(result, expected)
+
+    # 同一目录继续去重：已出现过的行全部判为重复
+    with DuplicateFilter(max_memory_mb=0.01, spill_dir=str(tmp_path)) as dedup:
+        assert dedup.duplicated(_frame(0, 6000)).all()
+        assert not dedup.duplicated(_frame(6000, 6100)).any()
+
+
+def test_bloom_overflow_raises_instead_of_dropping_rows():
+    dedup = DuplicateFilter(max_memory_mb=0.01, fallback='bloom')
+    with pytest.raises(DedupCapacityError):
+        for chunk in _chunks(_frame(0, 200000), 1000):
+            dropped = dedup.duplicated(chunk)
+            assert dedup.mode in ('memory', 'bloom')
+            assert dropped.sum() <= 2
+    dedup.close()
+
+
+def test_bloom_sized_from_expected_rows():
+    with DuplicateFilter(max_memory_mb=0.1, fallback='bloom', expected_rows=20000) as dedup:
+        for chunk in _chunks(_frame(0, 20000), 2000):
+            dedup.duplicated(chunk)
+        assert dedup.mode == 'bloom'
+        assert dedup.duplicates <= 5
+
+
+def test_bloom_falls_back_to_spill_when_expected_rows_do_not_fit():
+    with DuplicateFilter(max_memory_mb=0.01, fallback='bloom', expected_rows=10 ** 7) as dedup:
+        for chunk in _chunks(_frame(0, 20000), 2000):
+            assert not dedup.duplicated(chunk).any()
+        assert dedup.mode == 'spill'
+
+
+def test_failed_run_keeps_previous_state(tmp_path, monkeypatch):
+    monkeypatch.setattr(row_dedup, '_MAX_DISK_RUNS', 2)
+    with DuplicateFilter(max_memory_mb=0.01, spill_dir=str(tmp_path)) as dedup:
+        for chunk in _chunks(_frame(0, 3000), 500):
+            dedup.duplicated(chunk)
+    saved = sorted(p.name for p in tmp_path.iterdir())
+
+    with pytest.raises(RuntimeError):
+        with DuplicateFilter(max_memory_mb=0.01, spill_dir=str(tmp_path)) as dedup:
+            for chunk in _chunks(_frame(3000, 8000), 500):
+                dedup.duplicated(chunk)
+            raise RuntimeError("写入失败")
+    assert sorted(p.name for p in tmp_path.iterdir()) == saved
+
+    # 失败的那次运行中出现的行不会被当作重复行
+    with DuplicateFilter(max_memory_mb=0.01, spill_dir=str(tmp_path)) as dedup:
+        assert dedup.duplicated(_frame(0, 3000)).all()
+        assert not dedup.duplicated(_frame(3000, 8000)).any()
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from distinct_sketch import GroupedHyperLogLog, HyperLogLog, approx_nunique
+from quantile_sketch import KLLSketch, rank_error
+
+
+def test_kll_quantiles_within_rank_error():
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(mean=1.0, sigma=1.5, size=200000)
+    k = 200
+    # 分块建立后合并，覆盖分块清洗中的用法
+    sketch = KLLSketch(k)
+    for chunk in np.array_split(values, 7):
+        sketch.merge(KLLSketch(k).update(chunk))
+    assert sketch.count == len(values)
+
+    ordered = np.sort(values)
+    qs = np.linspace(0.01, 0.99, 25)
+    estimates = sketch.quantiles(qs)
+    ranks = np.searchsorted(ordered, estimates, side='right') / len(values)
+    assert np.max(np.abs(ranks - qs)) <= rank_error(k)
+    assert sketch.min == ordered[0] and sketch.max == ordered[-1]
+
+
+def test_kll_exact_below_capacity():
+    values = np.arange(101, dtype=float)
+    assert KLLSketch(200).update(values).median() == 50.0
+
+
+def test_hll_estimate_within_error_bounds():
+    for n in (1000, 50000, 300000):
+        values = pd.Series(np.arange(n)).astype(str)
+        estimate = approx_nunique(values)
+        low, high = estimate.bounds
+        assert low <= n <= high
+        assert abs(estimate.value - n) <= 3 * estimate.relative_error * n
+
+
+def test_hll_merge_equals_union():
+    left = HyperLogLog.from_values(np.arange(0, 60000))
+    right = HyperLogLog.from_values(np.arange(40000, 100000))
+    union = HyperLogLog.from_values(np.arange(0, 100000))
+    np.testing.assert_array_equal(left.merge(right).registers, union.registers)
+
+
+def test_grouped_hll_counts_within_error_bounds():
+    sizes = np.array([50, 500, 5000, 20000])
+    codes = np.repeat(np.arange(len(sizes)), sizes)
+    values = np.concatenate([np.arange(size) + 10 ** 6 * group for group, size in enumerate(sizes)])
+    sketch = GroupedHyperLogLog(pd.Index(['a', 'b', 'c', 'd'])).add(codes, pd.Series(values))
+    counts = sketch.count().to_numpy()
+    assert np.all(np.abs(counts - sizes) <= 3 * sketch.relative_error * sizes)
@@ -0,0 +1,48 @@
+import sqlite3
+
+import pandas as pd
+
+from snapshot_cache import load_table_cached, table_fingerprint
+
+
+def _counting_loader(connection, calls):
+    def loader():
+        calls.append(1)
+        return pd.read_sql("SELECT * FROM trades", connection)
+    return loader
+
+
+def test_snapshot_invalidated_when_table_changes(tmp_path):
+    connection = sqlite3.connect(':memory:')
+    pd.DataFrame({'user_id': [1, 2, 3], 'day': [20140101, 20140102, 20140103]}).to_sql(
+        'trades', connection, index=False)
+    calls = []
+    loader = _counting_loader(connection, calls)
+    cache_dir = str(tmp_path)
+
+    first = load_table_cached(connection, 'trades', loader, cache_dir=cache_dir)
+    second = load_table_cached(connection, 'trades', loader, cache_dir=cache_dir)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+    # 新增的行改变了行数和最大键值
+    before = table_fingerprint(connection, 'trades')
+    connection.execute("INSERT INTO trades VALUES (4, 20140104)")
+    assert table_fingerprint(connection, 'trades') != before
+    third = load_table_cached(connection, 'trades', loader, cache_dir=cache_dir)
+    assert len(calls) == 2
+    assert len(third) == 4
+
+    assert len(load_table_cached(connection, 'trades', loader, cache_dir=cache_dir)) == 4
+    assert len(calls) == 2
+
+
+def test_offline_uses_existing_snapshot(tmp_path):
+    connection = sqlite3.connect(':memory:')
+    pd.DataFrame({'user_id': [1], 'day': [20140101]}).to_sql('trades', connection, index=False)
+    calls = []
+    loader = _counting_loader(connection, calls)
+    load_table_cached(connection, 'trades', loader, cache_dir=str(tmp_path))
+    connection.execute("INSERT INTO trades VALUES (2, 20140102)")
+    assert len(load_table_cached(connection, 'trades', loader, cache_dir=str(tmp_path), offline=True)) == 1
+    assert len(calls) == 1